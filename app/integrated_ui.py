@@ -1,19 +1,30 @@
+import threading
+import numpy as np
 import pandas as pd
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QLabel, QLineEdit, QPushButton, QComboBox, QStackedWidget,
-    QMessageBox, QScrollArea, QFrame, QRadioButton, QButtonGroup, QTextEdit
+    QMessageBox, QScrollArea, QFrame, QRadioButton, QButtonGroup, QTextEdit,
+    QTableWidget, QTableWidgetItem, QHeaderView, QCompleter, QProgressBar,
+    QListView, QAbstractItemView, QStyledItemDelegate, QApplication
 )
-from PyQt6.QtGui import QDoubleValidator, QFont
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve
+from PyQt6.QtGui import QDoubleValidator, QFont, QFontMetrics, QImage, QPixmap, QPainter, QColor, QAction
+from PyQt6.QtCore import (
+    Qt, QObject, QThread, pyqtSignal, QTimer, QPropertyAnimation, QEasingCurve, QStringListModel,
+    QAbstractListModel, QModelIndex, QRect, QRectF, QSize
+)
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from data.schema import CSV_COLUMNS, METRIC_COLUMNS, SECTORS, load_dataset
+from data.validation import COMPILED_UI_SCHEMA, describe_check
+from data.record_store import RecordStore
+from data.company_index import CompanyIndex
+from models.registry import ModelBundle
+from models.what_if import WhatIfEngine, feature_ranges
+from models.attribution import AttributionExplainer
+from app.task_pool import TaskPool, PRIORITY_BACKGROUND
+from app.profiling import Profiler
 
-CSV_PATH = 'data/db/datasetEsgTRAIN.csv'
-CSV_COLUMNS = [
-    "ID", "EMPRESA", "SETOR", "USO_AGUA", "AREA", "AREA_RESERVA",
-    "CO2_EMIT_DIR", "CO2_EMIT_INDIR", "CO2_REC", "INSUMO_QUIMICO_LEG",
-    "INSUMO_QUIMICO_ORG", "BIODIVERSIDADE", "RESIDUO_REC", "RESIDUO_COMP",
-    "RESIDUO_DESC", "ENERGIA_REN", "INDICE_SUSTENTABILIDADE"
-]
 
 # ============================================================================
 # CHAT COMPONENTS
@@ -22,6 +33,7 @@ CSV_COLUMNS = [
 class ChatWorker(QThread):
     """Thread worker para processar respostas do chatbot sem bloquear a UI."""
     
+    token_ready = pyqtSignal(str)
     response_ready = pyqtSignal(str)
     
     def __init__(self, orchestrator, question):
@@ -30,96 +42,253 @@ class ChatWorker(QThread):
         self.question = question
     
     def run(self):
-        """Executa a requisição ao modelo em thread separada."""
-        response = self.orchestrator.get_response(self.question)
+        """Executa a requisição ao modelo em thread separada, repassando os pedaços da resposta."""
+        chunks = []
+        try:
+            for chunk in self.orchestrator.stream_response(self.question):
+                chunks.append(chunk)
+                self.token_ready.emit(chunk)
+            response = ''.join(chunks).strip()
+        except Exception as e:
+            response = f"The assistant is unavailable right now ({e}). Please try again."
         self.response_ready.emit(response)
 
 
-class MessageBubble(QWidget):
-    """Widget de balão de mensagem para exibir mensagens do usuário e bot."""
-    
-    def __init__(self, text, is_user=True):
+class BundleLoader(QThread):
+    """Carrega uma versão do registro de modelos fora da thread da UI."""
+
+    bundle_ready = pyqtSignal(object)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, registry, version):
         super().__init__()
-        self.setup_ui(text, is_user)
-    
-    def setup_ui(self, text, is_user):
-        """Configura o layout e estilo do balão de mensagem."""
-        main_layout = QVBoxLayout(self)
-        main_layout.setContentsMargins(0, 5, 0, 5)
-        main_layout.setSpacing(2)
-        
-        bubble_layout = QHBoxLayout()
-        bubble_layout.setContentsMargins(0, 0, 0, 0)
-
-        bubble_frame = QFrame()
-        bubble_content = QHBoxLayout(bubble_frame)
-        bubble_content.setContentsMargins(16, 10, 16, 10)
-
-        label = QLabel(text)
-        label.setWordWrap(True)
-        label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        label.setFont(QFont("Segoe UI", 10))
-        label.setMaximumWidth(300)
-        
-        bubble_content.addWidget(label)
-        
+        self.registry = registry
+        self.version = version
+
+    def run(self):
+        try:
+            self.bundle_ready.emit(self.registry.load(self.version))
+        except Exception as e:
+            self.load_failed.emit(f"{self.version}: {e}")
+
+
+class RegistryWatcher(QObject):
+    """Acompanha o ponteiro CURRENT do registro e avisa quando uma nova versão está pronta."""
+
+    bundle_changed = pyqtSignal(object)
+    load_failed = pyqtSignal(str, str)
+
+    def __init__(self, registry, active_version=None, interval_ms=2000, parent=None):
+        super().__init__(parent)
+        self.registry = registry
+        self.active_version = active_version
+        # Versão que falhou ao carregar; só é tentada de novo quando o CURRENT mudar
+        self.failed_version = None
+        self.loader = None
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(interval_ms)
+
+    def poll(self):
+        version = self.registry.current_version()
+        if version is None or version in (self.active_version, self.failed_version) or self.loader is not None:
+            return
+        self.loader = BundleLoader(self.registry, version)
+        self.loader.bundle_ready.connect(self.on_bundle_ready)
+        self.loader.load_failed.connect(lambda msg: self.on_load_failed(version, msg))
+        self.loader.finished.connect(self.on_loader_finished)
+        self.loader.start()
+
+    def on_bundle_ready(self, bundle):
+        self.active_version = bundle.version
+        self.failed_version = None
+        self.bundle_changed.emit(bundle)
+
+    def on_load_failed(self, version, message):
+        self.failed_version = version
+        print(f"Model registry load failed: {message}")
+        self.load_failed.emit(version, message)
+
+    def on_loader_finished(self):
+        self.loader = None
+
+
+class EvaluationWorker(QThread):
+    """Roda a avaliação em lote (ou lê do cache) sem bloquear a UI."""
+
+    reports_ready = pyqtSignal(object)
+    evaluation_failed = pyqtSignal(str)
+
+    def __init__(self, evaluator, bundle, datasets):
+        super().__init__()
+        self.evaluator = evaluator
+        self.bundle = bundle
+        self.datasets = datasets
+
+    def run(self):
+        try:
+            self.reports_ready.emit(self.evaluator.evaluate(self.bundle, self.datasets))
+        except Exception as e:
+            self.evaluation_failed.emit(str(e))
+
+
+class ChatHistoryModel(QAbstractListModel):
+    """Histórico do chat em listas compactas; a view só enxerga uma janela das mensagens mais recentes.
+
+    A janela cresce para trás quando o usuário rola até o topo e é aparada quando
+    ele volta ao fim, então o número de linhas que o QListView precisa dispor fica
+    limitado mesmo com dezenas de milhares de mensagens na sessão.
+    """
+
+    IsUserRole = Qt.ItemDataRole.UserRole
+    HistoryIndexRole = Qt.ItemDataRole.UserRole + 1
+    WINDOW = 200
+
+    def __init__(self, window=WINDOW, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.texts = []
+        self.is_user = bytearray()
+        self.first = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.texts) - self.first
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.first + index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.texts[i]
+        if role == self.IsUserRole:
+            return bool(self.is_user[i])
+        if role == self.HistoryIndexRole:
+            return i
+        return None
+
+    def append(self, text, is_user):
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.texts.append(text)
+        self.is_user.append(1 if is_user else 0)
+        self.endInsertRows()
+
+    def set_last(self, text):
+        """Troca o texto da última mensagem (resposta chegando em streaming); devolve o índice na view."""
+        self.texts[-1] = text
+        index = self.index(len(self.texts) - 1 - self.first)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+        return index
+
+    def trim(self):
+        """Descarta da view (não do histórico) as linhas mais antigas além de duas janelas."""
+        excess = self.rowCount() - self.window
+        if self.rowCount() > 2 * self.window:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            self.first += excess
+            self.endRemoveRows()
+
+    def load_older(self):
+        count = min(self.window, self.first)
+        if count:
+            self.beginInsertRows(QModelIndex(), 0, count - 1)
+            self.first -= count
+            self.endInsertRows()
+        return count
+
+
+class MessageBubbleDelegate(QStyledItemDelegate):
+    """Desenha os balões direto com QPainter; as alturas medidas ficam em cache por mensagem."""
+
+    MAX_TEXT_WIDTH = 300
+    MARGIN = 20
+    PADDING_H = 16
+    PADDING_V = 10
+    SPACING = 8
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.text_font = QFont("Segoe UI", 10)
+        self.name_font = QFont("Segoe UI", 8)
+        self.text_metrics = QFontMetrics(self.text_font)
+        self.name_height = QFontMetrics(self.name_font).height()
+        # {índice no histórico: (largura do texto, altura da linha)}
+        self.heights = {}
+
+    def text_width(self):
+        available = self.view.viewport().width() - 2 * self.MARGIN - 2 * self.PADDING_H
+        return max(50, min(self.MAX_TEXT_WIDTH, available))
+
+    def text_rect(self, text, width):
+        flags = Qt.TextFlag.TextWordWrap
+        return self.text_metrics.boundingRect(QRect(0, 0, width, 1_000_000), flags, text)
+
+    def sizeHint(self, option, index):
+        width = self.text_width()
+        key = index.data(ChatHistoryModel.HistoryIndexRole)
+        cached = self.heights.get(key)
+        if cached is None or cached[0] != width:
+            text_h = self.text_rect(index.data(), width).height()
+            height = 5 + text_h + 2 * self.PADDING_V + 2 + self.name_height + 5 + self.SPACING
+            cached = self.heights[key] = (width, height)
+        return QSize(self.view.viewport().width(), cached[1])
+
+    def paint(self, painter, option, index):
+        text = index.data()
+        is_user = index.data(ChatHistoryModel.IsUserRole)
+        width = self.text_width()
+        text_rect = self.text_rect(text, width)
+        bubble_w = text_rect.width() + 2 * self.PADDING_H
+        bubble_h = text_rect.height() + 2 * self.PADDING_V
+
+        row = option.rect
+        top = row.top() + 5
         if is_user:
-            bubble_layout.addStretch()
-            bubble_layout.addWidget(bubble_frame)
-            
-            bubble_frame.setStyleSheet("""
-                QFrame {
-                    background-color: #0066FF;
-                    border-radius: 18px;
-                }
-            """)
-            label.setStyleSheet("color: white; background: transparent;")
-
-            username_layout = QHBoxLayout()
-            username_layout.addStretch()
-            username_label = QLabel("You")
-            username_label.setFont(QFont("Segoe UI", 8))
-            username_label.setStyleSheet("color: #666666; background: transparent;")
-            username_layout.addWidget(username_label)
-            username_layout.setContentsMargins(0, 0, 10, 0)
-            
-            main_layout.addLayout(bubble_layout)
-            main_layout.addLayout(username_layout)
+            left = row.right() - self.MARGIN - bubble_w
         else:
-            bubble_layout.addWidget(bubble_frame)
-            bubble_layout.addStretch()
-            
-            bubble_frame.setStyleSheet("""
-                QFrame {
-                    background-color: white;
-                    border-radius: 18px;
-                    padding: 1px;
-                }
-            """)
-
-            label.setStyleSheet("color: #1a1a1a; background: transparent;")
- 
-            username_layout = QHBoxLayout()
-            username_label = QLabel("ESG Assistant")
-            username_label.setFont(QFont("Segoe UI", 8))
-            username_label.setStyleSheet("color: #666666; background: transparent;")
-            username_layout.addWidget(username_label)
-            username_layout.addStretch()
-            username_layout.setContentsMargins(10, 0, 0, 0)
-            
-            main_layout.addLayout(bubble_layout)
-            main_layout.addLayout(username_layout)
-        
-        self.setStyleSheet("background: transparent;")
+            left = row.left() + self.MARGIN
+        bubble = QRectF(left, top, bubble_w, bubble_h)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#0066FF" if is_user else "white"))
+        painter.drawRoundedRect(bubble, 18, 18)
+
+        painter.setFont(self.text_font)
+        painter.setPen(QColor("white" if is_user else "#1a1a1a"))
+        painter.drawText(
+            bubble.adjusted(self.PADDING_H, self.PADDING_V, -self.PADDING_H, -self.PADDING_V),
+            int(Qt.TextFlag.TextWordWrap), text
+        )
+
+        painter.setFont(self.name_font)
+        painter.setPen(QColor("#666666"))
+        name_rect = QRectF(row.left() + self.MARGIN + 10, bubble.bottom() + 2, row.width() - 2 * self.MARGIN - 20, self.name_height)
+        align = Qt.AlignmentFlag.AlignRight if is_user else Qt.AlignmentFlag.AlignLeft
+        painter.drawText(name_rect, int(align), "You" if is_user else "ESG Assistant")
+        painter.restore()
 
 
 class ChatPanel(QWidget):
     """Painel do chatbot integrado."""
+
+    STREAM_FLUSH_MS = 50
     
     def __init__(self, orchestrator):
         super().__init__()
         self.orchestrator = orchestrator
         self.worker = None
+        # Resposta em streaming: o texto acumula e a view é atualizada no máximo a cada STREAM_FLUSH_MS
+        self.streaming = False
+        self.stream_text = ""
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setSingleShot(True)
+        self.stream_timer.setInterval(self.STREAM_FLUSH_MS)
+        self.stream_timer.timeout.connect(self.flush_stream)
         self.setup_ui()
     
     def setup_ui(self):
@@ -162,10 +331,8 @@ class ChatPanel(QWidget):
     
     def setup_chat_area(self, parent_layout):
         """Configura a área de exibição de mensagens."""
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setStyleSheet("""
-            QScrollArea {
+        chat_view_style = """
+            QListView {
                 border: none;
                 background-color: #F5F5F7;
             }
@@ -185,19 +352,29 @@ class ChatPanel(QWidget):
             QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
                 height: 0px;
             }
-        """)
-
-        self.chat_container = QWidget()
-        self.chat_container.setStyleSheet("background: transparent;")
+        """
 
-        self.chat_layout = QVBoxLayout(self.chat_container)
-        self.chat_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.chat_layout.setSpacing(8)
-        self.chat_layout.setContentsMargins(20, 20, 20, 20)
+        # Model/view: só as linhas visíveis são desenhadas, nenhuma mensagem vira widget
+        self.chat_model = ChatHistoryModel(parent=self)
+        self.chat_view = QListView()
+        self.chat_view.setModel(self.chat_model)
+        self.chat_delegate = MessageBubbleDelegate(self.chat_view)
+        self.chat_view.setItemDelegate(self.chat_delegate)
+        self.chat_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.chat_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.chat_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.chat_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.chat_view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.chat_view.setStyleSheet(chat_view_style)
+        self.chat_view.verticalScrollBar().valueChanged.connect(self.on_chat_scrolled)
+
+        copy_action = QAction("Copy message", self.chat_view)
+        copy_action.triggered.connect(self.copy_selected_message)
+        self.chat_view.addAction(copy_action)
+        self.chat_view.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+
+        parent_layout.addWidget(self.chat_view)
 
-        self.scroll.setWidget(self.chat_container)
-        parent_layout.addWidget(self.scroll)
-    
     def setup_input_area(self, parent_layout):
         """Configura a área de entrada de texto e botões."""
         input_frame = QFrame()
@@ -261,14 +438,31 @@ class ChatPanel(QWidget):
     
     def add_message(self, text, is_user=True):
         """Adiciona uma nova mensagem à área de chat."""
-        bubble = MessageBubble(text, is_user)
-        self.chat_layout.addWidget(bubble)
-        QTimer.singleShot(50, self.scroll_to_bottom)
-    
+        scrollbar = self.chat_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 5
+        self.chat_model.append(text, is_user)
+        if at_bottom or is_user:
+            self.chat_model.trim()
+            QTimer.singleShot(0, self.scroll_to_bottom)
+
     def scroll_to_bottom(self):
-        scrollbar = self.scroll.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-    
+        self.chat_view.scrollToBottom()
+
+    def on_chat_scrolled(self, value):
+        """No topo da janela, traz as mensagens anteriores mantendo a posição visível."""
+        if value != 0 or self.chat_model.first == 0:
+            return
+        scrollbar = self.chat_view.verticalScrollBar()
+        old_max = scrollbar.maximum()
+        if self.chat_model.load_older():
+            self.chat_view.doItemsLayout()
+            scrollbar.setValue(scrollbar.maximum() - old_max)
+
+    def copy_selected_message(self):
+        index = self.chat_view.currentIndex()
+        if index.isValid():
+            QApplication.clipboard().setText(index.data())
+
     def send_message(self):
         """Processa o envio de mensagem do usuário."""
         text = self.input_field.text().strip()
@@ -280,13 +474,41 @@ class ChatPanel(QWidget):
         self.set_input_enabled(False)
         
         self.worker = ChatWorker(self.orchestrator, text)
+        self.worker.token_ready.connect(self.handle_token)
         self.worker.response_ready.connect(self.handle_response)
         self.worker.finished.connect(self.worker_finished)
         self.worker.start()
+
+    def handle_token(self, chunk):
+        """O primeiro pedaço cria o balão da resposta; os seguintes só acumulam até o próximo flush."""
+        if not self.streaming:
+            self.streaming = True
+            self.stream_text = chunk
+            self.add_message(chunk, is_user=False)
+            return
+        self.stream_text += chunk
+        if not self.stream_timer.isActive():
+            self.stream_timer.start()
+
+    def flush_stream(self):
+        scrollbar = self.chat_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 5
+        index = self.chat_model.set_last(self.stream_text)
+        self.chat_delegate.heights.pop(len(self.chat_model.texts) - 1, None)
+        if index.isValid():
+            self.chat_delegate.sizeHintChanged.emit(index)
+        if at_bottom:
+            QTimer.singleShot(0, self.scroll_to_bottom)
     
     def handle_response(self, response):
         """Processa a resposta recebida do chatbot."""
-        self.add_message(response, is_user=False)
+        if self.streaming:
+            self.stream_timer.stop()
+            self.stream_text = response
+            self.flush_stream()
+            self.streaming = False
+        else:
+            self.add_message(response, is_user=False)
     
     def worker_finished(self):
         """Limpa o worker e reabilita a entrada após processamento."""
@@ -374,14 +596,18 @@ class FloatingChatButton(QPushButton):
 
 
 class InputWindow(QWidget):
-    def __init__(self, stacked_widget, reg_tree, mlp_nn, xg_boost, preprocessor):
+    def __init__(self, stacked_widget, reg_tree, mlp_nn, xg_boost, preprocessor, bundle=None,
+                 record_store=None, company_index=None, task_pool=None, drift_monitor=None, profiler=None):
         super().__init__()
         self.stacked_widget = stacked_widget
+        self.task_pool = task_pool or TaskPool(parent=self)
+        self.profiler = profiler or Profiler()
+        self.record_store = record_store
+        self.company_index = company_index or CompanyIndex()
+        self.drift_monitor = drift_monitor
         
-        self.reg_tree = reg_tree
-        self.mlp_nn = mlp_nn
-        self.xg_boost = xg_boost
-        self.preprocessor = preprocessor
+        # Todas as predições leem o bundle ativo; a troca de versão é uma única atribuição
+        self.bundle = bundle or ModelBundle(reg_tree, mlp_nn, xg_boost, preprocessor)
 
         self.init_ui()
         self.final_df = None
@@ -429,8 +655,15 @@ class InputWindow(QWidget):
         subtitle_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         subtitle_label.setStyleSheet("color: #64748B; background: transparent; border: none;")
 
+        self.version_label = QLabel()
+        self.version_label.setFont(QFont("Segoe UI", 9))
+        self.version_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.version_label.setStyleSheet("color: #94A3B8; background: transparent; border: none;")
+        self.update_version_label()
+
         header_layout.addWidget(title_label)
         header_layout.addWidget(subtitle_label)
+        header_layout.addWidget(self.version_label)
         layout.addWidget(header_frame)
 
         form_frame = QFrame()
@@ -507,12 +740,11 @@ class InputWindow(QWidget):
 
         lbl_id = QLabel("ID:")
         lbl_id.setStyleSheet(label_style)
+        # O ID é atribuído pelo banco ao salvar
         self.inputs["ID"] = QLineEdit()
-        self.inputs["ID"].setPlaceholderText("ID")
+        self.inputs["ID"].setPlaceholderText("Assigned on save")
+        self.inputs["ID"].setReadOnly(True)
         self.inputs["ID"].setStyleSheet(input_style)
-        validator = QDoubleValidator()
-        validator.setNotation(QDoubleValidator.Notation.StandardNotation)
-        self.inputs["ID"].setValidator(validator)
         grid1.addWidget(lbl_id, 0, 0)
         grid1.addWidget(self.inputs["ID"], 0, 1)
 
@@ -521,13 +753,22 @@ class InputWindow(QWidget):
         self.inputs["EMPRESA"] = QLineEdit()
         self.inputs["EMPRESA"].setPlaceholderText("Company name")
         self.inputs["EMPRESA"].setStyleSheet(input_style)
+
+        # O completer não filtra sozinho: o modelo recebe só o resultado do índice de prefixo
+        self.company_model = QStringListModel(self)
+        self.company_completer = QCompleter(self.company_model, self)
+        self.company_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.company_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.company_completer.activated[str].connect(self.prefill_company)
+        self.inputs["EMPRESA"].setCompleter(self.company_completer)
+        self.inputs["EMPRESA"].textEdited.connect(self.update_company_suggestions)
         grid1.addWidget(lbl_empresa, 0, 2)
         grid1.addWidget(self.inputs["EMPRESA"], 0, 3)
 
         lbl_setor = QLabel("Setor:")
         lbl_setor.setStyleSheet(label_style)
         self.inputs["SETOR"] = QComboBox()
-        self.inputs["SETOR"].addItems(["TRIGO", "MILHO", "SOJA", "CANA DE AÇUCAR"])
+        self.inputs["SETOR"].addItems(SECTORS)
         self.inputs["SETOR"].setStyleSheet(combo_style)
         grid1.addWidget(lbl_setor, 0, 4)
         grid1.addWidget(self.inputs["SETOR"], 0, 5)
@@ -680,7 +921,27 @@ class InputWindow(QWidget):
         """)
         autocomplete_button.clicked.connect(self.autocomplete_fields)
 
-        submit_button = QPushButton("Send Data and View Predictions")
+        evaluation_button = QPushButton("Model Evaluation")
+        evaluation_button.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        evaluation_button.setMinimumHeight(45)
+        evaluation_button.setStyleSheet("""
+            QPushButton { 
+                background-color: #FFFFFF; 
+                color: #475569; 
+                border: 2px solid #E2E8F0; 
+                padding: 12px 24px; 
+                border-radius: 8px; 
+            } 
+            QPushButton:hover { 
+                border: 2px solid #CBD5E1; 
+            } 
+            QPushButton:pressed { 
+                background-color: #F1F5F9; 
+            }
+        """)
+        evaluation_button.clicked.connect(self.show_evaluation)
+
+        self.submit_button = submit_button = QPushButton("Send Data and View Predictions")
         submit_button.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
         submit_button.setMinimumHeight(45)
         submit_button.setStyleSheet("""
@@ -702,18 +963,90 @@ class InputWindow(QWidget):
 
         button_layout.addStretch()
         button_layout.addWidget(autocomplete_button)
+        button_layout.addWidget(evaluation_button)
         button_layout.addWidget(submit_button)
         button_layout.addStretch()
         layout.addLayout(button_layout)
 
+        # Progresso da predição em andamento; some quando a tarefa termina
+        progress_layout = QHBoxLayout()
+        progress_layout.setSpacing(10)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumHeight(16)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setStyleSheet("""
+            QProgressBar { background-color: #E2E8F0; border: none; border-radius: 6px; }
+            QProgressBar::chunk { background-color: #3B82F6; border-radius: 6px; }
+        """)
+        self.progress_label = QLabel("")
+        self.progress_label.setStyleSheet("color: #64748B; font-size: 11px; background: transparent; border: none;")
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setStyleSheet("""
+            QPushButton { background-color: #FFFFFF; color: #EF4444; border: 1px solid #FCA5A5; padding: 4px 14px; border-radius: 6px; }
+            QPushButton:hover { background-color: #FEF2F2; }
+        """)
+        self.cancel_button.clicked.connect(lambda: self.task_pool.cancel('predict'))
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.progress_label)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+        self.set_busy(False)
+
         scroll_area.setWidget(scroll_content_widget)
         main_layout.addWidget(scroll_area)
         self.setLayout(main_layout)
 
+    def update_version_label(self):
+        version = self.bundle.version or "not registered"
+        self.version_label.setText(f"Models: {version}")
+        self.version_label.setToolTip("")
+        self.version_label.setStyleSheet("color: #94A3B8; background: transparent; border: none;")
+
+    def show_registry_error(self, version, message):
+        """A versão promovida não carregou: os modelos atuais continuam em uso."""
+        current = self.bundle.version or "not registered"
+        self.version_label.setText(f"Models: {current} ({version} failed to load)")
+        self.version_label.setToolTip(message)
+        self.version_label.setStyleSheet("color: #EF4444; background: transparent; border: none;")
+
+    def swap_bundle(self, bundle):
+        """Troca os modelos em uso sem reiniciar; submits em andamento terminam com o bundle antigo."""
+        self.bundle = bundle
+        self.update_version_label()
+        print(f"Models hot-swapped to {bundle.version}")
+
+    def update_company_suggestions(self, text):
+        self.company_model.setStringList(self.company_index.prefix(text.strip()))
+        if self.company_model.rowCount():
+            self.company_completer.complete()
+
+    def prefill_company(self, company):
+        """Preenche o formulário com o registro mais recente da empresa."""
+        if self.record_store is None:
+            return
+        record = self.record_store.latest_for(company)
+        if record is None:
+            return
+        for key, value in record.items():
+            widget = self.inputs.get(key)
+            if key == "ID" or widget is None:
+                continue
+            if isinstance(widget, QLineEdit):
+                widget.setText(str(value))
+            elif isinstance(widget, QComboBox):
+                index = widget.findText(value)
+                if index >= 0:
+                    widget.setCurrentIndex(index)
+
+    def show_evaluation(self):
+        evaluation_w = self.stacked_widget.widget(2)
+        if isinstance(evaluation_w, EvaluationWindow):
+            evaluation_w.refresh(self.bundle)
+            self.stacked_widget.setCurrentIndex(2)
+
     def autocomplete_fields(self):
         """Preenche os campos com dados de teste"""
         test_data = {
-            "ID": "0.0",
             "EMPRESA": "EMPRESA00342",
             "SETOR": "TRIGO",
             "USO_AGUA": "5.58",
@@ -744,53 +1077,99 @@ class InputWindow(QWidget):
 
     def submit_data(self):
         data_values = {}
-        all_fields_valid = True
-
         for label_text, widget in self.inputs.items():
+            if label_text == "ID":
+                continue
             if isinstance(widget, QLineEdit):
-                value_text = widget.text().strip().replace(',', '.')
-                if not value_text:
-                    QMessageBox.warning(self, "Empty field", f"The field '{label_text.replace('_', ' ').title()}' cannot be empty.")
-                    all_fields_valid = False; widget.setFocus(); return
+                value_text = widget.text().strip()
                 if label_text not in ["EMPRESA", "SETOR"]:
-                    try:
-                        data_values[label_text] = float(value_text)
-                    except ValueError:
-                        QMessageBox.warning(self, "Validation error", f"The field '{label_text.replace('_', ' ').title()}' must be a valid number.")
-                        all_fields_valid = False; widget.setFocus(); return
-                else: 
-                    data_values[label_text] = value_text
+                    value_text = value_text.replace(',', '.')
+                data_values[label_text] = value_text or None
             elif isinstance(widget, QComboBox):
                 data_values[label_text] = widget.currentText()
 
-        if all_fields_valid:
-            self.final_df = pd.DataFrame([data_values])
-            current_cols_ordered = [col for col in CSV_COLUMNS if col in self.final_df.columns]
-            self.final_df = self.final_df[current_cols_ordered]
-
-            try:
-                self.pred_arvore = self.reg_tree.predict_tree(self.final_df.copy())
-                self.pred_mlp = self.mlp_nn.predict_mlp(self.final_df.copy(), self.preprocessor)
-                self.pred_xgboost = self.xg_boost.predict_xgboost(self.final_df.copy())
-                
-                if isinstance(self.pred_arvore, (list, pd.Series, pd.DataFrame)): self.pred_arvore = self.pred_arvore[0]
-                if isinstance(self.pred_mlp, (list, pd.Series, pd.DataFrame)): self.pred_mlp = self.pred_mlp[0]
-                if isinstance(self.pred_xgboost, (list, pd.Series, pd.DataFrame)): self.pred_xgboost = self.pred_xgboost[0]
-
-                print(f"Tree prediction: {self.pred_arvore}, Tipo: {type(self.pred_arvore)}")
-                print(f"MLP prediction: {self.pred_mlp}, Tipo: {type(self.pred_mlp)}")
-                print(f"XGBoost prediction: {self.pred_xgboost}, Tipo: {type(self.pred_xgboost)}")
-
-                results_w = self.stacked_widget.widget(1)
-                if isinstance(results_w, ResultsAndSaveWindow):
-                    results_w.set_data(self.final_df.copy(), float(self.pred_arvore), float(self.pred_mlp), float(self.pred_xgboost))
-                    self.stacked_widget.setCurrentIndex(1)
-                else:
-                    QMessageBox.critical(self, "Erro", "Error")
-
-            except Exception as e:
-                QMessageBox.critical(self, "Prediction error", f"An error occurred while generating the predictions.: {e}")
-                print(f"An error occurred while generating the predictions.: {e}")
+        # Schema da validação em lote, com o índice obrigatório: todos os campos inválidos aparecem de uma vez
+        result = COMPILED_UI_SCHEMA.validate(pd.DataFrame([data_values], dtype=object))
+        if result.n_invalid:
+            field_errors = result.field_errors(0)
+            lines = [
+                f"• {column.replace('_', ' ').title()}: {', '.join(describe_check(check) for check in checks)}"
+                for column, checks in field_errors.items()
+            ]
+            QMessageBox.warning(self, "Validation error", "Please fix the following fields:\n\n" + "\n".join(lines))
+            first = next((self.inputs[c] for c in CSV_COLUMNS if c in field_errors and c in self.inputs), None)
+            if first is not None:
+                first.setFocus()
+            return
+
+        self.final_df = result.data
+        self.start_prediction(self.final_df, self.bundle)
+
+    def start_prediction(self, final_df, bundle):
+        """As três predições rodam no pool; a UI só recebe o progresso e o resultado."""
+        models = [
+            ("Regression Tree", lambda df: bundle.reg_tree.predict_tree(df)),
+            ("MLP", lambda df: bundle.mlp_nn.predict_mlp(df, bundle.preprocessor)),
+            ("XGBoost", lambda df: bundle.xg_boost.predict_xgboost(df))
+        ]
+
+        def predict(task):
+            preds = []
+            with self.profiler.task_stage("prediction"):
+                for i, (name, predict_fn) in enumerate(models):
+                    task.report(i, len(models), f"Running {name}...")
+                    pred = predict_fn(final_df.copy())
+                    if isinstance(pred, (list, np.ndarray, pd.Series, pd.DataFrame)): pred = pred[0]
+                    preds.append(float(pred))
+            task.report(len(models), len(models), "Done")
+            return preds
+
+        self.set_busy(True, "Starting predictions...")
+        # Um novo submit cancela o anterior que ainda não terminou
+        self.task_pool.submit(
+            predict,
+            key='predict',
+            on_progress=self.on_prediction_progress,
+            on_result=lambda preds: self.on_prediction_ready(final_df, bundle, preds),
+            on_error=self.on_prediction_error,
+            on_cancelled=lambda: self.set_busy(False)
+        )
+
+    def set_busy(self, busy, message=""):
+        self.submit_button.setEnabled(not busy)
+        self.progress_bar.setVisible(busy)
+        self.progress_label.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+        self.progress_label.setText(message)
+        if busy:
+            self.progress_bar.setValue(0)
+
+    def on_prediction_progress(self, step, total, message):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(step)
+        self.progress_label.setText(message)
+
+    def on_prediction_ready(self, final_df, bundle, preds):
+        self.set_busy(False)
+        if self.drift_monitor is not None:
+            # Só entra no monitor o que de fato foi pontuado
+            self.task_pool.submit(lambda task: self.drift_monitor.update(final_df), priority=PRIORITY_BACKGROUND)
+        self.pred_arvore, self.pred_mlp, self.pred_xgboost = preds
+        print(f"Tree prediction: {self.pred_arvore}")
+        print(f"MLP prediction: {self.pred_mlp}")
+        print(f"XGBoost prediction: {self.pred_xgboost}")
+
+        results_w = self.stacked_widget.widget(1)
+        if isinstance(results_w, ResultsAndSaveWindow):
+            results_w.set_data(final_df.copy(), self.pred_arvore, self.pred_mlp, self.pred_xgboost, bundle)
+            self.stacked_widget.setCurrentIndex(1)
+        else:
+            QMessageBox.critical(self, "Erro", "Error")
+
+    def on_prediction_error(self, message):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Prediction error", f"An error occurred while generating the predictions.: {message}")
+        print(f"An error occurred while generating the predictions.: {message}")
 
     def clear_fields(self):
         for widget in self.inputs.values():
@@ -804,15 +1183,112 @@ class InputWindow(QWidget):
         self.pred_xgboost = None
 
 
+def render_what_if(sweep, width, height, dpi=100):
+    """Desenha as curvas (1 métrica) ou os mapas de calor (2 métricas) num buffer RGBA, fora da thread da UI."""
+    titles = {'tree': "Regression Tree", 'mlp': "MLP", 'xgboost': "XGBoost"}
+    colors = {'tree': "#F59E0B", 'mlp': "#3B82F6", 'xgboost': "#10B981"}
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, layout='constrained')
+    canvas = FigureCanvasAgg(figure)
+
+    if len(sweep['features']) == 1:
+        ax = figure.add_subplot(1, 1, 1)
+        for model_name, y in sweep['predictions'].items():
+            ax.plot(sweep['axes'][0], y, label=titles[model_name], color=colors[model_name])
+        ax.axvline(sweep['current'][0], color="#94A3B8", linestyle="--", linewidth=1)
+        ax.set_xlabel(sweep['features'][0])
+        ax.set_ylabel("INDICE_SUSTENTABILIDADE")
+        ax.legend(fontsize=8)
+    else:
+        # Mesma escala de cor nos três painéis para comparar os modelos
+        vmin = min(y.min() for y in sweep['predictions'].values())
+        vmax = max(y.max() for y in sweep['predictions'].values())
+        axes = figure.subplots(1, 3, sharey=True)
+        for ax, (model_name, y) in zip(axes, sweep['predictions'].items()):
+            mesh = ax.pcolormesh(sweep['axes'][0], sweep['axes'][1], y.T, shading='auto', vmin=vmin, vmax=vmax, cmap='viridis')
+            ax.plot(*sweep['current'], marker='o', color="#FFFFFF", markeredgecolor="#0F172A")
+            ax.set_title(titles[model_name], fontsize=9)
+            ax.set_xlabel(sweep['features'][0], fontsize=8)
+        axes[0].set_ylabel(sweep['features'][1], fontsize=8)
+        figure.colorbar(mesh, ax=list(axes))
+
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+class ContributionBars(QWidget):
+    """Lista ranqueada de contribuições: barra verde puxa o índice para cima, vermelha para baixo."""
+
+    ROW_HEIGHT = 22
+    MAX_ROWS = 8
+
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.attribution = None
+        self.setMinimumHeight(self.ROW_HEIGHT * (self.MAX_ROWS + 2))
+
+    def set_attribution(self, attribution):
+        self.attribution = attribution
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setFont(QFont("Segoe UI", 9, QFont.Weight.Bold))
+        painter.setPen(QColor("#1E293B"))
+        painter.drawText(0, 0, self.width(), self.ROW_HEIGHT, Qt.AlignmentFlag.AlignVCenter, self.title)
+        if self.attribution is None:
+            painter.end()
+            return
+
+        rows = self.attribution['contributions'][:self.MAX_ROWS]
+        scale = max(abs(v) for _, v in rows) or 1.0
+        name_w = int(self.width() * 0.45)
+        value_w = 55
+        center = name_w + (self.width() - name_w - value_w) // 2
+        half = (self.width() - name_w - value_w) // 2 - 4
+
+        painter.setFont(QFont("Segoe UI", 8))
+        for i, (feature, value) in enumerate(rows):
+            y = (i + 1) * self.ROW_HEIGHT
+            painter.setPen(QColor("#475569"))
+            painter.drawText(0, y, name_w - 6, self.ROW_HEIGHT, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight, feature)
+
+            width = int(half * abs(value) / scale)
+            x = center if value >= 0 else center - width
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#10B981" if value >= 0 else "#EF4444"))
+            painter.drawRoundedRect(x, y + 5, max(width, 1), self.ROW_HEIGHT - 10, 3, 3)
+
+            painter.setPen(QColor("#0F172A"))
+            painter.drawText(self.width() - value_w, y, value_w, self.ROW_HEIGHT, Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignRight, f"{value:+.3f}")
+
+        painter.setPen(QColor("#CBD5E1"))
+        painter.drawLine(center, self.ROW_HEIGHT, center, (len(rows) + 1) * self.ROW_HEIGHT)
+        painter.setPen(QColor("#94A3B8"))
+        painter.drawText(0, (len(rows) + 1) * self.ROW_HEIGHT, self.width(), self.ROW_HEIGHT, Qt.AlignmentFlag.AlignVCenter,
+                         f"base {self.attribution['base']:.3f} → {self.attribution['prediction']:.3f}")
+        painter.end()
+
+
 class ResultsAndSaveWindow(QWidget):
-    def __init__(self, stacked_widget):
+    def __init__(self, stacked_widget, record_store, company_index=None, task_pool=None, training_path=None):
         super().__init__()
         self.stacked_widget = stacked_widget
+        self.record_store = record_store
+        self.training_path = training_path
+        self.company_index = company_index
+        self.task_pool = task_pool or TaskPool(parent=self)
+        self.reference_lock = threading.Lock()
         self.original_data_df = None
         self.pred_tree_val = None
         self.pred_mlp_val = None
         self.pred_xgboost_val = None
         self.user_indice_val = None
+        self.bundle = None
+        self.reference_df = None
+        self.ranges = None
+        self.explainer = None
         self.init_ui()
 
     def init_ui(self):
@@ -977,6 +1453,8 @@ class ResultsAndSaveWindow(QWidget):
         results_layout.addLayout(radio_layout)
 
         layout.addWidget(results_frame)
+        layout.addWidget(self.build_attribution_frame())
+        layout.addWidget(self.build_what_if_frame())
 
         buttons_layout = QHBoxLayout()
         buttons_layout.setSpacing(15)
@@ -1003,7 +1481,7 @@ class ResultsAndSaveWindow(QWidget):
         """)
         discard_button.clicked.connect(self.discard_and_new)
 
-        save_button = QPushButton("Confirm and Save Data")
+        self.save_button = save_button = QPushButton("Confirm and Save Data")
         save_button.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
         save_button.setMinimumHeight(45)
         save_button.setStyleSheet("""
@@ -1029,12 +1507,171 @@ class ResultsAndSaveWindow(QWidget):
         buttons_layout.addStretch()
         layout.addLayout(buttons_layout)
 
+        self.save_status = QLabel("")
+        self.save_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.save_status.setStyleSheet("color: #64748B; font-size: 11px; background: transparent; border: none;")
+        layout.addWidget(self.save_status)
+
         scroll_area.setWidget(scroll_content_widget)
         main_layout.addWidget(scroll_area)
         self.setLayout(main_layout)
         
-    def set_data(self, data_df, pred_tree, pred_mlp, pred_xgboost):
+    def build_attribution_frame(self):
+        attribution_frame = QFrame()
+        attribution_frame.setStyleSheet("QFrame { background-color: #FFFFFF; border-radius: 10px; border: 1px solid #E2E8F0; }")
+        attribution_layout = QVBoxLayout(attribution_frame)
+        attribution_layout.setContentsMargins(30, 25, 30, 25)
+        attribution_layout.setSpacing(15)
+
+        attribution_title = QLabel("Feature Contributions")
+        attribution_title.setFont(QFont("Segoe UI", 16, QFont.Weight.Bold))
+        attribution_title.setStyleSheet("color: #1E293B; background: transparent; border: none;")
+        attribution_layout.addWidget(attribution_title)
+
+        self.contribution_bars = {
+            'tree': ContributionBars("Regression Tree"),
+            'mlp': ContributionBars("Multi Layer Perceptron"),
+            'xgboost': ContributionBars("XGBoost")
+        }
+        bars_layout = QHBoxLayout()
+        bars_layout.setSpacing(25)
+        for bars in self.contribution_bars.values():
+            bars.setStyleSheet("background: transparent; border: none;")
+            bars_layout.addWidget(bars, 1)
+        attribution_layout.addLayout(bars_layout)
+        return attribution_frame
+
+    def load_reference_data(self):
+        """Dataset de treino, lido uma vez: faixas do what-if e referência da MLP nas atribuições."""
+        # Chamado das tarefas do pool: o what-if e as atribuições podem chegar juntos
+        with self.reference_lock:
+            return self._load_reference_data()
+
+    def _load_reference_data(self):
+        if self.reference_df is None:
+            # O mesmo snapshot em que os modelos foram treinados, não o CSV semente
+            self.reference_df = load_dataset(self.training_path or self.record_store.export_csv())
+            self.ranges = feature_ranges(self.reference_df)
+            background = self.reference_df.sample(min(100, len(self.reference_df)), random_state=42)
+            self.explainer = AttributionExplainer(background)
+        return self.reference_df
+
+    def update_attributions(self):
+        bundle, row = self.bundle, self.original_data_df
+
+        def explain(task):
+            self.load_reference_data()
+            task.check_cancelled()
+            return self.explainer.explain(bundle, row)
+
+        for bars in self.contribution_bars.values():
+            bars.set_attribution(None)
+        self.task_pool.submit(
+            explain,
+            key='attribution',
+            on_result=self.set_attributions,
+            on_error=lambda message: print(f"Unable to compute feature contributions: {message}")
+        )
+
+    def set_attributions(self, attributions):
+        for model_name, bars in self.contribution_bars.items():
+            bars.set_attribution(attributions.get(model_name))
+
+    def build_what_if_frame(self):
+        what_if_frame = QFrame()
+        what_if_frame.setStyleSheet("QFrame { background-color: #FFFFFF; border-radius: 10px; border: 1px solid #E2E8F0; }")
+        what_if_layout = QVBoxLayout(what_if_frame)
+        what_if_layout.setContentsMargins(30, 25, 30, 25)
+        what_if_layout.setSpacing(15)
+
+        what_if_title = QLabel("What-if Analysis")
+        what_if_title.setFont(QFont("Segoe UI", 16, QFont.Weight.Bold))
+        what_if_title.setStyleSheet("color: #1E293B; background: transparent; border: none;")
+        what_if_layout.addWidget(what_if_title)
+
+        combo_style = """
+            QComboBox { background-color: #FFFFFF; color: #1E293B; border: 2px solid #E2E8F0; border-radius: 6px; padding: 6px 10px; font-size: 11px; }
+            QComboBox:focus { border: 2px solid #3B82F6; }
+        """
+        label_style = "color: #64748B; font-size: 11px; font-weight: 500; background: transparent; border: none;"
+
+        controls_layout = QHBoxLayout()
+        controls_layout.setSpacing(10)
+
+        feature_x_label = QLabel("Vary")
+        feature_x_label.setStyleSheet(label_style)
+        self.what_if_feature_x = QComboBox()
+        self.what_if_feature_x.addItems(METRIC_COLUMNS)
+        self.what_if_feature_x.setCurrentText("ENERGIA_REN")
+        self.what_if_feature_x.setStyleSheet(combo_style)
+
+        feature_y_label = QLabel("and")
+        feature_y_label.setStyleSheet(label_style)
+        self.what_if_feature_y = QComboBox()
+        self.what_if_feature_y.addItems(["(none)"] + METRIC_COLUMNS)
+        self.what_if_feature_y.setStyleSheet(combo_style)
+
+        run_button = QPushButton("Run Sweep")
+        run_button.setFont(QFont("Segoe UI", 11, QFont.Weight.Medium))
+        run_button.setStyleSheet("""
+            QPushButton { background-color: #3B82F6; color: #FFFFFF; border: none; padding: 8px 20px; border-radius: 6px; }
+            QPushButton:hover { background-color: #2563EB; }
+            QPushButton:pressed { background-color: #1D4ED8; }
+        """)
+        run_button.clicked.connect(self.run_what_if)
+
+        controls_layout.addWidget(feature_x_label)
+        controls_layout.addWidget(self.what_if_feature_x, 1)
+        controls_layout.addWidget(feature_y_label)
+        controls_layout.addWidget(self.what_if_feature_y, 1)
+        controls_layout.addWidget(run_button)
+        what_if_layout.addLayout(controls_layout)
+
+        # O gráfico é renderizado em Agg dentro do pool e chega pronto como imagem
+        self.what_if_plot = QLabel()
+        self.what_if_plot.setMinimumHeight(280)
+        self.what_if_plot.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.what_if_plot.setStyleSheet("background: transparent; border: none;")
+        what_if_layout.addWidget(self.what_if_plot)
+
+        self.what_if_status = QLabel("")
+        self.what_if_status.setStyleSheet("color: #94A3B8; font-size: 10px; background: transparent; border: none;")
+        what_if_layout.addWidget(self.what_if_status)
+        return what_if_frame
+
+    def run_what_if(self):
+        if self.original_data_df is None or self.bundle is None:
+            return
+        features = [self.what_if_feature_x.currentText()]
+        if self.what_if_feature_y.currentIndex() > 0 and self.what_if_feature_y.currentText() != features[0]:
+            features.append(self.what_if_feature_y.currentText())
+
+        bundle, row = self.bundle, self.original_data_df
+        width, height = max(self.what_if_plot.width(), 600), max(self.what_if_plot.height(), 280)
+
+        def sweep_and_render(task):
+            self.load_reference_data()
+            sweep = WhatIfEngine(bundle, self.ranges).sweep(row, features)
+            task.check_cancelled()
+            return sweep, render_what_if(sweep, width, height)
+
+        self.what_if_status.setText("Running sweep...")
+        self.task_pool.submit(
+            sweep_and_render,
+            key='what_if',
+            on_result=self.show_what_if,
+            on_error=lambda message: QMessageBox.critical(self, "What-if error", f"Unable to run the sweep: {message}")
+        )
+
+    def show_what_if(self, result):
+        sweep, rgba = result
+        image = QImage(rgba.data, rgba.shape[1], rgba.shape[0], rgba.strides[0], QImage.Format.Format_RGBA8888)
+        self.what_if_plot.setPixmap(QPixmap.fromImage(image.copy()))
+        self.what_if_status.setText(f"{sweep['points']} grid points scored in {sweep['seconds'] * 1000:.0f} ms")
+
+    def set_data(self, data_df, pred_tree, pred_mlp, pred_xgboost, bundle=None):
         self.original_data_df = data_df
+        self.bundle = bundle
         self.pred_tree_val = pred_tree
         self.pred_mlp_val = pred_mlp
         self.pred_xgboost_val = pred_xgboost
@@ -1045,6 +1682,10 @@ class ResultsAndSaveWindow(QWidget):
         self.label_pred_xgboost.setText(f"{self.pred_xgboost_val:.2f}")
         self.label_user_value.setText(f"{self.user_indice_val:.2f}")
         self.rb_user.setChecked(True)
+        self.what_if_plot.clear()
+        self.what_if_status.setText("")
+        if self.bundle is not None:
+            self.update_attributions()
 
     def discard_and_new(self):
         reply = QMessageBox.question(
@@ -1058,22 +1699,36 @@ class ResultsAndSaveWindow(QWidget):
         if reply == QMessageBox.StandardButton.Yes:
             self.clear_input_fields_and_go_back()
 
-    def append_to_csv(self, df_new_row):
-        try:
-            df_new_row_ordered = df_new_row[CSV_COLUMNS]
-            
-            try:
-                df_existing = pd.read_csv(CSV_PATH)
-            except (FileNotFoundError, pd.errors.EmptyDataError):
-                df_existing = pd.DataFrame(columns=CSV_COLUMNS)
-
-            df_combined = pd.concat([df_existing, df_new_row_ordered], ignore_index=True)
-            df_combined.to_csv(CSV_PATH, index=False, columns=CSV_COLUMNS)
-            return True
-        except Exception as e:
-            QMessageBox.critical(self, "Save Error", f"Unable to save the data to the CSV: {e}")
-            print(f"Erro detalhado ao salvar no CSV: {e}")
-            return False
+    def save_records(self, df_rows, message):
+        """A gravação roda no pool; o botão fica desabilitado até o banco responder."""
+        def save(task):
+            ids = self.record_store.insert(df_rows)
+            if self.company_index is not None:
+                for company in df_rows["EMPRESA"].unique():
+                    self.company_index.add(company)
+            return ids
+
+        self.save_button.setEnabled(False)
+        self.save_status.setText("Saving...")
+        self.task_pool.submit(
+            save,
+            key='save',
+            on_result=lambda ids: self.on_records_saved(ids, message),
+            on_error=self.on_save_error
+        )
+
+    def on_records_saved(self, ids, message):
+        print(f"Saved records with IDs {ids}")
+        self.save_button.setEnabled(True)
+        self.save_status.setText("")
+        QMessageBox.information(self, "Saved Successfully", f"{message}\nRecord ID: {', '.join(map(str, ids))}")
+        self.clear_input_fields_and_go_back()
+
+    def on_save_error(self, message):
+        self.save_button.setEnabled(True)
+        self.save_status.setText("")
+        QMessageBox.critical(self, "Save Error", f"Unable to save the data to the record store: {message}")
+        print(f"Erro detalhado ao salvar no banco: {message}")
 
     def save_choice_and_proceed(self):
         if self.original_data_df is None:
@@ -1081,63 +1736,32 @@ class ResultsAndSaveWindow(QWidget):
             return
 
         selected_id = self.radio_group.checkedId()
-        saved_successfully = False
-
-        if selected_id == 1:
-            df_to_save = self.original_data_df.copy()
-            df_to_save["INDICE_SUSTENTABILIDADE"] = round(self.pred_tree_val, 2)
-            if self.append_to_csv(df_to_save):
-                QMessageBox.information(self, "Saved Successfully", "✅ Data saved with the Regression Tree prediction.")
-                saved_successfully = True
-                
-        elif selected_id == 2:
-            df_to_save = self.original_data_df.copy()
-            df_to_save["INDICE_SUSTENTABILIDADE"] = round(self.pred_mlp_val, 2)
-            if self.append_to_csv(df_to_save):
-                QMessageBox.information(self, "Saved Successfully", "✅ Data saved with the MLP prediction.")
-                saved_successfully = True
+        predictions = {1: self.pred_tree_val, 2: self.pred_mlp_val, 3: self.pred_xgboost_val}
+        messages = {
+            1: "✅ Data saved with the Regression Tree prediction.",
+            2: "✅ Data saved with the MLP prediction.",
+            3: "✅ Data saved with the XGBoost prediction.",
+            4: "✅ The three predictions were saved as separate entries.",
+            5: "✅ Data saved with the original entered value."
+        }
 
-        elif selected_id == 3:
+        if selected_id in predictions:
             df_to_save = self.original_data_df.copy()
-            df_to_save["INDICE_SUSTENTABILIDADE"] = round(self.pred_xgboost_val, 2)
-            if self.append_to_csv(df_to_save):
-                QMessageBox.information(self, "Saved Successfully", "✅ Data saved with the XGBoost prediction.")
-                saved_successfully = True
-
+            df_to_save["INDICE_SUSTENTABILIDADE"] = round(predictions[selected_id], 2)
         elif selected_id == 4:
-            df_tree = self.original_data_df.copy()
-            df_tree["INDICE_SUSTENTABILIDADE"] = round(self.pred_tree_val, 2)
-            
-            df_mlp = self.original_data_df.copy()
-            df_mlp["INDICE_SUSTENTABILIDADE"] = round(self.pred_mlp_val, 2)
-
-            df_xgboost = self.original_data_df.copy()
-            df_xgboost["INDICE_SUSTENTABILIDADE"] = round(self.pred_xgboost_val, 2)
-
-            try:
-                df_existing = pd.read_csv(CSV_PATH)
-            except (FileNotFoundError, pd.errors.EmptyDataError):
-                 df_existing = pd.DataFrame(columns=CSV_COLUMNS)
-
-            df_combined = pd.concat([df_existing, df_tree[CSV_COLUMNS], df_mlp[CSV_COLUMNS], df_xgboost[CSV_COLUMNS]], ignore_index=True)
-            try:
-                df_combined.to_csv(CSV_PATH, index=False, columns=CSV_COLUMNS)
-                QMessageBox.information(self, "Saved Successfully", "✅ The three predictions were saved as separate entries.")
-                saved_successfully = True
-            except Exception as e:
-                 QMessageBox.critical(self, "Save error", f"Error to save the entries: {e}")
-
+            rows = []
+            for pred in predictions.values():
+                df_row = self.original_data_df.copy()
+                df_row["INDICE_SUSTENTABILIDADE"] = round(pred, 2)
+                rows.append(df_row)
+            df_to_save = pd.concat(rows, ignore_index=True)
         elif selected_id == 5:
             df_to_save = self.original_data_df.copy()
-            if self.append_to_csv(df_to_save):
-                QMessageBox.information(self, "Saved Successfully", "✅ Data saved with the original entered value.")
-                saved_successfully = True
         else:
             QMessageBox.warning(self, "error", "Please select one of the options")
             return
 
-        if saved_successfully:
-            self.clear_input_fields_and_go_back()
+        self.save_records(df_to_save, messages[selected_id])
 
     def clear_input_fields_and_go_back(self):
         input_w = self.stacked_widget.widget(0)
@@ -1145,8 +1769,107 @@ class ResultsAndSaveWindow(QWidget):
             input_w.clear_fields()
         self.stacked_widget.setCurrentIndex(0)
 
+class EvaluationWindow(QWidget):
+    """Métricas dos três modelos no split de validação e no dataset de teste."""
+
+    def __init__(self, stacked_widget, evaluator, datasets):
+        super().__init__()
+        self.stacked_widget = stacked_widget
+        self.evaluator = evaluator
+        self.datasets = datasets
+        self.worker = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(20)
+        layout.setContentsMargins(30, 30, 30, 30)
+        self.setStyleSheet("background-color: #F1F5F9;")
+
+        header_frame = QFrame()
+        header_frame.setStyleSheet("QFrame { background-color: #FFFFFF; border-radius: 10px; border: 1px solid #E2E8F0; }")
+        header_layout = QVBoxLayout(header_frame)
+        header_layout.setContentsMargins(25, 20, 25, 20)
+        header_layout.setSpacing(5)
+
+        title_label = QLabel("Model Evaluation")
+        title_label.setFont(QFont("Segoe UI", 24, QFont.Weight.Bold))
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title_label.setStyleSheet("color: #0F172A; background: transparent; border: none;")
+
+        self.status_label = QLabel("")
+        self.status_label.setFont(QFont("Segoe UI", 10))
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.status_label.setStyleSheet("color: #64748B; background: transparent; border: none;")
+
+        header_layout.addWidget(title_label)
+        header_layout.addWidget(self.status_label)
+        layout.addWidget(header_frame)
+
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels(["Dataset", "Model", "MAE", "MSE", "R²", "Rows"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setStyleSheet("""
+            QTableWidget { background-color: #FFFFFF; color: #1E293B; border: 1px solid #E2E8F0; border-radius: 10px; gridline-color: #E2E8F0; }
+            QHeaderView::section { background-color: #F8FAFC; color: #475569; border: none; padding: 8px; font-weight: 600; }
+        """)
+        layout.addWidget(self.table)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.setSpacing(15)
+
+        back_button = QPushButton("Back")
+        back_button.setFont(QFont("Segoe UI", 12, QFont.Weight.Medium))
+        back_button.setMinimumHeight(45)
+        back_button.setStyleSheet("""
+            QPushButton { background-color: #FFFFFF; color: #64748B; border: 2px solid #E2E8F0; padding: 12px 32px; border-radius: 8px; }
+            QPushButton:hover { background-color: #F8FAFC; border: 2px solid #CBD5E1; color: #475569; }
+        """)
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(back_button)
+        buttons_layout.addStretch()
+        layout.addLayout(buttons_layout)
+
+    def refresh(self, bundle):
+        if self.evaluator is None or not self.datasets:
+            self.status_label.setText("No evaluation datasets configured")
+            return
+        if self.worker is not None:
+            return
+        self.status_label.setText(f"Evaluating models {bundle.version or '(not registered)'}...")
+        self.worker = EvaluationWorker(self.evaluator, bundle, self.datasets)
+        self.worker.reports_ready.connect(self.set_reports)
+        self.worker.evaluation_failed.connect(lambda msg: self.status_label.setText(f"Evaluation failed: {msg}"))
+        self.worker.finished.connect(self.worker_finished)
+        self.worker.start()
+
+    def worker_finished(self):
+        self.worker = None
+
+    def set_reports(self, reports):
+        rows = [
+            (name, model_name, metrics)
+            for name, report in reports.items()
+            for model_name, metrics in report['models'].items()
+        ]
+        self.table.setRowCount(len(rows))
+        for i, (name, model_name, metrics) in enumerate(rows):
+            values = [name, model_name, f"{metrics['MAE']:.5f}", f"{metrics['MSE']:.6f}", f"{metrics['R2']:.4f}", str(metrics['rows'])]
+            for j, value in enumerate(values):
+                self.table.setItem(i, j, QTableWidgetItem(value))
+
+        versions = {report['model_version'] for report in reports.values()}
+        self.status_label.setText(f"Models {', '.join(sorted(versions))}")
+
+
 class IntegratedMainWindow(QWidget):
-    def __init__(self, reg_tree, mlp_nn, xg_boost, preprocessor, orchestrator):
+    def __init__(self, reg_tree, mlp_nn, xg_boost, preprocessor, orchestrator, registry=None, bundle=None,
+                 evaluator=None, evaluation_datasets=None, record_store=None, drift_monitor=None, governor=None,
+                 profiler=None, training_path=None):
         super().__init__()
         self.setWindowTitle("ESG Platform")
         self.setGeometry(100, 100, 1400, 800)
@@ -1168,11 +1891,23 @@ class IntegratedMainWindow(QWidget):
         self.separator.setVisible(False)
 
         self.form_stacked_widget = QStackedWidget()
-        self.input_window = InputWindow(self.form_stacked_widget, reg_tree, mlp_nn, xg_boost, preprocessor)
-        self.results_save_window = ResultsAndSaveWindow(self.form_stacked_widget)
+        record_store = record_store or RecordStore()
+        company_index = CompanyIndex.from_store(record_store)
+        # Um pool para a janela toda: predições, gravações, atribuições e what-if (e o drift, em segundo plano)
+        self.task_pool = TaskPool(parent=self, governor=governor)
+        self.input_window = InputWindow(
+            self.form_stacked_widget, reg_tree, mlp_nn, xg_boost, preprocessor, bundle,
+            record_store=record_store, company_index=company_index, task_pool=self.task_pool,
+            drift_monitor=drift_monitor, profiler=profiler
+        )
+        self.results_save_window = ResultsAndSaveWindow(
+            self.form_stacked_widget, record_store, company_index, self.task_pool, training_path=training_path
+        )
+        self.evaluation_window = EvaluationWindow(self.form_stacked_widget, evaluator, evaluation_datasets)
 
         self.form_stacked_widget.addWidget(self.input_window)
         self.form_stacked_widget.addWidget(self.results_save_window)
+        self.form_stacked_widget.addWidget(self.evaluation_window)
 
         self.main_horizontal.addWidget(self.chat_panel)
         self.main_horizontal.addWidget(self.separator)
@@ -1187,6 +1922,13 @@ class IntegratedMainWindow(QWidget):
 
         QTimer.singleShot(100, self.position_chat_button)
 
+        self.registry_watcher = None
+        if registry is not None:
+            # Só reage a promoções feitas depois da abertura do app
+            self.registry_watcher = RegistryWatcher(registry, registry.current_version(), parent=self)
+            self.registry_watcher.bundle_changed.connect(self.input_window.swap_bundle)
+            self.registry_watcher.load_failed.connect(self.input_window.show_registry_error)
+
     def position_chat_button(self):
         margin = 30
         button_x = self.width() - self.chat_button.width() - margin
@@ -1204,6 +1946,15 @@ class IntegratedMainWindow(QWidget):
         if hasattr(self, 'chat_button'):
             self.position_chat_button()
 
+    def closeEvent(self, event):
+        # Tarefas na fila são descartadas; as que estão rodando terminam a etapa atual
+        self.task_pool.shutdown()
+        if self.input_window.drift_monitor is not None:
+            self.input_window.drift_monitor.save_state()
+        if hasattr(self.chat_panel.orchestrator, 'close'):
+            self.chat_panel.orchestrator.close()
+        super().closeEvent(event)
+
     def toggle_chat(self):
         if self.is_chat_visible:
             # Fechar o chat
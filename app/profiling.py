@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import linecache
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+"""
+    Modo de profiling do main.py (--profile DIR ou ISE_PROFILE=DIR)
+    - Etapas (stage): tempo de parede, CPU e memória alocada no Python (tracemalloc) de
+      cada fase da partida: tratamento, treinos, avaliação, carga do LLM, UI e as
+      primeiras predições.
+    - cProfile: um perfil para a thread principal (main.prof) e um por tarefa profilada
+      nas threads do pool (task-NN-<etapa>.prof); abrir com pstats ou snakeviz.
+    - Pilhas colapsadas (stacks.collapsed): uma thread amostra sys._current_frames() de
+      todas as threads a cada poucos ms; o formato "thread;f1;f2 contagem" é o do
+      flamegraph.pl/speedscope.
+    - allocations.txt: maiores alocadores no fim e o que cada etapa alocou (diferença
+      entre os snapshots do tracemalloc).
+    Desligado (out_dir=None), toda chamada é um no-op e o custo é zero.
+"""
+
+PROFILE_ENV = 'ISE_PROFILE'
+SAMPLE_INTERVAL = 0.005
+# Cada quadro a mais no tracemalloc encarece toda alocação: com 1 o treino fica ~4x mais lento, com 25 ~40x
+TRACE_FRAMES = 1
+TOP_ALLOCATORS = 30
+FIRST_PREDICTIONS = 3
+
+
+def frame_label(code):
+    # Código do projeto com caminho relativo; bibliotecas só com o nome do arquivo
+    path = code.co_filename
+    short = os.path.relpath(path) if path.startswith(os.getcwd()) else os.path.basename(path)
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Amostra as pilhas de todas as threads; as contagens viram as larguras do flamegraph."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+        self._done = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._done.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = self._labels.get(code)
+                    if label is None:
+                        label = self._labels[code] = frame_label(code)
+                    labels.append(label)
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    def __init__(self, out_dir=None, first_predictions=FIRST_PREDICTIONS, sample_interval=SAMPLE_INTERVAL,
+                 trace_frames=TRACE_FRAMES):
+        self.out_dir = out_dir
+        self.first_predictions = first_predictions
+        self.sample_interval = sample_interval
+        self.trace_frames = trace_frames
+        self.stages = []
+        self.snapshots = []
+        self.profile = None
+        self.sampler = None
+        self.start_time = None
+        self._lock = threading.Lock()
+        self._task_counts = Counter()
+        self._task_profiles = []
+        self._finished = False
+
+    @classmethod
+    def from_args(cls, out_dir=None):
+        """--profile tem precedência sobre a variável de ambiente."""
+        return cls(out_dir or os.environ.get(PROFILE_ENV) or None)
+
+    @property
+    def enabled(self):
+        return self.out_dir is not None
+
+    def start(self):
+        if not self.enabled:
+            return self
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.start_time = time.perf_counter()
+        tracemalloc.start(self.trace_frames)
+        self.snapshots.append(('start', tracemalloc.take_snapshot()))
+        self.sampler = StackSampler(self.sample_interval)
+        self.sampler.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        print(f"Profiling enabled; output goes to {self.out_dir}")
+        return self
+
+    def _record(self, name, wall, cpu, thread, **extra):
+        with self._lock:
+            self.stages.append({
+                'stage': name,
+                'thread': thread,
+                'start': round(time.perf_counter() - wall - self.start_time, 4),
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4) if cpu is not None else None,
+                **extra
+            })
+
+    @contextmanager
+    def stage(self, name):
+        """Etapa da thread principal: tempos, pico do tracemalloc e um snapshot no fim."""
+        if not self.enabled or self._finished:
+            yield
+            return
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            current, peak = tracemalloc.get_traced_memory()
+            self._record(name, wall, cpu, threading.current_thread().name,
+                         allocated_mb=round((current - before) / 2**20, 2), peak_mb=round(peak / 2**20, 2))
+            self.snapshots.append((name, tracemalloc.take_snapshot()))
+
+    @contextmanager
+    def task_stage(self, name):
+        """Etapa numa thread do pool: só as primeiras 'first_predictions' de cada nome ganham um cProfile próprio."""
+        if not self.enabled or self._finished:
+            yield
+            return
+        with self._lock:
+            self._task_counts[name] += 1
+            index = self._task_counts[name]
+        if index > self.first_predictions:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: só um profiler ativo por vez; a etapa fica só com o tempo
+            profile = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            self._record(f"{name} #{index}", wall, cpu, threading.current_thread().name)
+            if profile is not None:
+                with self._lock:
+                    self._task_profiles.append((f"{name} #{index}", profile))
+
+    def watch(self, name, wait):
+        """Mede, numa thread à parte, quanto falta até wait() voltar (ex.: o worker do LLM ficar pronto)."""
+        if not self.enabled:
+            return
+
+        def run():
+            start = time.perf_counter()
+            try:
+                wait()
+                status = 'ok'
+            except Exception as e:
+                status = f"{type(e).__name__}: {e}"
+            self._record(name, time.perf_counter() - start, None, 'watcher', status=status)
+
+        threading.Thread(target=run, name=f'profile-watch-{name}', daemon=True).start()
+
+    def finish(self):
+        if not self.enabled or self._finished:
+            return
+        self._finished = True
+        self.profile.disable()
+        self.sampler.stop()
+        final = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        self.profile.dump_stats(os.path.join(self.out_dir, 'main.prof'))
+        with open(os.path.join(self.out_dir, 'main-top.txt'), 'w', encoding='utf-8') as f:
+            pstats.Stats(self.profile, stream=f).sort_stats('cumulative').print_stats(60)
+        for i, (name, profile) in enumerate(self._task_profiles, start=1):
+            slug = name.replace(' ', '_').replace('#', '')
+            profile.dump_stats(os.path.join(self.out_dir, f"task-{i:02d}-{slug}.prof"))
+        self.sampler.write(os.path.join(self.out_dir, 'stacks.collapsed'))
+        self._write_allocations(final)
+
+        total = time.perf_counter() - self.start_time
+        with open(os.path.join(self.out_dir, 'stages.json'), 'w', encoding='utf-8') as f:
+            json.dump({'total_seconds': round(total, 3), 'samples': self.sampler.samples, 'stages': self.stages}, f, indent=2)
+        self.print_report(total)
+
+    def _write_allocations(self, final):
+        # Sem as alocações do próprio profiler (pilhas amostradas, snapshots)
+        ignore = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+        final = final.filter_traces(ignore)
+        self.snapshots = [(name, snapshot.filter_traces(ignore)) for name, snapshot in self.snapshots]
+        with open(os.path.join(self.out_dir, 'allocations.txt'), 'w', encoding='utf-8') as f:
+            f.write(f"Top {TOP_ALLOCATORS} allocators still alive at exit (by line)\n")
+            for stat in final.statistics('lineno')[:TOP_ALLOCATORS]:
+                frame = stat.traceback[0]
+                line = linecache.getline(frame.filename, frame.lineno).strip()
+                f.write(f"  {stat.size / 2**20:9.2f} MB {stat.count:9d} blocks  {frame.filename}:{frame.lineno}  {line}\n")
+
+            top = final.statistics('traceback')[:1] if self.trace_frames > 1 else []
+            for stat in top:
+                f.write("\nLargest allocation traceback\n")
+                f.write(f"  {stat.size / 2**20:.2f} MB in {stat.count} blocks\n")
+                for line in stat.traceback.format():
+                    f.write(f"  {line}\n")
+
+            previous = None
+            for name, snapshot in self.snapshots:
+                if previous is not None:
+                    diff = snapshot.compare_to(previous, 'lineno')
+                    f.write(f"\nStage '{name}': top allocations\n")
+                    for stat in diff[:10]:
+                        frame = stat.traceback[0]
+                        f.write(f"  {stat.size_diff / 2**20:+9.2f} MB {stat.count_diff:+9d} blocks  {frame.filename}:{frame.lineno}\n")
+                previous = snapshot
+
+    def print_report(self, total):
+        print(f"\nProfile ({total:.1f} s total) written to {self.out_dir}")
+        print(f"  {'stage':<28} {'thread':<16} {'wall s':>8} {'cpu s':>8} {'alloc MB':>9}")
+        for stage in self.stages:
+            cpu = '' if stage['cpu_seconds'] is None else f"{stage['cpu_seconds']:8.2f}"
+            alloc = f"{stage['allocated_mb']:9.1f}" if 'allocated_mb' in stage else ''
+            print(f"  {stage['stage']:<28} {stage['thread'][:16]:<16} {stage['wall_seconds']:8.2f} {cpu:>8} {alloc:>9}")
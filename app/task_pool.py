@@ -0,0 +1,167 @@
+import threading
+import traceback
+from contextlib import contextmanager, nullcontext
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+"""
+    Pool limitado de workers para tirar predição e gravação da thread da UI
+    Cada tarefa roda num QThreadPool com número fixo de threads e devolve o
+    resultado, o progresso e os erros por sinais Qt, que chegam na thread da UI
+    como conexões enfileiradas. O cancelamento é cooperativo: a tarefa chama
+    task.check_cancelled() entre etapas.
+    Prioridade: tarefas abaixo de PRIORITY_INTERACTIVE vão para um pool de fundo
+    separado, rodam com o orçamento 'background' do ResourceGovernor e, a cada
+    check_cancelled(), esperam enquanto houver tarefa interativa rodando. Dentro de
+    cada pool a fila sai por prioridade.
+"""
+
+MAX_WORKERS = 2
+BACKGROUND_WORKERS = 1
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(int, int, str)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    done = pyqtSignal()
+
+
+class Task(QRunnable):
+    def __init__(self, fn, key=None, budget='interactive', gate=None, context=None):
+        super().__init__()
+        self.fn = fn
+        self.key = key
+        self.budget = budget
+        self.signals = TaskSignals()
+        self._cancel = threading.Event()
+        # gate: evento que fica livre quando não há tarefa interativa; context: orçamento de threads
+        self._gate = gate
+        self._context = context or nullcontext
+        # O pool guarda a referência em Python; o Qt não deve apagar o objeto sozinho
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._gate is not None:
+            while not self._gate.wait(0.05) and not self._cancel.is_set():
+                pass
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    def report(self, step, total, message=""):
+        self.check_cancelled()
+        self.signals.progress.emit(step, total, message)
+
+    def run(self):
+        try:
+            with self._context():
+                self.check_cancelled()
+                result = self.fn(self)
+                self.check_cancelled()
+            self.signals.result.emit(result)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        finally:
+            self.signals.done.emit()
+
+
+class TaskPool(QObject):
+    def __init__(self, max_workers=MAX_WORKERS, parent=None, governor=None, background_workers=BACKGROUND_WORKERS):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.background_pool = QThreadPool(self)
+        self.background_pool.setMaxThreadCount(background_workers)
+        self.governor = governor
+        self._tasks = set()
+        self._by_key = {}
+        self._interactive_lock = threading.Lock()
+        self._interactive_running = 0
+        self._interactive_idle = threading.Event()
+        self._interactive_idle.set()
+
+    @contextmanager
+    def _running(self, task):
+        interactive = task.budget == 'interactive'
+        if interactive:
+            with self._interactive_lock:
+                self._interactive_running += 1
+                self._interactive_idle.clear()
+        try:
+            with (self.governor.limit(task.budget) if self.governor is not None else nullcontext()):
+                yield
+        finally:
+            if interactive:
+                with self._interactive_lock:
+                    self._interactive_running -= 1
+                    if self._interactive_running == 0:
+                        self._interactive_idle.set()
+
+    def submit(self, fn, on_result=None, on_error=None, on_progress=None, on_cancelled=None, key=None,
+               priority=PRIORITY_INTERACTIVE):
+        """fn(task) roda no pool. Com 'key', uma nova tarefa cancela a anterior de mesma chave."""
+        if key is not None and key in self._by_key:
+            self._by_key[key].cancel()
+
+        interactive = priority >= PRIORITY_INTERACTIVE
+        task = Task(
+            fn, key,
+            budget='interactive' if interactive else 'background',
+            gate=None if interactive else self._interactive_idle,
+            context=lambda: self._running(task)
+        )
+        if on_result is not None:
+            task.signals.result.connect(on_result)
+        if on_error is not None:
+            task.signals.error.connect(on_error)
+        if on_progress is not None:
+            task.signals.progress.connect(on_progress)
+        if on_cancelled is not None:
+            task.signals.cancelled.connect(on_cancelled)
+        task.signals.done.connect(lambda: self._finished(task))
+
+        self._tasks.add(task)
+        if key is not None:
+            self._by_key[key] = task
+        (self.pool if interactive else self.background_pool).start(task, priority)
+        return task
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        if task.key is not None and self._by_key.get(task.key) is task:
+            del self._by_key[task.key]
+
+    def cancel(self, key):
+        task = self._by_key.get(key)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    def is_running(self, key):
+        return key in self._by_key
+
+    def shutdown(self, timeout_ms=5000):
+        self.cancel_all()
+        self.pool.clear()
+        self.background_pool.clear()
+        done = self.pool.waitForDone(timeout_ms)
+        return self.background_pool.waitForDone(timeout_ms) and done
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import importlib.util
+import threading
+import numpy as np
+from models.llm_worker import LLMWorkerClient, load_factory
+from gemma_ft.data_pipeline import DATASET_PATH
+
+"""
+    Teste de carga do chat: vários usuários perguntando ao mesmo tempo
+    Perguntas sorteadas do dataset de fine-tune são repetidas em laço fechado por
+    'concurrency' usuários (cada um com sua sessão) contra o ISEOrchestrator no
+    processo ou através do LLMWorkerClient. O tamanho das respostas (--max-new-tokens)
+    vai como argumento da factory nos dois modos, então medem a mesma carga.
+    --build-tiny grava um LM causal mínimo (GPT-2 de 2 camadas, pesos aleatórios,
+    tokenizer BPE treinado nas próprias perguntas) num diretório que o load_model abre
+    como modelo preparado, para rodar sem o Gemma. Esse caminho exige torch,
+    transformers e tokenizers e ainda não foi medido de ponta a ponta; os números
+    dele são só uma referência até serem conferidos contra o Gemma.
+    Métricas por nível de concorrência: tempo até o primeiro pedaço, tokens/s por
+    requisição e agregado, latência p50/p95/p99, divisão guard vs resposta (só no
+    processo, onde o _is_blocked pode ser cronometrado) e pico de memória.
+    Números de guard medidos antes de o _is_blocked passar os limites como kwargs do
+    invoke não valem: o guard gerava até os 500 tokens padrão. O JSON agora grava o
+    GUARD_INVOCATION do orquestrador; resultados sem esse campo precisam ser refeitos.
+    Uso: python -m benchmarks.chat_load --build-tiny data/cache/tiny-chat-lm
+         python -m benchmarks.chat_load --model data/cache/tiny-chat-lm --concurrency 1 2 4 8 [--worker]
+"""
+
+PROMPTS_PATH = 'prompts/brain_prompt.yaml'
+FACTORY = 'models.gemma_orchestrator:ISEOrchestrator'
+
+
+def require(*modules):
+    """Falha logo, com uma mensagem clara, se faltar alguma dependência do caminho com LM."""
+    missing = [name for name in modules if importlib.util.find_spec(name) is None]
+    if missing:
+        raise SystemExit(f"error: this mode needs the Python modules {', '.join(missing)}, which are not installed")
+
+
+def load_questions(path, n, seed):
+    with open(path, 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+    rng = random.Random(seed)
+    return [example['instruction'].strip() for example in rng.sample(examples, min(n, len(examples)))]
+
+
+def build_tiny(out_dir, dataset_path=DATASET_PATH, vocab_size=2048):
+    """LM causal mínimo no formato que o load_model abre direto (manifesto de modelo preparado, sem quantização)."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, decoders, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+    from models.gemma_loader import MANIFEST
+
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+    texts = [f"{e['instruction']}\n{e.get('input', '')}\n{e['output']}" for e in examples]
+    with open(PROMPTS_PATH, 'r', encoding='utf-8') as f:
+        texts.append(f.read())
+
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(texts, trainers.BpeTrainer(
+        vocab_size=vocab_size, special_tokens=['<pad>', '<bos>', '<eos>'],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token='<bos>', eos_token='<eos>', pad_token='<pad>')
+
+    config = GPT2Config(vocab_size=len(tokenizer), n_positions=4096, n_embd=128, n_layer=2, n_head=4,
+                        bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id)
+    model = GPT2LMHeadModel(config)
+    os.makedirs(out_dir, exist_ok=True)
+    model.save_pretrained(out_dir, safe_serialization=True)
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump({'source': 'benchmarks.chat_load tiny stand-in', 'quantization': 'none'}, f, indent=2)
+    print(f"Tiny stand-in LM ({sum(p.numel() for p in model.parameters()) / 1e6:.1f}M params, "
+          f"vocab {len(tokenizer)}) written to {out_dir}")
+    return out_dir
+
+
+def peak_rss_mb(pid=None):
+    """Pico de RSS (VmHWM) de um processo; sem pid, o deste."""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open(f'/proc/{pid}/status', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+class GuardTimer:
+    """Cronometra o _is_blocked do orquestrador por thread, para separar o guard da resposta."""
+
+    def __init__(self, orchestrator):
+        self.local = threading.local()
+        self.available = hasattr(orchestrator, '_is_blocked')
+        if self.available:
+            is_blocked = orchestrator._is_blocked
+
+            def timed(question):
+                start = time.perf_counter()
+                try:
+                    return is_blocked(question)
+                finally:
+                    self.local.seconds = time.perf_counter() - start
+
+            orchestrator._is_blocked = timed
+
+    def take(self):
+        seconds = getattr(self.local, 'seconds', None)
+        self.local.seconds = None
+        return seconds
+
+
+def run_level(orchestrator, guard, count_tokens, questions, concurrency, n_requests, max_seconds):
+    """Laço fechado: cada usuário manda a próxima pergunta assim que recebe a resposta anterior."""
+    lock = threading.Lock()
+    next_index = [0]
+    records = []
+    deadline = time.perf_counter() + max_seconds
+
+    def user(user_id):
+        session = f"load-{concurrency}-{user_id}"
+        while time.perf_counter() < deadline:
+            with lock:
+                if next_index[0] >= n_requests:
+                    return
+                question = questions[next_index[0] % len(questions)]
+                next_index[0] += 1
+            start = time.perf_counter()
+            first = None
+            chunks = []
+            error = None
+            try:
+                for chunk in orchestrator.stream_response(question, session):
+                    if first is None:
+                        first = time.perf_counter() - start
+                    chunks.append(chunk)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            total = time.perf_counter() - start
+            text = ''.join(chunks)
+            with lock:
+                records.append({
+                    'ttft': first, 'total': total, 'guard': guard.take(),
+                    'tokens': count_tokens(text) if text else 0, 'error': error
+                })
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records, time.perf_counter() - start
+
+
+def summarize(concurrency, records, wall):
+    ok = [r for r in records if r['error'] is None]
+    if not ok:
+        return {'concurrency': concurrency, 'requests': len(records), 'errors': len(records)}
+    total = np.array([r['total'] for r in ok])
+    ttft = np.array([r['ttft'] for r in ok if r['ttft'] is not None])
+    tokens = np.array([r['tokens'] for r in ok])
+    guard = np.array([r['guard'] for r in ok if r['guard'] is not None])
+    # Vazão por requisição: tokens depois do primeiro pedaço sobre o tempo de decodificação
+    decode = np.array([r['tokens'] / (r['total'] - r['ttft']) for r in ok
+                       if r['ttft'] is not None and r['total'] > r['ttft'] and r['tokens'] > 1])
+    return {
+        'concurrency': concurrency,
+        'requests': len(records),
+        'errors': len(records) - len(ok),
+        'ttft_p50': float(np.percentile(ttft, 50)) if len(ttft) else None,
+        'ttft_p95': float(np.percentile(ttft, 95)) if len(ttft) else None,
+        'latency_p50': float(np.percentile(total, 50)),
+        'latency_p95': float(np.percentile(total, 95)),
+        'latency_p99': float(np.percentile(total, 99)),
+        'tokens_per_s_request': float(np.median(decode)) if len(decode) else None,
+        'tokens_per_s_total': float(tokens.sum() / wall),
+        'guard_share': float(guard.sum() / total.sum()) if len(guard) else None,
+        'guard_p50': float(np.percentile(guard, 50)) if len(guard) else None,
+    }
+
+
+def fmt(value, scale=1.0, digits=2):
+    return '-' if value is None else f"{value * scale:.{digits}f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat load test")
+    parser.add_argument('--build-tiny', metavar='DIR', help="write the tiny stand-in LM to DIR and exit")
+    parser.add_argument('--model', help="model directory (e.g. the tiny stand-in or models/gemma-2b-FT)")
+    parser.add_argument('--prompts', default=PROMPTS_PATH)
+    parser.add_argument('--factory', default=FACTORY, help="orchestrator class as module:Class")
+    parser.add_argument('--worker', action='store_true', help="go through LLMWorkerClient instead of in-process")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=32, help="requests per concurrency level")
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    parser.add_argument('--max-seconds', type=float, default=600, help="time cap per level")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="also write the summaries as JSON")
+    args = parser.parse_args()
+
+    if args.build_tiny:
+        require('torch', 'transformers', 'tokenizers')
+        build_tiny(args.build_tiny, args.dataset)
+        return 0
+    if not args.model:
+        parser.error("--model is required (build a stand-in with --build-tiny DIR)")
+    if args.factory == FACTORY:
+        require('torch', 'transformers', 'langchain_core')
+
+    questions = load_questions(args.dataset, max(args.requests, 256), args.seed)
+    # Respostas de tamanho fixo: o stand-in com pesos aleatórios quase nunca gera o EOS.
+    # Uma factory que não aceite o argumento falha na criação, nos dois modos
+    factory_kwargs = {'max_new_tokens': args.max_new_tokens}
+    start = time.perf_counter()
+    if args.worker:
+        # Sem restarts: um erro na criação do orquestrador aparece de imediato
+        orchestrator = LLMWorkerClient(args.model, args.prompts, factory=args.factory,
+                                       factory_kwargs=factory_kwargs, max_restarts=0).start()
+        orchestrator.wait_ready()
+        worker_pid = orchestrator.process.pid
+    else:
+        orchestrator = load_factory(args.factory)(args.model, args.prompts, **factory_kwargs)
+        worker_pid = None
+    load_seconds = time.perf_counter() - start
+    print(f"Loaded {args.factory} from {args.model} in {load_seconds:.1f} s "
+          f"({'worker process' if args.worker else 'in-process'})")
+
+    tokenizer = getattr(getattr(orchestrator, 'llm', None), 'tokenizer', None)
+    if tokenizer is None and args.worker:
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(args.model)
+        except Exception:
+            tokenizer = None
+    if tokenizer is not None:
+        count_tokens = lambda text: len(tokenizer(text, add_special_tokens=False)['input_ids'])
+    else:
+        # Sem tokenizer local (ex.: orquestrador de teste), conta palavras
+        count_tokens = lambda text: len(text.split())
+    guard = GuardTimer(orchestrator)
+
+    # Uma pergunta de aquecimento fora da medição
+    ''.join(orchestrator.stream_response(questions[0], 'warmup'))
+    guard.take()
+
+    summaries = []
+    print(f"\n{'users':>5} {'reqs':>5} {'err':>4} {'ttft50 ms':>10} {'ttft95 ms':>10} {'p50 s':>7} {'p95 s':>7} "
+          f"{'p99 s':>7} {'tok/s req':>10} {'tok/s all':>10} {'guard %':>8} {'peak MB':>8}")
+    try:
+        for concurrency in args.concurrency:
+            records, wall = run_level(orchestrator, guard, count_tokens, questions, concurrency,
+                                      args.requests, args.max_seconds)
+            summary = summarize(concurrency, records, wall)
+            summary['peak_rss_mb'] = peak_rss_mb(worker_pid)
+            summaries.append(summary)
+            print(f"{concurrency:5d} {summary['requests']:5d} {summary['errors']:4d} "
+                  f"{fmt(summary.get('ttft_p50'), 1000, 1):>10} {fmt(summary.get('ttft_p95'), 1000, 1):>10} "
+                  f"{fmt(summary.get('latency_p50')):>7} {fmt(summary.get('latency_p95')):>7} "
+                  f"{fmt(summary.get('latency_p99')):>7} {fmt(summary.get('tokens_per_s_request'), 1, 1):>10} "
+                  f"{fmt(summary.get('tokens_per_s_total'), 1, 1):>10} {fmt(summary.get('guard_share'), 100, 1):>8} "
+                  f"{summary['peak_rss_mb']:8.0f}")
+    finally:
+        if hasattr(orchestrator, 'close'):
+            orchestrator.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'worker': args.worker, 'load_seconds': load_seconds,
+                       'guard_invocation': getattr(orchestrator, 'GUARD_INVOCATION', None),
+                       'levels': summaries}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from gemma_ft.data_pipeline import DATASET_PATH
+from gemma_ft.dedup import Deduplicator
+
+"""
+    Escala do detector de quase-duplicatas: tempo por registro deve ficar constante
+    O dataset é replicado com uma palavra trocada por cópia para criar quase-duplicatas novas.
+    Uso: python -m benchmarks.dedup
+"""
+
+
+def perturbed(examples, copies, seed=0):
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(copies):
+        for ex in examples:
+            words = ex['output'].split()
+            if words:
+                words[rng.integers(len(words))] = f"w{rng.integers(1 << 30)}"
+            out.append({**ex, 'output': ' '.join(words)})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MinHash/LSH deduplication scaling benchmark")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+
+    dedup = Deduplicator()
+    print(f"{'records':>9} {'clusters':>9} {'seconds':>8} {'us/record':>10}")
+    for scale in args.scales:
+        data = perturbed(examples, scale)
+        start = time.perf_counter()
+        result = dedup.run(data)
+        seconds = time.perf_counter() - start
+        print(f"{len(data):9d} {result['clusters']:9d} {seconds:8.2f} {seconds / len(data) * 1e6:10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+"""
+    Cold start do Gemma: checkpoint original (cópia + quantização a cada carga) vs
+    modelo preparado (safetensors int8 por mmap), com e sem warmup
+    Cada caso roda num processo novo, para medir carga, latência do primeiro token
+    da primeira pergunta real e RSS sem nada herdado do caso anterior.
+    Uso: python -m benchmarks.gemma_cold_start [--model models/gemma-2b-FT] [--quantization none]
+         (rode antes: python -m models.gemma_loader prepare)
+"""
+
+QUESTION = (
+    "### User Question:\nWhich dimensions does the ISE B3 questionnaire assess?\n\n"
+    "### Assistant Response:\n"
+)
+CASES = (
+    ('original', False, False),
+    ('original + warmup', False, True),
+    ('prepared', True, False),
+    ('prepared + warmup', True, True),
+)
+
+
+def rss_mb():
+    with open('/proc/self/status', 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def child(args):
+    import torch
+    from models.gemma_loader import load_model, warmup
+
+    start = time.perf_counter()
+    tokenizer, model, prepared = load_model(args.model, args.quantization, use_prepared=args.prepared)
+    load_seconds = time.perf_counter() - start
+
+    warmup_seconds = 0.0
+    if args.warmup:
+        start = time.perf_counter()
+        warmup(model, tokenizer)
+        warmup_seconds = time.perf_counter() - start
+
+    inputs = tokenizer(QUESTION, return_tensors="pt").to(model.device)
+    start = time.perf_counter()
+    with torch.inference_mode():
+        model.generate(**inputs, max_new_tokens=1, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    first_token = time.perf_counter() - start
+
+    print(json.dumps({
+        'prepared': prepared,
+        'load_seconds': load_seconds,
+        'warmup_seconds': warmup_seconds,
+        'first_token_ms': first_token * 1000,
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gemma cold start benchmark")
+    parser.add_argument('--model', default='models/gemma-2b-FT')
+    parser.add_argument('--quantization', choices=('int8', 'none'), default='int8')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--prepared', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--warmup', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    print(f"{'case':<20} {'load s':>8} {'warmup s':>9} {'1st token ms':>13} {'RSS MB':>8} {'peak MB':>8}")
+    for name, prepared, warm in CASES:
+        cmd = [sys.executable, '-m', 'benchmarks.gemma_cold_start', '--child',
+               '--model', args.model, '--quantization', args.quantization]
+        cmd += ['--prepared'] if prepared else []
+        cmd += ['--warmup'] if warm else []
+        out = subprocess.run(cmd, capture_output=True, text=True, env=os.environ)
+        if out.returncode != 0:
+            print(f"{name:<20} failed:\n{out.stderr.strip()[-500:]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        if prepared and not r['prepared']:
+            name += ' (missing)'
+        print(f"{name:<20} {r['load_seconds']:8.2f} {r['warmup_seconds']:9.2f} {r['first_token_ms']:13.1f} "
+              f"{r['rss_mb']:8.0f} {r['peak_rss_mb']:8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
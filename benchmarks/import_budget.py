@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+
+"""
+    Orçamento de imports dos comandos do main.py
+    Cada comando roda num subprocesso limpo; no fim, a lista de sys.modules é comparada
+    com os módulos proibidos para ele (ex.: o score não pode carregar PyQt6 nem torch,
+    o chat headless não pode carregar sklearn/xgboost no processo principal) e o
+    --help tem um teto de tempo. Sai com código 1 se algum orçamento estourar, então
+    serve de verificação antes de um commit que mexa nos imports.
+    O train publica num registro temporário, que o evaluate e o score usam em seguida;
+    o cache de avaliações também fica num diretório temporário, fora do cache real.
+    Uso: python -m benchmarks.import_budget [--help-budget 0.5]
+"""
+
+GUI_AND_LLM = ('PyQt6', 'torch', 'transformers', 'langchain_core', 'matplotlib')
+TABULAR = ('numpy', 'pandas', 'sklearn', 'scipy', 'xgboost')
+
+WRAPPER = """
+import sys, json, atexit
+out = sys.argv[1]
+atexit.register(lambda: json.dump(sorted(sys.modules), open(out, 'w')))
+sys.argv = ['main.py'] + sys.argv[2:]
+sys.path.insert(0, '.')
+import main
+sys.exit(main.main(sys.argv[1:]))
+"""
+
+
+class EchoOrchestrator:
+    """Orquestrador sem modelo para o chat headless: devolve a pergunta palavra por palavra."""
+
+    def __init__(self, model_path, prompts_path):
+        pass
+
+    def reset_session(self, session_id="default"):
+        pass
+
+    def stream_response(self, question, session_id="default", stop_event=None):
+        for word in question.split():
+            yield word + ' '
+
+    def get_response(self, question, session_id="default"):
+        return ''.join(self.stream_response(question, session_id)).strip()
+
+
+def run(argv, stdin=None, env=None):
+    """(segundos, módulos carregados, código de saída, saída) do main.py com esses argumentos."""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        modules_path = f.name
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-c', WRAPPER, modules_path, *argv],
+        input=stdin, capture_output=True, text=True, env=env
+    )
+    seconds = time.perf_counter() - start
+    with open(modules_path, 'r', encoding='utf-8') as f:
+        modules = set(json.load(f))
+    os.unlink(modules_path)
+    return seconds, modules, process.returncode, process.stdout + process.stderr
+
+
+def loaded(modules, roots):
+    return sorted({name.split('.')[0] for name in modules} & set(roots))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import budget of each main.py command")
+    parser.add_argument('--help-budget', type=float, default=0.5, help="seconds allowed for main.py --help")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='import_budget_')
+    registry = os.path.join(work_dir, 'registry')
+    env = {**os.environ, 'ISE_EVALUATION_CACHE': os.path.join(work_dir, 'evaluations')}
+    cases = [
+        ('--help', ['--help'], None, GUI_AND_LLM + TABULAR, args.help_budget),
+        ('train', ['train', '--registry', registry, '--publish'], None, GUI_AND_LLM, None),
+        ('evaluate', ['evaluate', '--registry', registry], None, GUI_AND_LLM, None),
+        ('score', ['score', 'data/db/datasetEsgTEST.csv', '--registry', registry,
+                   '--out', os.path.join(work_dir, 'scored.csv')], None, GUI_AND_LLM, None),
+        ('chat', ['chat', '--llm-factory', 'benchmarks.import_budget:EchoOrchestrator'],
+         "what is the ISE\n/quit\n", GUI_AND_LLM + TABULAR, None)
+    ]
+
+    failures = 0
+    print(f"{'command':<10} {'seconds':>8} {'modules':>8}  heavy modules loaded")
+    for name, argv, stdin, forbidden, budget in cases:
+        seconds, modules, code, output = run(argv, stdin, env)
+        heavy = loaded(modules, GUI_AND_LLM + TABULAR)
+        problems = []
+        if code != 0:
+            problems.append(f"exit code {code}")
+        if loaded(modules, forbidden):
+            problems.append(f"must not import {', '.join(loaded(modules, forbidden))}")
+        if budget is not None and seconds > budget:
+            problems.append(f"over the {budget:.2f} s budget")
+        print(f"{name:<10} {seconds:8.2f} {len(modules):8d}  {', '.join(heavy) or '-'}")
+        for problem in problems:
+            print(f"  FAIL: {problem}")
+        if problems and code != 0:
+            print('\n'.join('    ' + line for line in output.strip().splitlines()[-10:]))
+        failures += bool(problems)
+
+    print("All import budgets met" if not failures else f"{failures} command(s) over budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
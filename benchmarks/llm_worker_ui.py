@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PyQt6.QtCore import QTimer, QEventLoop
+from PyQt6.QtWidgets import QApplication
+from app.integrated_ui import ChatWorker
+from models.llm_worker import LLMWorkerClient, load_factory, WorkerError
+
+"""
+    Responsividade da UI com o LLM no mesmo processo vs num processo worker
+    Um QTimer de 5 ms mede o atraso do laço de eventos enquanto uma resposta é
+    gerada em streaming pelo ChatWorker. Por padrão o "modelo" é o BusyOrchestrator,
+    que faz trabalho em Python puro por token (segura o GIL como o pré/pós-processamento
+    da geração); --factory troca pelo ISEOrchestrator real.
+    No fim, uma geração que derruba o worker verifica o restart automático.
+    Uso: python -m benchmarks.llm_worker_ui
+         python -m benchmarks.llm_worker_ui --factory models.gemma_orchestrator:ISEOrchestrator \
+             --args models/gemma-2b-FT prompts/brain_prompt.yaml
+"""
+
+BUSY_FACTORY = 'benchmarks.llm_worker_ui:BusyOrchestrator'
+CRASH_QUESTION = '__crash__'
+PROBE_MS = 5
+
+
+class BusyOrchestrator:
+    """Substituto do ISEOrchestrator sem torch; a pergunta CRASH_QUESTION encerra o processo no meio."""
+
+    def __init__(self, tokens='150', work='150000', max_new_tokens=None):
+        # max_new_tokens, como no ISEOrchestrator, tem precedência sobre 'tokens'
+        self.tokens = int(tokens) if max_new_tokens is None else max_new_tokens
+        self.work = int(work)
+
+    def reset_session(self, session_id="default"):
+        pass
+
+    def stream_response(self, question, session_id="default", stop_event=None):
+        for i in range(self.tokens):
+            if stop_event is not None and stop_event.is_set():
+                return
+            if question == CRASH_QUESTION and i == 10:
+                os._exit(1)
+            total = 0
+            for k in range(self.work):
+                total += k
+            yield f"token{i} "
+
+    def get_response(self, question, session_id="default"):
+        return ''.join(self.stream_response(question, session_id)).strip()
+
+
+def measure(app, orchestrator, question):
+    """(atrasos do laço de eventos em ms, tokens recebidos, segundos)."""
+    lags, tokens = [], []
+    last = [time.perf_counter()]
+
+    def probe():
+        now = time.perf_counter()
+        lags.append((now - last[0]) * 1000 - PROBE_MS)
+        last[0] = now
+
+    timer = QTimer()
+    timer.setInterval(PROBE_MS)
+    timer.timeout.connect(probe)
+
+    loop = QEventLoop()
+    worker = ChatWorker(orchestrator, question)
+    worker.token_ready.connect(tokens.append)
+    worker.finished.connect(loop.quit)
+
+    start = time.perf_counter()
+    last[0] = start
+    timer.start()
+    worker.start()
+    loop.exec()
+    timer.stop()
+    return np.maximum(np.array(lags), 0), len(tokens), time.perf_counter() - start
+
+
+def report(name, lags, n_tokens, seconds):
+    print(f"{name:<16} {np.percentile(lags, 50):7.1f} {np.percentile(lags, 99):7.1f} {lags.max():7.1f} "
+          f"{n_tokens:7d} {n_tokens / seconds:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UI responsiveness: in-process vs worker-process LLM")
+    parser.add_argument('--factory', default=BUSY_FACTORY)
+    parser.add_argument('--args', nargs='*', default=[])
+    parser.add_argument('--question', default="What is the ISE B3?")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    print(f"{'LLM':<16} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} {'tokens':>7} {'tok/s':>8}")
+    orchestrator = load_factory(args.factory)(*args.args)
+    report('in-process', *measure(app, orchestrator, args.question))
+    del orchestrator
+
+    client = LLMWorkerClient(*args.args, factory=args.factory).start()
+    try:
+        client.wait_ready()
+        print(f"Worker ping: {client.ping() * 1000:.2f} ms")
+        report('worker process', *measure(app, client, args.question))
+
+        if args.factory == BUSY_FACTORY:
+            start = time.perf_counter()
+            try:
+                client.get_response(CRASH_QUESTION)
+                print("Crash test: worker did not crash")
+            except WorkerError as e:
+                print(f"Crash test: request failed with '{e}'")
+            client.wait_ready(timeout=60)
+            answer = client.get_response(args.question)
+            print(f"Worker restarted and answered {len(answer.split())} tokens "
+                  f"{time.perf_counter() - start:.1f} s after the crash")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import sys
+import time
+import argparse
+import numpy as np
+from data.data_treatment import DataTreatment
+from data.schema import load_dataset
+from models.MLP import NeuralNetwork
+
+"""
+    Compara a MLP dobrada em NumPy com o caminho ColumnTransformer + MLPRegressor
+    Uso: python -m benchmarks.mlp_inference
+"""
+
+
+def time_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Folded MLP vs sklearn benchmark")
+    parser.add_argument('--train', default='data/db/datasetEsgTRAIN.csv')
+    parser.add_argument('--test', default='data/db/datasetEsgTEST.csv')
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--atol', type=float, default=1e-5)
+    args = parser.parse_args()
+
+    inst = DataTreatment(load_dataset(args.train))
+    X_train, X_test, y_train, y_test, preprocessor = inst.mlp_treatment()
+    mlp_nn = NeuralNetwork(X_train, X_test, y_train, y_test, preprocessor)
+    mlp_nn.train_mlp()
+    folded = mlp_nn.inference
+
+    test_df = load_dataset(args.test, keep_company=True)
+    features_df = test_df.drop(columns=['ID', 'EMPRESA'])
+    single_df = test_df.iloc[[0]]
+    single_features = features_df.iloc[[0]]
+
+    def sklearn_path(df):
+        return mlp_nn.mlp.predict(preprocessor.transform(df))
+
+    expected = sklearn_path(features_df)
+    got = folded.predict(test_df)
+    max_err = float(np.max(np.abs(expected - got)))
+    print(f"Max abs difference on {len(test_df)} rows: {max_err:.3e}")
+    if not np.allclose(expected, got, rtol=0, atol=args.atol):
+        print("Folded MLP diverges from the sklearn path")
+        return 1
+
+    X_num, setor_idx = folded.encode(test_df)
+    rows = [
+        ("sklearn, 1 row", time_call(lambda: sklearn_path(single_features), args.repeats)),
+        ("folded, 1 row", time_call(lambda: folded.predict(single_df), args.repeats)),
+        (f"sklearn, {len(test_df)} rows", time_call(lambda: sklearn_path(features_df), args.repeats)),
+        (f"folded, {len(test_df)} rows", time_call(lambda: folded.predict(test_df), args.repeats)),
+        (f"folded forward only, {len(test_df)} rows", time_call(lambda: folded.forward(X_num, setor_idx), args.repeats)),
+    ]
+    for name, seconds in rows:
+        print(f"  {name:<40} {seconds * 1e6:10.1f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import os
+import sys
+import time
+import resource
+import argparse
+from data.synthetic import write_synthetic_csv, BYTES_PER_ROW
+from models.out_of_core import OutOfCoreTrainer
+
+"""
+    Treino out-of-core num CSV sintético, reportando tempo e pico de memória residente
+    Uso: python -m benchmarks.out_of_core --size-gb 4
+"""
+
+
+def peak_rss_mib():
+    # ru_maxrss vem em KiB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core training benchmark")
+    parser.add_argument('--path', default='data/db/synthetic_esg.csv')
+    parser.add_argument('--size-gb', type=float, default=2.0)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--mlp-epochs', type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Generating {args.size_gb} GB synthetic dataset at {args.path}")
+        write_synthetic_csv(args.path, int(args.size_gb * 1024 ** 3 / BYTES_PER_ROW))
+
+    size_mib = os.path.getsize(args.path) / 1024 ** 2
+    print(f"Dataset: {size_mib:.0f} MiB, peak RSS before training {peak_rss_mib():.0f} MiB")
+
+    start = time.perf_counter()
+    trainer = OutOfCoreTrainer(args.path, chunksize=args.chunksize, mlp_epochs=args.mlp_epochs)
+    trainer.train()
+
+    print(f"Trained on {trainer.n_rows} rows in {time.perf_counter() - start:.1f}s")
+    print(f"Peak RSS {peak_rss_mib():.0f} MiB for a {size_mib:.0f} MiB file")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+import xgboost as xgb
+from PyQt6.QtCore import QCoreApplication
+from app.task_pool import TaskPool, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from models.resource_governor import ResourceGovernor, available_cpus
+
+"""
+    Latência das predições interativas com um treino de XGBoost rodando no mesmo processo
+    Cenários: ocioso; treino sem governança (mesmo pool, todas as threads); treino como
+    tarefa de fundo com o ResourceGovernor (orçamento 'background', cede entre rounds
+    enquanto há predição rodando). A predição é uma linha no XGBoost mais uma MLP em NumPy,
+    medida do submit ao fim da tarefa (inclui a espera na fila).
+    Uso: python -m benchmarks.resource_governor [--rows 200000] [--predictions 200]
+"""
+
+
+class Checkpoint(xgb.callback.TrainingCallback):
+    """Ponto de cancelamento/cessão entre rounds, como as tarefas longas do app fazem entre etapas."""
+
+    def __init__(self, task, stop):
+        super().__init__()
+        self.task = task
+        self.stop = stop
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.task.check_cancelled()
+        return self.stop.is_set()
+
+
+def make_models(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, 12)).astype(np.float32)
+    y = X @ rng.normal(size=12) + rng.normal(scale=0.1, size=rows)
+    dtrain = xgb.DMatrix(X, label=y)
+    booster = xgb.train({'max_depth': 6, 'nthread': 0}, xgb.DMatrix(X[:5000], label=y[:5000]), num_boost_round=200)
+    weights = [rng.normal(size=(12, 256)), rng.normal(size=(256, 256)), rng.normal(size=(256, 1))]
+    return dtrain, booster, weights, X[:1]
+
+
+def predict_one(booster, weights, row):
+    booster.inplace_predict(row)
+    h = row.astype(np.float64)
+    for w in weights:
+        h = np.maximum(h @ w, 0)
+    return float(h[0, 0])
+
+
+def run_scenario(pool, dtrain, booster, weights, row, n_predictions, background_priority):
+    stop = threading.Event()
+    trained = []
+
+    def train(task):
+        while not stop.is_set():
+            xgb.train({'max_depth': 8}, dtrain, num_boost_round=50, callbacks=[Checkpoint(task, stop)])
+            trained.append(1)
+
+    if background_priority is not None:
+        pool.submit(train, priority=background_priority)
+        time.sleep(0.5)
+
+    latencies = []
+    for _ in range(n_predictions):
+        done = threading.Event()
+        start = time.perf_counter()
+
+        def predict(task):
+            predict_one(booster, weights, row)
+            latencies.append(time.perf_counter() - start)
+            done.set()
+
+        pool.submit(predict, priority=PRIORITY_INTERACTIVE)
+        done.wait()
+        time.sleep(0.01)
+    stop.set()
+    pool.pool.waitForDone()
+    pool.background_pool.waitForDone()
+    return np.array(latencies) * 1000, len(trained)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interactive latency under background training")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--predictions', type=int, default=200)
+    args = parser.parse_args()
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    dtrain, booster, weights, row = make_models(args.rows)
+    governor = ResourceGovernor()
+    print(f"{available_cpus()} CPUs, budgets {governor.budgets}")
+
+    scenarios = [
+        ('idle', TaskPool(), None),
+        ('training, no governor', TaskPool(), PRIORITY_INTERACTIVE),
+        ('training, governed', TaskPool(governor=governor), PRIORITY_BACKGROUND)
+    ]
+    print(f"{'scenario':<24} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'train runs':>11}")
+    for name, pool, priority in scenarios:
+        latencies, runs = run_scenario(pool, dtrain, booster, weights, row, args.predictions, priority)
+        print(f"{name:<24} {np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 99):8.2f} "
+              f"{latencies.max():8.2f} {runs:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
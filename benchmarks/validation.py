@@ -0,0 +1,70 @@
+import sys
+import time
+import argparse
+import numpy as np
+from data.schema import METRIC_COLUMNS, SECTORS
+from data.synthetic import synthetic_chunk
+from data.validation import validate
+
+"""
+    Validação vetorizada (schema compilado) vs um laço por linha no estilo do antigo submit_data
+    Uma fração das linhas recebe erros (texto em campo numérico, negativo, setor desconhecido).
+    Uso: python -m benchmarks.validation [--rows 1000000]
+"""
+
+
+def inject_errors(df, fraction, rng):
+    df = df.astype({col: object for col in METRIC_COLUMNS[:3]})
+    n_bad = int(len(df) * fraction)
+    rows = rng.choice(len(df), n_bad, replace=False)
+    kinds = rng.integers(0, 3, n_bad)
+    df.loc[df.index[rows[kinds == 0]], 'USO_AGUA'] = 'n/a'
+    df.loc[df.index[rows[kinds == 1]], 'AREA'] = -1.0
+    df.loc[df.index[rows[kinds == 2]], 'SETOR'] = 'ARROZ'
+    return df, n_bad
+
+
+def row_loop(df):
+    """Referência: checa linha a linha, como o formulário fazia campo a campo."""
+    bad = 0
+    allowed = set(SECTORS)
+    for row in df.itertuples(index=False):
+        record = row._asdict()
+        ok = record['SETOR'] in allowed and bool(str(record['EMPRESA']).strip())
+        for col in METRIC_COLUMNS:
+            try:
+                ok = ok and float(record[col]) >= 0
+            except ValueError:
+                ok = False
+        bad += not ok
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch validation benchmark")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--loop-rows', type=int, default=100_000)
+    parser.add_argument('--bad-fraction', type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df, n_bad = inject_errors(synthetic_chunk(args.rows, 0, rng), args.bad_fraction, rng)
+
+    start = time.perf_counter()
+    result = validate(df)
+    seconds = time.perf_counter() - start
+    print(f"Vectorized: {args.rows} rows in {seconds:.2f} s ({args.rows / seconds / 1e6:.2f} M rows/s), "
+          f"{result.n_invalid} invalid (injected {n_bad})")
+    for name, count in result.counts().items():
+        print(f"  {name:<30} {count}")
+
+    sample = df.iloc[:args.loop_rows]
+    start = time.perf_counter()
+    bad = row_loop(sample)
+    seconds = time.perf_counter() - start
+    print(f"Row loop:   {len(sample)} rows in {seconds:.2f} s ({len(sample) / seconds / 1e6:.2f} M rows/s), {bad} invalid")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import bisect
+import threading
+
+"""
+    Índice de prefixo dos nomes de empresa
+    Array ordenado (chaves em casefold) com busca binária: cada consulta custa
+    O(log n + k), então o completer responde a cada tecla mesmo com milhões de registros.
+"""
+
+
+class CompanyIndex:
+    def __init__(self, names=()):
+        unique = {}
+        for name in names:
+            unique.setdefault(name.casefold(), name)
+        self._keys = sorted(unique)
+        self._names = [unique[key] for key in self._keys]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, record_store):
+        return cls(record_store.companies())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, name):
+        key = name.casefold()
+        i = bisect.bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+    def add(self, name):
+        key = name.casefold()
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                return False
+            self._keys.insert(i, key)
+            self._names.insert(i, name)
+            return True
+
+    def prefix(self, text, limit=50):
+        """Até 'limit' nomes que começam com 'text', em ordem alfabética."""
+        key = text.casefold()
+        if not key:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._keys, key)
+            # '\U0010ffff' é maior que qualquer caractere: fim da faixa com esse prefixo
+            end = bisect.bisect_left(self._keys, key + '\U0010ffff', start, min(start + limit, len(self._keys)))
+            return self._names[start:end]
@@ -1,68 +1,90 @@
-import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder,  OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
+from data.schema import FEATURE_COLUMNS, SECTOR_COLUMN, TARGET_COLUMN, FLOAT_DTYPE, apply_schema
 
 """
     Dropando as colunas que não serão usadas no treinamento dos modelos
     Splitando o dataset entre treino e teste
     TARGET: INDICE_SUSTENTABILIDADE
     Adicionando encoder na coluna 'SETOR'
+    As features são separadas uma única vez (float32 + 'SETOR' categórico) e o
+    split/encoding é compartilhado entre os tratamentos, sem cópias do frame inteiro.
 """
 
-class DataTreatment:
-    def __init__(self, df):
-        self.df = df
-        self.preprocessor = None
+VALIDATION_FRACTION = 0.1
 
-    def tree_treatment(self):
-        final_df = self.df.drop(columns=['ID', 'EMPRESA'])
 
-        le = LabelEncoder()
+def validation_split(X, y, fraction=VALIDATION_FRACTION, random_state=42):
+    """Separa do treino a validação da parada antecipada: X_fit, X_val, y_fit, y_val."""
+    return train_test_split(X, y, test_size=fraction, random_state=random_state)
+
 
-        final_df['SETOR'] = le.fit_transform(final_df['SETOR']) 
+def make_mlp_preprocessor(X, cat_features=('SETOR',), categories='auto'):
+    cat_features = list(cat_features)
+    num_features = X.columns.difference(cat_features)
 
-        X = final_df.drop('INDICE_SUSTENTABILIDADE', axis=1)
-        y = final_df['INDICE_SUSTENTABILIDADE']
+    return ColumnTransformer(transformers=[
+        ('num', StandardScaler(), num_features),
+        ('cat', OneHotEncoder(categories=categories, sparse_output=False, handle_unknown='ignore', dtype=FLOAT_DTYPE), cat_features)
+    ])
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
+class DataTreatment:
+    def __init__(self, df, report=None):
+        self.df = df
+        self.preprocessor = None
+        self.report = report
+
+        df = apply_schema(df, keep_company=False)
+        self.X = df[FEATURE_COLUMNS]
+        self.y = df[TARGET_COLUMN]
+        self.train_idx, self.test_idx = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+
+        self._encoded = None
+        self._record('features', self.X)
+
+    def holdout(self):
+        """Linhas originais do split de teste, no layout do CSV, para avaliação em lote."""
+        return self.df.iloc[self.test_idx]
+
+    def _record(self, stage, obj):
+        if self.report is not None:
+            self.report.record(stage, obj)
+
+    def _split(self, X):
+        return (X.iloc[self.train_idx], X.iloc[self.test_idx],
+                self.y.iloc[self.train_idx], self.y.iloc[self.test_idx])
+
+    def _label_encoded(self):
+        # Árvore e XGBoost usam o mesmo LabelEncoder; os códigos saem das categorias, não string a string
+        if self._encoded is None:
+            setor = self.X[SECTOR_COLUMN].cat.remove_unused_categories()
+            le = LabelEncoder().fit(setor.cat.categories)
+            lookup = le.transform(setor.cat.categories).astype(np.int32)
+            X = self.X.assign(**{SECTOR_COLUMN: lookup[setor.cat.codes.to_numpy()]})
+            self._encoded = (self._split(X), le)
+            self._record('tree/xgboost input', X)
+        return self._encoded
+
+    def tree_treatment(self):
+        (X_train, X_test, y_train, y_test), le = self._label_encoded()
         return X_train, X_test, y_train, y_test, le
     
     def mlp_treatment(self):
+        X_train, X_test, y_train, y_test = self._split(self.X)
 
-        final_df = self.df.drop(columns=['ID', 'EMPRESA'])
-
-        X = final_df.drop('INDICE_SUSTENTABILIDADE', axis=1)
-        y = final_df['INDICE_SUSTENTABILIDADE']
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        cat_features = ['SETOR']
-
-        num_features = X_train.columns.difference(cat_features) 
-
-        self.preprocessor = ColumnTransformer(transformers=[
-            ('num', StandardScaler(), num_features),
-            ('cat', OneHotEncoder(sparse_output=False, handle_unknown='ignore'), cat_features)
-        ])
+        self.preprocessor = make_mlp_preprocessor(X_train)
 
         X_train_processed = self.preprocessor.fit_transform(X_train)
 
         X_test_processed = self.preprocessor.transform(X_test)
 
+        self._record('mlp input', X_train_processed)
+
         return X_train_processed, X_test_processed, y_train, y_test, self.preprocessor
     
     def xgboost_treatment(self):
-        final_df = self.df.drop(columns=['ID', 'EMPRESA'])
-
-        le = LabelEncoder()
-
-        final_df['SETOR'] = le.fit_transform(final_df['SETOR']).astype(int)
-
-        X = final_df.drop('INDICE_SUSTENTABILIDADE', axis=1)
-        y = final_df['INDICE_SUSTENTABILIDADE']
-
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-        return X_train, X_test, y_train, y_test, le
\ No newline at end of file
+        (X_train, X_test, y_train, y_test), le = self._label_encoded()
+        return X_train, X_test, y_train, y_test, le
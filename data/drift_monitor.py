@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+from data.schema import SECTOR_COLUMN, METRIC_COLUMNS, iter_dataset, file_fingerprint
+
+"""
+    Monitor de drift das submissões feitas na UI
+    Baseline: a partir do CSV de treino, por 'SETOR' e no total ('ALL'), guarda
+    contagem, média/variância e histograma de cada métrica em faixas fixas (quantis
+    do treino, com caudas abertas). O CSV é lido em blocos, então vale para o
+    modo out-of-core também.
+    Online: cada submissão atualiza média/variância (Welford) e o histograma do seu
+    setor e do total em O(métricas), com memória constante. Periodicamente (a cada
+    N submissões ou T segundos) um relatório JSON compara o vivo com o baseline:
+    PSI e KS (na resolução das faixas) por métrica e setor.
+    Uso: python -m data.drift_monitor {baseline,report} ...
+"""
+
+BASELINE_PATH = 'data/cache/drift_baseline.npz'
+STATE_PATH = 'data/cache/drift_state.npz'
+REPORT_DIR = 'data/cache/drift_reports'
+
+ALL_SECTORS = 'ALL'
+N_BINS = 50
+PSI_BINS = 10
+MIN_SAMPLES = 30
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.2
+REPORT_EVERY = 50
+REPORT_INTERVAL = 3600.0
+EPS = 1e-4
+
+
+def merge_moments(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Combina (n, média, M2) de dois blocos (Chan et al.); vetorizado por métrica."""
+    n = n_a + n_b
+    safe_n = np.where(n == 0, 1, n)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / safe_n)
+    m2 = m2_a + m2_b + delta ** 2 * (n_a * n_b / safe_n)
+    return n, mean, m2
+
+
+def psi(expected, actual):
+    """Population Stability Index entre duas distribuições de contagens nas mesmas faixas."""
+    e = np.maximum(expected / max(expected.sum(), 1), EPS)
+    a = np.maximum(actual / max(actual.sum(), 1), EPS)
+    return float(((a - e) * np.log(a / e)).sum())
+
+
+def ks(expected, actual):
+    """Estatística KS aproximada: maior distância entre as CDFs nas bordas das faixas."""
+    e = np.cumsum(expected) / max(expected.sum(), 1)
+    a = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.abs(a - e).max())
+
+
+class FeatureStats:
+    """Contagem, Welford e histograma por (setor, métrica); tamanho fixo por setor, independente do volume."""
+
+    def __init__(self, sectors, edges):
+        self.sectors = []
+        self.sector_index = {}
+        self.edges = edges
+        n_features = edges.shape[0]
+        self.n = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, n_features))
+        self.m2 = np.zeros((0, n_features))
+        self.hist = np.zeros((0, n_features, edges.shape[1] + 1), dtype=np.int64)
+        for sector in sectors:
+            self.ensure_sector(sector)
+
+    def ensure_sector(self, sector):
+        """Índice da linha do setor; um setor novo ganha uma linha zerada (raro, não é o caminho quente)."""
+        i = self.sector_index.get(sector)
+        if i is None:
+            i = self.sector_index[sector] = len(self.sectors)
+            self.sectors.append(sector)
+            self.n = np.append(self.n, 0)
+            self.mean = np.vstack([self.mean, np.zeros((1, self.mean.shape[1]))])
+            self.m2 = np.vstack([self.m2, np.zeros((1, self.m2.shape[1]))])
+            self.hist = np.concatenate([self.hist, np.zeros((1,) + self.hist.shape[1:], dtype=np.int64)])
+        return i
+
+    def bins(self, X):
+        """Faixa de cada valor: (linhas, métricas) -> índices em [0, n_bins)."""
+        return (X[:, :, None] > self.edges[None]).sum(axis=2)
+
+    def add_batch(self, sector, X):
+        s = self.ensure_sector(sector)
+        if len(X) == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        self.n[s], self.mean[s], self.m2[s] = merge_moments(
+            self.n[s], self.mean[s], self.m2[s], len(X), batch_mean, ((X - batch_mean) ** 2).sum(axis=0)
+        )
+        bins = self.bins(X)
+        for f in range(X.shape[1]):
+            self.hist[s, f] += np.bincount(bins[:, f], minlength=self.hist.shape[2])
+
+    def add(self, sector, x):
+        """Uma linha: Welford clássico, O(métricas)."""
+        s = self.ensure_sector(sector)
+        self.n[s] += 1
+        delta = x - self.mean[s]
+        self.mean[s] += delta / self.n[s]
+        self.m2[s] += delta * (x - self.mean[s])
+        self.hist[s, np.arange(len(x)), self.bins(x[None])[0]] += 1
+
+    def std(self):
+        return np.sqrt(self.m2 / np.maximum(self.n - 1, 1)[:, None])
+
+    def save(self, path, **extra):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, sectors=np.array(self.sectors, dtype=str), edges=self.edges,
+                 n=self.n, mean=self.mean, m2=self.m2, hist=self.hist, **extra)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            stats = cls(data['sectors'].tolist(), data['edges'])
+            stats.n, stats.mean, stats.m2, stats.hist = data['n'], data['mean'], data['m2'], data['hist']
+            extra = {key: data[key].item() for key in data.files
+                     if key not in ('sectors', 'edges', 'n', 'mean', 'm2', 'hist')}
+        return stats, extra
+
+
+def build_baseline(csv_path, path=BASELINE_PATH, chunksize=100_000, n_bins=N_BINS):
+    """Estatísticas do treino por setor e no total; as faixas saem dos quantis do primeiro bloco."""
+    chunks = iter_dataset(csv_path, chunksize)
+    first = next(chunks)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = np.quantile(first[METRIC_COLUMNS].to_numpy(np.float64), quantiles, axis=0).T
+
+    stats = FeatureStats([ALL_SECTORS], edges)
+    for chunk in itertools.chain([first], chunks):
+        X = chunk[METRIC_COLUMNS].to_numpy(np.float64)
+        stats.add_batch(ALL_SECTORS, X)
+        sectors = chunk[SECTOR_COLUMN].astype(str).to_numpy()
+        for sector in np.unique(sectors):
+            stats.add_batch(sector, X[sectors == sector])
+
+    stats.save(path, source=file_fingerprint(csv_path))
+    print(f"Drift baseline for {stats.n[0]} training rows written to {path}")
+    return stats
+
+
+class DriftMonitor:
+    def __init__(self, baseline_path=BASELINE_PATH, state_path=STATE_PATH, report_dir=REPORT_DIR,
+                 report_every=REPORT_EVERY, report_interval=REPORT_INTERVAL, min_samples=MIN_SAMPLES):
+        self.baseline, meta = FeatureStats.load(baseline_path)
+        self.source = str(meta.get('source', ''))
+        self.state_path = state_path
+        self.report_dir = report_dir
+        self.report_every = report_every
+        self.report_interval = report_interval
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+        # O acumulado sobrevive entre execuções enquanto o baseline (o treino) for o mesmo
+        self.live = None
+        if state_path and os.path.exists(state_path):
+            live, state_meta = FeatureStats.load(state_path)
+            if str(state_meta.get('baseline', '')) == self.source:
+                self.live = live
+        if self.live is None:
+            self.live = FeatureStats([ALL_SECTORS], self.baseline.edges)
+        self.since_report = 0
+        self.last_report = time.monotonic()
+
+    @classmethod
+    def for_training(cls, csv_path, baseline_path=BASELINE_PATH, **kwargs):
+        """Reaproveita o baseline salvo se ele veio deste CSV; senão recalcula."""
+        if os.path.exists(baseline_path):
+            _, meta = FeatureStats.load(baseline_path)
+            if str(meta.get('source', '')) != file_fingerprint(csv_path):
+                build_baseline(csv_path, baseline_path)
+        else:
+            build_baseline(csv_path, baseline_path)
+        return cls(baseline_path, **kwargs)
+
+    def update(self, df):
+        """Registra as linhas submetidas (layout do CSV); devolve o caminho do relatório quando um é gravado."""
+        # Coluna a coluna: em DataFrames de uma linha, evita o custo fixo de df[cols].to_numpy()
+        X = np.column_stack([df[col].to_numpy(np.float64) for col in METRIC_COLUMNS])
+        sectors = [str(sector) for sector in df[SECTOR_COLUMN].tolist()]
+        with self._lock:
+            for x, sector in zip(X, sectors):
+                self.live.add(ALL_SECTORS, x)
+                self.live.add(sector, x)
+            self.since_report += len(X)
+            due = (self.since_report >= self.report_every
+                   or time.monotonic() - self.last_report >= self.report_interval)
+        return self.write_report() if due else None
+
+    def compare(self, live_hist, base_hist):
+        group = live_hist.shape[-1] // PSI_BINS
+        coarse = lambda h: h[:group * PSI_BINS].reshape(PSI_BINS, group).sum(axis=1)
+        return psi(coarse(base_hist), coarse(live_hist)), ks(base_hist, live_hist)
+
+    def report(self):
+        with self._lock:
+            live = {key: getattr(self.live, key).copy() for key in ('n', 'mean', 'hist')}
+            live_std = self.live.std()
+            live_sectors = list(self.live.sectors)
+        base_std = self.baseline.std()
+
+        sectors = {}
+        flagged = []
+        for s, sector in enumerate(live_sectors):
+            n = int(live['n'][s])
+            if n == 0:
+                continue
+            b = self.baseline.sector_index.get(sector)
+            features = {}
+            for f, feature in enumerate(METRIC_COLUMNS):
+                entry = {'live_mean': float(live['mean'][s, f]), 'live_std': float(live_std[s, f])}
+                if b is not None:
+                    psi_value, ks_value = self.compare(live['hist'][s, f], self.baseline.hist[b, f])
+                    scale = base_std[b, f] if base_std[b, f] > 0 else 1.0
+                    if n < self.min_samples:
+                        status = 'insufficient'
+                    elif psi_value >= PSI_DRIFT:
+                        status = 'drift'
+                    elif psi_value >= PSI_MODERATE:
+                        status = 'moderate'
+                    else:
+                        status = 'stable'
+                    entry.update({
+                        'baseline_mean': float(self.baseline.mean[b, f]),
+                        'baseline_std': float(base_std[b, f]),
+                        'mean_shift_std': float((live['mean'][s, f] - self.baseline.mean[b, f]) / scale),
+                        'psi': round(psi_value, 4),
+                        'ks': round(ks_value, 4),
+                        'status': status
+                    })
+                    if status in ('drift', 'moderate'):
+                        flagged.append((psi_value, sector, feature, status))
+                features[feature] = entry
+            sectors[sector] = {
+                'submissions': n,
+                'baseline_rows': int(self.baseline.n[b]) if b is not None else 0,
+                'known_sector': b is not None,
+                'features': features
+            }
+
+        flagged.sort(reverse=True)
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'baseline': self.source,
+            'min_samples': self.min_samples,
+            'flagged': [{'sector': sector, 'feature': feature, 'psi': round(value, 4), 'status': status}
+                        for value, sector, feature, status in flagged],
+            'sectors': sectors
+        }
+
+    def write_report(self):
+        report = self.report()
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"drift-{time.strftime('%Y%m%dT%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.save_state()
+        with self._lock:
+            self.since_report = 0
+            self.last_report = time.monotonic()
+        n_total = report['sectors'].get(ALL_SECTORS, {}).get('submissions', 0)
+        print(f"Drift report ({n_total} submissions, {len(report['flagged'])} flagged features) written to {path}")
+        return path
+
+    def save_state(self):
+        if self.state_path:
+            with self._lock:
+                self.live.save(self.state_path, baseline=self.source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feature drift monitor")
+    sub = parser.add_subparsers(dest='command', required=True)
+    baseline_cmd = sub.add_parser('baseline')
+    baseline_cmd.add_argument('csv', nargs='?', default='data/cache/train_snapshot.csv')
+    baseline_cmd.add_argument('--out', default=BASELINE_PATH)
+    sub.add_parser('report')
+    args = parser.parse_args()
+
+    if args.command == 'baseline':
+        build_baseline(args.csv, args.out)
+        return 0
+
+    monitor = DriftMonitor()
+    report = monitor.report()
+    rows = [
+        (sector, feature, entry.get('psi'), entry.get('ks'), entry.get('status', 'unknown sector'))
+        for sector, data in report['sectors'].items() for feature, entry in data['features'].items()
+    ]
+    print(pd.DataFrame(rows, columns=['SETOR', 'feature', 'PSI', 'KS', 'status']).to_string(index=False))
+    monitor.write_report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+import pandas as pd
+from data.schema import (
+    CSV_COLUMNS, ID_COLUMN, COMPANY_COLUMN, SECTOR_COLUMN, METRIC_COLUMNS, TARGET_COLUMN
+)
+
+"""
+    Armazenamento dos registros de empresas em SQLite
+    O ID é atribuído pelo banco (AUTOINCREMENT), há índices em 'EMPRESA' e 'SETOR',
+    e o modo WAL deixa leituras seguirem enquanto outro processo grava.
+    Os registros só são acrescentados, então (quantidade, maior ID) identifica o
+    conteúdo e o snapshot de treino em CSV só é regravado quando algo mudou.
+    Uso: python -m data.record_store {import,export,company} ...
+"""
+
+DB_PATH = 'data/db/records.sqlite'
+SNAPSHOT_PATH = 'data/cache/train_snapshot.csv'
+
+DATA_COLUMNS = [COMPANY_COLUMN, SECTOR_COLUMN] + METRIC_COLUMNS + [TARGET_COLUMN]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS records (
+    {ID_COLUMN} INTEGER PRIMARY KEY AUTOINCREMENT,
+    {COMPANY_COLUMN} TEXT NOT NULL,
+    {SECTOR_COLUMN} TEXT NOT NULL,
+    {', '.join(f'{col} REAL NOT NULL' for col in METRIC_COLUMNS)},
+    {TARGET_COLUMN} REAL NOT NULL,
+    CREATED_AT TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+);
+CREATE INDEX IF NOT EXISTS idx_records_empresa ON records ({COMPANY_COLUMN}, {ID_COLUMN});
+CREATE INDEX IF NOT EXISTS idx_records_setor ON records ({SECTOR_COLUMN});
+"""
+
+INSERT_SQL = f"INSERT INTO records ({', '.join(DATA_COLUMNS)}) VALUES ({', '.join('?' * len(DATA_COLUMNS))})"
+
+
+class RecordStore:
+    def __init__(self, path=DB_PATH, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        # sqlite3 não compartilha conexões entre threads: uma por thread
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Em WAL, NORMAL só perde a última transação numa queda de energia, nunca corrompe
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def count(self):
+        return self.connection().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def revision(self):
+        return self.connection().execute(f"SELECT COUNT(*), COALESCE(MAX({ID_COLUMN}), 0) FROM records").fetchone()
+
+    def insert(self, df):
+        """Grava as linhas (layout do CSV; o 'ID' digitado é ignorado) e devolve os IDs atribuídos."""
+        rows = df[DATA_COLUMNS].astype({col: float for col in METRIC_COLUMNS + [TARGET_COLUMN]})
+        conn = self.connection()
+        ids = []
+        with conn:
+            for values in rows.itertuples(index=False, name=None):
+                ids.append(conn.execute(INSERT_SQL, values).lastrowid)
+        return ids
+
+    def import_csv(self, csv_path, chunksize=100_000):
+        """Carga em lote de um CSV no layout do dataset; os IDs são reatribuídos na ordem do arquivo."""
+        conn = self.connection()
+        total = 0
+        # float64 aqui: o banco guarda os valores exatamente como estão no arquivo
+        dtype = {COMPANY_COLUMN: str, SECTOR_COLUMN: str}
+        for chunk in pd.read_csv(csv_path, usecols=DATA_COLUMNS, dtype=dtype, chunksize=chunksize):
+            with conn:
+                conn.executemany(INSERT_SQL, chunk[DATA_COLUMNS].to_numpy(dtype=object).tolist())
+            total += len(chunk)
+        return total
+
+    def bootstrap(self, csv_path):
+        """Primeira execução: o banco vazio recebe o CSV de treino existente."""
+        if self.count() == 0 and os.path.exists(csv_path):
+            n = self.import_csv(csv_path)
+            print(f"Imported {n} records from {csv_path} into {self.path}")
+
+    def records_for(self, company):
+        query = f"SELECT {', '.join(CSV_COLUMNS)} FROM records WHERE {COMPANY_COLUMN} = ? ORDER BY {ID_COLUMN}"
+        return pd.read_sql_query(query, self.connection(), params=(company,))
+
+    def latest_for(self, company):
+        """Registro mais recente da empresa (maior ID) como dict, ou None."""
+        query = f"SELECT {', '.join(CSV_COLUMNS)} FROM records WHERE {COMPANY_COLUMN} = ? ORDER BY {ID_COLUMN} DESC LIMIT 1"
+        cursor = self.connection().execute(query, (company,))
+        row = cursor.fetchone()
+        return None if row is None else dict(zip(CSV_COLUMNS, row))
+
+    def companies(self):
+        query = f"SELECT DISTINCT {COMPANY_COLUMN} FROM records ORDER BY {COMPANY_COLUMN}"
+        return [row[0] for row in self.connection().execute(query)]
+
+    def export_csv(self, path=SNAPSHOT_PATH, chunksize=100_000):
+        """Snapshot no layout do CSV de treino; só regrava se o banco mudou desde o último export."""
+        revision = '{} {}'.format(*self.revision())
+        revision_path = f"{path}.revision"
+        if os.path.exists(path) and os.path.exists(revision_path):
+            with open(revision_path, 'r', encoding='utf-8') as f:
+                if f.read().strip() == revision:
+                    return path
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        query = f"SELECT {', '.join(CSV_COLUMNS)} FROM records ORDER BY {ID_COLUMN}"
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            header = True
+            for chunk in pd.read_sql_query(query, self.connection(), chunksize=chunksize):
+                chunk.to_csv(f, index=False, header=header)
+                header = False
+            if header:
+                f.write(','.join(CSV_COLUMNS) + '\n')
+        os.replace(tmp_path, path)
+        with open(revision_path, 'w', encoding='utf-8') as f:
+            f.write(revision)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Company record store")
+    parser.add_argument('--db', default=DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    import_cmd = sub.add_parser('import')
+    import_cmd.add_argument('csv')
+    export_cmd = sub.add_parser('export')
+    export_cmd.add_argument('csv', nargs='?', default=SNAPSHOT_PATH)
+    company_cmd = sub.add_parser('company')
+    company_cmd.add_argument('name')
+    args = parser.parse_args()
+
+    store = RecordStore(args.db)
+    if args.command == 'import':
+        print(f"Imported {store.import_csv(args.csv)} records")
+    elif args.command == 'export':
+        print(f"Snapshot written to {store.export_csv(args.csv)}")
+    else:
+        print(store.records_for(args.name).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
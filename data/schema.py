@@ -0,0 +1,109 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+"""
+    Schema tipado do dataset ESG
+    Métricas em float32, 'SETOR' categórico e 'EMPRESA' descartada já na leitura
+    (ou mantida como categórica quando a aplicação precisa do nome da empresa).
+"""
+
+ID_COLUMN = "ID"
+COMPANY_COLUMN = "EMPRESA"
+SECTOR_COLUMN = "SETOR"
+TARGET_COLUMN = "INDICE_SUSTENTABILIDADE"
+
+METRIC_COLUMNS = [
+    "USO_AGUA", "AREA", "AREA_RESERVA",
+    "CO2_EMIT_DIR", "CO2_EMIT_INDIR", "CO2_REC", "INSUMO_QUIMICO_LEG",
+    "INSUMO_QUIMICO_ORG", "BIODIVERSIDADE", "RESIDUO_REC", "RESIDUO_COMP",
+    "RESIDUO_DESC", "ENERGIA_REN"
+]
+
+SECTORS = ["CANA_ACUCAR", "MILHO", "SOJA", "TRIGO"]
+
+CSV_COLUMNS = [ID_COLUMN, COMPANY_COLUMN, SECTOR_COLUMN] + METRIC_COLUMNS + [TARGET_COLUMN]
+
+FEATURE_COLUMNS = [SECTOR_COLUMN] + METRIC_COLUMNS
+
+FLOAT_DTYPE = np.float32
+
+# ID inteiro (nulo permitido: entrada da UI antes de salvar); float32 só para as features numéricas
+ID_DTYPE = 'Int64'
+
+CSV_DTYPES = {
+    ID_COLUMN: ID_DTYPE,
+    COMPANY_COLUMN: 'category',
+    SECTOR_COLUMN: 'category',
+    **{col: FLOAT_DTYPE for col in METRIC_COLUMNS},
+    TARGET_COLUMN: FLOAT_DTYPE
+}
+
+
+def load_dataset(path, keep_company=False, report=None, **read_csv_kwargs):
+    """Lê o CSV já com os dtypes do schema, sem passar por float64/object."""
+    usecols = CSV_COLUMNS if keep_company else [c for c in CSV_COLUMNS if c != COMPANY_COLUMN]
+    df = pd.read_csv(
+        path,
+        usecols=usecols,
+        dtype={col: CSV_DTYPES[col] for col in usecols},
+        **read_csv_kwargs
+    )
+    if report is not None:
+        report.record('load', df)
+    return df
+
+
+def iter_dataset(path, chunksize, keep_company=False):
+    """Mesmo schema do load_dataset, mas em blocos de 'chunksize' linhas."""
+    usecols = CSV_COLUMNS if keep_company else [c for c in CSV_COLUMNS if c != COMPANY_COLUMN]
+    # Categorias inferidas bloco a bloco não batem entre si, então 'SETOR' chega como string
+    dtype = {col: CSV_DTYPES[col] for col in usecols if CSV_DTYPES[col] != 'category'}
+    return pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+
+
+def apply_schema(df, keep_company=True):
+    """Converte um DataFrame já em memória (ex.: entrada da UI) para os dtypes do schema."""
+    if not keep_company and COMPANY_COLUMN in df.columns:
+        df = df.drop(columns=[COMPANY_COLUMN])
+    dtypes = {col: CSV_DTYPES[col] for col in df.columns if col in CSV_DTYPES}
+    return df.astype(dtypes, copy=False)
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """SHA-256 do arquivo, lido em blocos para não carregar datasets grandes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def nbytes(obj):
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if hasattr(obj, 'data') and hasattr(obj, 'indices'):
+        # Matriz esparsa do scipy
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    return int(np.asarray(obj).nbytes)
+
+
+class MemoryReport:
+    """Bytes por linha em cada estágio, do CSV até a entrada dos modelos."""
+
+    def __init__(self):
+        self.stages = []
+
+    def record(self, stage, obj):
+        n_rows = obj.shape[0]
+        total = nbytes(obj)
+        self.stages.append((stage, n_rows, total))
+        return total
+
+    def print_report(self):
+        print("Memory per stage")
+        for stage, n_rows, total in self.stages:
+            per_row = total / n_rows if n_rows else 0.0
+            print(f"  {stage:<24} {n_rows:>8} rows  {total / 1024:10.1f} KiB  {per_row:8.1f} B/row")
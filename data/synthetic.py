@@ -0,0 +1,98 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from data.schema import CSV_COLUMNS, METRIC_COLUMNS, TARGET_COLUMN, SECTORS
+
+"""
+    Gerador de datasets ESG sintéticos no layout do CSV de treino
+    Os intervalos seguem o datasetEsgTRAIN.csv e o índice é uma combinação linear
+    ruidosa das métricas, o suficiente para testar o treino out-of-core em arquivos de GBs.
+    Uso: python -m data.synthetic data/db/synthetic.csv --size-gb 2
+"""
+
+SETORES = SECTORS
+
+METRIC_RANGES = {
+    "USO_AGUA": (2.0, 10.0),
+    "AREA": (17.0, 30000.0),
+    "AREA_RESERVA": (1.0, 10.0),
+    "CO2_EMIT_DIR": (1.0, 10.0),
+    "CO2_EMIT_INDIR": (2.0, 10.0),
+    "CO2_REC": (2.0, 15.0),
+    "INSUMO_QUIMICO_LEG": (1.0, 10.0),
+    "INSUMO_QUIMICO_ORG": (1.0, 10.0),
+    "BIODIVERSIDADE": (1.0, 20.0),
+    "RESIDUO_REC": (10.0, 40.0),
+    "RESIDUO_COMP": (10.0, 40.0),
+    "RESIDUO_DESC": (5.0, 20.0),
+    "ENERGIA_REN": (5.0, 100.0)
+}
+
+# Peso de cada métrica normalizada no índice: positivas ajudam, emissões e descarte pesam contra
+TARGET_WEIGHTS = {
+    "USO_AGUA": -0.04, "AREA": 0.0, "AREA_RESERVA": 0.05,
+    "CO2_EMIT_DIR": -0.06, "CO2_EMIT_INDIR": -0.04, "CO2_REC": 0.05,
+    "INSUMO_QUIMICO_LEG": -0.03, "INSUMO_QUIMICO_ORG": 0.02, "BIODIVERSIDADE": 0.05,
+    "RESIDUO_REC": 0.04, "RESIDUO_COMP": 0.03, "RESIDUO_DESC": -0.04, "ENERGIA_REN": 0.08
+}
+
+SECTOR_OFFSETS = {"CANA_ACUCAR": -0.02, "MILHO": 0.0, "SOJA": 0.01, "TRIGO": 0.02}
+
+# Tamanho médio aproximado de uma linha no CSV
+BYTES_PER_ROW = 105
+
+
+def synthetic_chunk(n_rows, start_id, rng, n_companies=50000):
+    data = {
+        "ID": np.arange(start_id, start_id + n_rows, dtype=np.int64),
+        "EMPRESA": [f"EMPRESA{i:05d}" for i in rng.integers(0, n_companies, n_rows)],
+        "SETOR": rng.choice(SETORES, n_rows),
+    }
+
+    target = np.full(n_rows, 0.55)
+    for col in METRIC_COLUMNS:
+        low, high = METRIC_RANGES[col]
+        values = rng.uniform(low, high, n_rows)
+        data[col] = np.round(values, 2)
+        target += TARGET_WEIGHTS[col] * (values - low) / (high - low)
+
+    target += np.vectorize(SECTOR_OFFSETS.get)(data["SETOR"])
+    target += rng.normal(0.0, 0.02, n_rows)
+    data[TARGET_COLUMN] = np.round(np.clip(target, 0.0, 1.0), 2)
+
+    return pd.DataFrame(data, columns=CSV_COLUMNS)
+
+
+def write_synthetic_csv(path, n_rows, chunksize=500_000, seed=42):
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        while written < n_rows:
+            n = min(chunksize, n_rows - written)
+            synthetic_chunk(n, written, rng).to_csv(f, index=False, header=(written == 0))
+            written += n
+            print(f"  {written}/{n_rows} rows written")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic ESG dataset generator")
+    parser.add_argument('path')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--rows', type=int)
+    group.add_argument('--size-gb', type=float)
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    n_rows = args.rows or int(args.size_gb * 1024 ** 3 / BYTES_PER_ROW)
+    write_synthetic_csv(args.path, n_rows, args.chunksize, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
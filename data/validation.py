@@ -0,0 +1,286 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from data.schema import (
+    CSV_COLUMNS, ID_COLUMN, COMPANY_COLUMN, SECTOR_COLUMN, METRIC_COLUMNS, TARGET_COLUMN, SECTORS
+)
+
+"""
+    Validação em lote compilada de um schema declarativo
+    VALIDATION_SCHEMA descreve cada coluna do CSV (tipo, obrigatoriedade, faixa,
+    categorias permitidas e a política para categoria desconhecida). CompiledSchema
+    transforma isso numa lista de checagens vetorizadas em NumPy; validate() devolve
+    uma máscara de erros por linha (um bit por checagem), então um lote com linhas
+    ruins segue com as boas em vez de falhar inteiro.
+    Colunas de texto são fatoradas: limpeza, apelidos e checagens rodam só nos valores
+    distintos e o resultado é espalhado pelos códigos das linhas.
+    Uso: python -m data.validation entrada.csv [--valid ok.csv] [--invalid rejeitadas.csv]
+"""
+
+# Grafias já vistas na UI e em planilhas para os setores do treino
+SECTOR_ALIASES = {
+    'CANA_DE_ACUCAR': 'CANA_ACUCAR',
+    'CANA': 'CANA_ACUCAR',
+    'ACUCAR': 'CANA_ACUCAR'
+}
+
+UNKNOWN_POLICIES = ('reject', 'fallback')
+
+VALIDATION_SCHEMA = {
+    ID_COLUMN: {'type': 'number', 'required': False, 'min': 0.0},
+    COMPANY_COLUMN: {'type': 'string', 'required': True, 'max_length': 120},
+    SECTOR_COLUMN: {
+        'type': 'category', 'required': True, 'allowed': SECTORS, 'aliases': SECTOR_ALIASES,
+        # 'fallback' troca por 'fallback_value' em vez de rejeitar (a linha sai marcada em 'remapped')
+        'unknown': 'reject', 'fallback_value': None
+    },
+    **{col: {'type': 'number', 'required': True, 'min': 0.0} for col in METRIC_COLUMNS},
+    'ENERGIA_REN': {'type': 'number', 'required': True, 'min': 0.0, 'max': 100.0},
+    TARGET_COLUMN: {'type': 'number', 'required': False, 'min': 0.0, 'max': 1.0},
+}
+
+# Formulário da UI: o ID vem do banco e o índice é obrigatório, pois "Keep Original Value"
+# grava o valor digitado (a coluna é NOT NULL no RecordStore)
+UI_VALIDATION_SCHEMA = {
+    **{column: spec for column, spec in VALIDATION_SCHEMA.items() if column != ID_COLUMN},
+    TARGET_COLUMN: {**VALIDATION_SCHEMA[TARGET_COLUMN], 'required': True},
+}
+
+
+def canonical_category(values):
+    """Sem acento, maiúsculas e '_' como separador: 'Cana de Açúcar' -> 'CANA_DE_ACUCAR'."""
+    return (
+        pd.Series(values, dtype=object).astype(str)
+        .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.upper().str.replace(r'[^A-Z0-9]+', '_', regex=True).str.strip('_')
+        .to_numpy(dtype=object)
+    )
+
+
+def describe_check(check):
+    """Texto curto (inglês, como o resto da UI) para o nome de uma checagem: 'below_0' -> 'must be at least 0'."""
+    if check == 'missing':
+        return "cannot be empty"
+    if check == 'not_a_number':
+        return "must be a valid number"
+    if check == 'not_finite':
+        return "must be a finite number"
+    if check == 'unknown_category':
+        return "is not a known value"
+    kind, _, limit = check.rpartition('_')
+    if kind == 'below':
+        return f"must be at least {limit}"
+    if kind == 'above':
+        return f"must be at most {limit}"
+    if kind == 'longer_than':
+        return f"must have at most {limit} characters"
+    return check
+
+
+class ValidationResult:
+    def __init__(self, data, errors, check_names, remapped):
+        self.data = data
+        self.errors = errors
+        self.check_names = check_names
+        self.remapped = remapped
+
+    @property
+    def valid(self):
+        return self.errors == 0
+
+    @property
+    def n_invalid(self):
+        return int(np.count_nonzero(self.errors))
+
+    def counts(self):
+        """Quantas linhas falharam em cada checagem (só as que falharam alguma vez)."""
+        bits = (self.errors[:, None] >> np.arange(len(self.check_names), dtype=np.uint64)) & np.uint64(1)
+        totals = bits.sum(axis=0)
+        return {name: int(total) for name, total in zip(self.check_names, totals) if total}
+
+    def messages(self):
+        """Texto dos erros por linha ('' nas válidas), calculado uma vez por combinação distinta de erros."""
+        codes, inverse = np.unique(self.errors, return_inverse=True)
+        texts = np.array([
+            '; '.join(name for bit, name in enumerate(self.check_names) if int(code) >> bit & 1)
+            for code in codes
+        ], dtype=object)
+        return pd.Series(texts[inverse.ravel()], index=self.data.index)
+
+    def field_errors(self, row=0):
+        """{coluna: [checagens que falharam]} de uma linha; usado pela UI para apontar o campo."""
+        out = {}
+        code = int(self.errors[row])
+        for bit, name in enumerate(self.check_names):
+            if code >> bit & 1:
+                column, check = name.split(':', 1)
+                out.setdefault(column, []).append(check)
+        return out
+
+    def clean(self):
+        return self.data[self.valid]
+
+    def rejected(self):
+        rejected = self.data[~self.valid].copy()
+        rejected['ERRORS'] = self.messages()[~self.valid]
+        return rejected
+
+
+def per_row(codes, per_unique):
+    """Espalha um resultado calculado por valor distinto para as linhas (código -1, o nulo, vira False/None)."""
+    fill = None if per_unique.dtype == object else False
+    return np.append(per_unique, fill)[codes]
+
+
+class Factorized:
+    """Coluna de texto como (códigos, valores distintos já limpos): as checagens rodam só nos distintos."""
+
+    def __init__(self, raw, clean):
+        self.codes, uniques = pd.factorize(raw, use_na_sentinel=True)
+        self.uniques = clean(np.asarray(uniques, dtype=object))
+        self.lengths = np.array([len(value) for value in self.uniques], dtype=np.int64)
+
+    def values(self):
+        return per_row(self.codes, self.uniques)
+
+
+class CompiledSchema:
+    def __init__(self, schema=None):
+        self.schema = schema or VALIDATION_SCHEMA
+        self.checks = []
+        self.transforms = {}
+        for column, spec in self.schema.items():
+            self._compile(column, spec)
+        if len(self.checks) > 64:
+            raise ValueError(f"{len(self.checks)} checks do not fit in a 64-bit error mask")
+
+    @property
+    def check_names(self):
+        return [name for name, _, _ in self.checks]
+
+    def _check(self, column, name, fn):
+        self.checks.append((f"{column}:{name}", column, fn))
+
+    def _compile(self, column, spec):
+        kind = spec['type']
+        required = spec.get('required', True)
+        if kind == 'number':
+            # (valores float64, máscara de preenchidos)
+            self.transforms[column] = lambda raw: (pd.to_numeric(raw, errors='coerce').to_numpy(np.float64), raw.notna().to_numpy())
+            if required:
+                self._check(column, 'missing', lambda v: ~v[1])
+            self._check(column, 'not_a_number', lambda v: np.isnan(v[0]) & v[1])
+            self._check(column, 'not_finite', lambda v: np.isinf(v[0]))
+            if 'min' in spec:
+                low = spec['min']
+                self._check(column, f'below_{low:g}', lambda v: v[0] < low)
+            if 'max' in spec:
+                high = spec['max']
+                self._check(column, f'above_{high:g}', lambda v: v[0] > high)
+        elif kind == 'string':
+            self.transforms[column] = lambda raw: Factorized(raw, lambda u: np.array([str(x).strip() for x in u], dtype=object))
+            if required:
+                self._check(column, 'missing', lambda v: (v.codes < 0) | per_row(v.codes, v.lengths == 0))
+            if 'max_length' in spec:
+                limit = spec['max_length']
+                self._check(column, f'longer_than_{limit}', lambda v: per_row(v.codes, v.lengths > limit))
+        elif kind == 'category':
+            policy = spec.get('unknown', 'reject')
+            if policy not in UNKNOWN_POLICIES:
+                raise ValueError(f"Unknown-category policy must be one of {UNKNOWN_POLICIES}")
+            aliases = spec.get('aliases', {})
+            self.transforms[column] = lambda raw: Factorized(
+                raw, lambda u: np.array([aliases.get(x, x) for x in canonical_category(u)], dtype=object)
+            )
+            if required:
+                self._check(column, 'missing', lambda v: v.codes < 0)
+            if policy == 'reject':
+                allowed = np.array(spec['allowed'], dtype=object)
+                self._check(column, 'unknown_category', lambda v: per_row(v.codes, ~np.isin(v.uniques, allowed)))
+        else:
+            raise ValueError(f"Unknown type '{kind}' for column {column}")
+
+    def validate(self, df):
+        missing = [column for column, spec in self.schema.items()
+                   if column not in df.columns and spec.get('required', True)]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+        present = [column for column in CSV_COLUMNS if column in self.schema and column in df.columns] + \
+                  [column for column in self.schema if column not in CSV_COLUMNS and column in df.columns]
+        values = {column: self.transforms[column](df[column]) for column in present}
+
+        errors = np.zeros(len(df), dtype=np.uint64)
+        for bit, (_, column, fn) in enumerate(self.checks):
+            if column in values:
+                errors |= np.asarray(fn(values[column]), dtype=np.uint64) << np.uint64(bit)
+
+        # Política 'fallback': o valor desconhecido vira o substituto e a linha segue, marcada
+        remapped = np.zeros(len(df), dtype=bool)
+        for column in present:
+            spec = self.schema[column]
+            if spec['type'] == 'category' and spec.get('unknown') == 'fallback':
+                factorized = values[column]
+                unknown = ~np.isin(factorized.uniques, spec['allowed'])
+                factorized.uniques = np.where(unknown, spec['fallback_value'], factorized.uniques)
+                remapped |= per_row(factorized.codes, unknown)
+
+        columns = {}
+        for column in present:
+            v = values[column]
+            columns[column] = v.values() if isinstance(v, Factorized) else v[0]
+        data = pd.DataFrame(columns, index=df.index)
+        return ValidationResult(data, errors, self.check_names, remapped)
+
+
+COMPILED_SCHEMA = CompiledSchema()
+COMPILED_UI_SCHEMA = CompiledSchema(UI_VALIDATION_SCHEMA)
+
+
+def validate(df, schema=None):
+    """Valida com o VALIDATION_SCHEMA (já compilado) ou com um schema informado."""
+    compiled = COMPILED_SCHEMA if schema is None else CompiledSchema(schema)
+    return compiled.validate(df)
+
+
+def validate_csv(path, valid_path=None, invalid_path=None, chunksize=500_000):
+    """Valida um CSV em blocos; as linhas boas e as rejeitadas (com os erros) vão para arquivos separados."""
+    totals = {'rows': 0, 'invalid': 0, 'checks': {}}
+    header = True
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=True, chunksize=chunksize):
+        result = validate(chunk)
+        totals['rows'] += len(chunk)
+        totals['invalid'] += result.n_invalid
+        for name, count in result.counts().items():
+            totals['checks'][name] = totals['checks'].get(name, 0) + count
+        mode = 'w' if header else 'a'
+        if valid_path:
+            result.clean().to_csv(valid_path, index=False, header=header, mode=mode)
+        if invalid_path:
+            result.rejected().to_csv(invalid_path, index=False, header=header, mode=mode)
+        header = False
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a CSV in the ESG dataset layout")
+    parser.add_argument('csv')
+    parser.add_argument('--valid', help="write the rows that passed to this CSV")
+    parser.add_argument('--invalid', help="write the rejected rows, with an ERRORS column, to this CSV")
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    args = parser.parse_args()
+
+    for path in (args.valid, args.invalid):
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    totals = validate_csv(args.csv, args.valid, args.invalid, args.chunksize)
+    print(f"{totals['rows']} rows, {totals['invalid']} invalid")
+    for name, count in sorted(totals['checks'].items(), key=lambda item: -item[1]):
+        print(f"  {name:<40} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import bisect
+import hashlib
+import argparse
+import numpy as np
+
+"""
+    Pipeline de dados do fine-tuning do Gemma no dataset de instruções do ISE B3
+    1. Tokeniza cada par instrução/resposta uma única vez (a perda só conta na resposta)
+    2. Empacota os exemplos em sequências de tamanho fixo (best-fit decreasing por janela),
+       guardando o id do exemplo em cada posição para a atenção não cruzar fronteiras
+    3. Grava shards .npy mapeados em memória + index.json; se dataset, tokenizer e
+       seq_len não mudaram, o cache é reaproveitado e nada é re-tokenizado
+    O PackedLoader lê os shards por mmap, embaralha por época com semente fixa e
+    tem state_dict()/load_state_dict() para retomar o treino no lote exato.
+    Uso: python -m gemma_ft.data_pipeline --tokenizer models/gemma-2b-FT
+         python -m gemma_ft.data_pipeline --tokenizer byte   (tokenizer mínimo para testes em CPU)
+         python -m gemma_ft.data_pipeline --dataset data/cache/ft_dedup/train.json   (após gemma_ft.dedup)
+"""
+
+DATASET_PATH = 'gemma_ft/ft_dataset/ise_b3_dataset_7000.json'
+CACHE_DIR = 'data/cache/ft_tokens'
+
+# Mesmo formato de pergunta/resposta do main_prompt_template do ISEOrchestrator
+PROMPT_TEMPLATE = "### User Question:\n{question}\n\n### Assistant Response:\n"
+
+FORMAT_VERSION = 1
+SEQUENCES_PER_SHARD = 4096
+PACK_WINDOW = 20000
+IGNORE_INDEX = -100
+
+
+class ByteTokenizer:
+    """Tokenizer de bytes UTF-8 (vocabulário 259), só para rodar o pipeline em CPU sem baixar nada."""
+
+    name_or_path = 'byte'
+    pad_token_id = 256
+    bos_token_id = 257
+    eos_token_id = 258
+    vocab_size = 259
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {'input_ids': [list(text.encode('utf-8')) for text in texts]}
+
+
+def load_tokenizer(name):
+    if name == 'byte':
+        return ByteTokenizer()
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name)
+
+
+def tokenizer_fingerprint(tokenizer):
+    digest = hashlib.sha256(str(getattr(tokenizer, 'name_or_path', type(tokenizer).__name__)).encode('utf-8'))
+    digest.update(str(getattr(tokenizer, 'vocab_size', '')).encode('utf-8'))
+    digest.update(str(tokenizer.eos_token_id).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def dataset_fingerprint(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def format_prompt(example):
+    question = example['instruction'].strip()
+    if example.get('input', '').strip():
+        question = f"{question}\n\n{example['input'].strip()}"
+    return PROMPT_TEMPLATE.format(question=question)
+
+
+def tokenize_examples(examples, tokenizer, seq_len, batch_size=1000):
+    """Lista de (tokens, n_prompt): o prompt não entra na perda; exemplos maiores que seq_len são truncados."""
+    bos = [tokenizer.bos_token_id] if tokenizer.bos_token_id is not None else []
+    eos = [tokenizer.eos_token_id]
+    docs = []
+    for start in range(0, len(examples), batch_size):
+        batch = examples[start:start + batch_size]
+        prompts = tokenizer([format_prompt(ex) for ex in batch], add_special_tokens=False)['input_ids']
+        answers = tokenizer([ex['output'].strip() for ex in batch], add_special_tokens=False)['input_ids']
+        for prompt, answer in zip(prompts, answers):
+            tokens = (bos + prompt + answer + eos)[:seq_len]
+            docs.append((np.asarray(tokens, dtype=np.uint32), min(len(bos) + len(prompt), len(tokens))))
+    return docs
+
+
+def pack(lengths, seq_len):
+    """Best-fit decreasing: cada exemplo vai para a sequência aberta com o menor espaço que ainda o comporta."""
+    order = np.argsort(-np.asarray(lengths), kind='stable')
+    bins = []
+    # (espaço livre, id da sequência), ordenado pelo espaço livre
+    free = []
+    for doc in order:
+        size = lengths[doc]
+        i = bisect.bisect_left(free, (size, -1))
+        if i < len(free):
+            space, b = free.pop(i)
+        else:
+            space, b = seq_len, len(bins)
+            bins.append([])
+        bins[b].append(int(doc))
+        if space - size > 0:
+            bisect.insort(free, (space - size, b))
+    return bins
+
+
+class ShardWriter:
+    def __init__(self, out_dir, seq_len, sequences_per_shard=SEQUENCES_PER_SHARD):
+        self.out_dir = out_dir
+        self.seq_len = seq_len
+        self.sequences_per_shard = sequences_per_shard
+        self.shards = []
+        self._buffer = []
+
+    def add(self, tokens, loss_mask, segments):
+        self._buffer.append((tokens, loss_mask, segments))
+        if len(self._buffer) == self.sequences_per_shard:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        name = f"shard_{len(self.shards):05d}"
+        n = len(self._buffer)
+        for suffix, dtype, k in (('tokens', np.uint32, 0), ('loss_mask', np.uint8, 1), ('segments', np.uint16, 2)):
+            path = os.path.join(self.out_dir, f"{name}.{suffix}.npy")
+            arr = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(n, self.seq_len))
+            for row, item in enumerate(self._buffer):
+                arr[row] = item[k]
+            arr.flush()
+            del arr
+        self.shards.append({'name': name, 'sequences': n})
+        self._buffer = []
+
+
+def build_shards(dataset_path=DATASET_PATH, tokenizer=None, seq_len=1024, out_dir=CACHE_DIR,
+                 sequences_per_shard=SEQUENCES_PER_SHARD, pack_window=PACK_WINDOW, force=False):
+    """Gera (ou reaproveita) os shards em out_dir e devolve o index."""
+    tokenizer = tokenizer or ByteTokenizer()
+    key = {
+        'format_version': FORMAT_VERSION,
+        'dataset_sha256': dataset_fingerprint(dataset_path),
+        'tokenizer': tokenizer_fingerprint(tokenizer),
+        'seq_len': seq_len
+    }
+    index_path = os.path.join(out_dir, 'index.json')
+    if not force and os.path.exists(index_path):
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if all(index.get(k) == v for k, v in key.items()):
+            print(f"Reusing cached token shards in {out_dir}")
+            return index
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+
+    pad = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    writer = ShardWriter(out_dir, seq_len, sequences_per_shard)
+    n_docs = n_tokens = n_loss_tokens = 0
+
+    # Empacota por janelas para a memória não depender do tamanho do dataset
+    for start in range(0, len(examples), pack_window):
+        docs = tokenize_examples(examples[start:start + pack_window], tokenizer, seq_len)
+        for doc_ids in pack([len(tokens) for tokens, _ in docs], seq_len):
+            tokens = np.full(seq_len, pad, dtype=np.uint32)
+            loss_mask = np.zeros(seq_len, dtype=np.uint8)
+            segments = np.zeros(seq_len, dtype=np.uint16)
+            pos = 0
+            for seg, doc in enumerate(doc_ids, start=1):
+                doc_tokens, n_prompt = docs[doc]
+                end = pos + len(doc_tokens)
+                tokens[pos:end] = doc_tokens
+                loss_mask[pos + n_prompt:end] = 1
+                segments[pos:end] = seg
+                pos = end
+            writer.add(tokens, loss_mask, segments)
+            n_tokens += pos
+            n_loss_tokens += int(loss_mask.sum())
+        n_docs += len(docs)
+    writer.flush()
+
+    n_sequences = sum(shard['sequences'] for shard in writer.shards)
+    index = {
+        **key,
+        'dataset': dataset_path,
+        'pad_token_id': int(pad),
+        'examples': n_docs,
+        'sequences': n_sequences,
+        'tokens': n_tokens,
+        'loss_tokens': n_loss_tokens,
+        'packing_efficiency': round(n_tokens / max(1, n_sequences * seq_len), 4),
+        'shards': writer.shards
+    }
+    # O index é escrito por último: sem ele o cache é considerado incompleto
+    tmp_path = f"{index_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+    print(f"Packed {n_docs} examples into {n_sequences} sequences of {seq_len} tokens "
+          f"({index['packing_efficiency']:.1%} filled, {len(writer.shards)} shards)")
+    return index
+
+
+def position_ids(segments):
+    """Posições reiniciadas a cada exemplo empacotado (vetorizado por lote)."""
+    T = segments.shape[-1]
+    idx = np.broadcast_to(np.arange(T), segments.shape)
+    starts = np.concatenate([np.ones(segments.shape[:-1] + (1,), dtype=bool), segments[..., 1:] != segments[..., :-1]], axis=-1)
+    start_idx = np.maximum.accumulate(np.where(starts, idx, 0), axis=-1)
+    return (idx - start_idx).astype(np.int64)
+
+
+def attention_mask(segments):
+    """Máscara causal bloco-diagonal (B, 1, T, T): cada token só enxerga o próprio exemplo."""
+    same = segments[:, :, None] == segments[:, None, :]
+    causal = np.tril(np.ones((segments.shape[-1],) * 2, dtype=bool))
+    # O padding só enxerga a si mesmo: nenhuma linha fica toda mascarada (softmax sem NaN)
+    diagonal = np.eye(segments.shape[-1], dtype=bool)
+    return ((same & causal & (segments[:, :, None] > 0)) | diagonal)[:, None]
+
+
+class PackedLoader:
+    """Lotes dos shards mapeados em memória, com ordem determinística por época e retomada exata."""
+
+    def __init__(self, out_dir=CACHE_DIR, batch_size=8, shuffle=True, seed=42, drop_last=False, with_mask=False):
+        with open(os.path.join(out_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.with_mask = with_mask
+
+        self.shards = [
+            {suffix: np.load(os.path.join(out_dir, f"{shard['name']}.{suffix}.npy"), mmap_mode='r')
+             for suffix in ('tokens', 'loss_mask', 'segments')}
+            for shard in self.index['shards']
+        ]
+        self.offsets = np.cumsum([0] + [shard['sequences'] for shard in self.index['shards']])
+        self.n_sequences = int(self.offsets[-1])
+
+        self.epoch = 0
+        self.position = 0
+
+    def __len__(self):
+        if self.drop_last:
+            return self.n_sequences // self.batch_size
+        return -(-self.n_sequences // self.batch_size)
+
+    def state_dict(self):
+        return {'epoch': self.epoch, 'position': self.position, 'seed': self.seed}
+
+    def load_state_dict(self, state):
+        self.epoch = state['epoch']
+        self.position = state['position']
+        self.seed = state['seed']
+
+    def order(self, epoch):
+        if not self.shuffle:
+            return np.arange(self.n_sequences)
+        return np.random.default_rng((self.seed, epoch)).permutation(self.n_sequences)
+
+    def gather(self, rows):
+        # Ordena por shard/linha para leituras sequenciais no mmap e volta à ordem do lote
+        rows = np.asarray(rows)
+        sort = np.argsort(rows, kind='stable')
+        shard_ids = np.searchsorted(self.offsets, rows[sort], side='right') - 1
+        out = {suffix: np.empty((len(rows), self.index['seq_len']), dtype=self.shards[0][suffix].dtype)
+               for suffix in ('tokens', 'loss_mask', 'segments')}
+        for s in np.unique(shard_ids):
+            sel = shard_ids == s
+            local = rows[sort][sel] - self.offsets[s]
+            for suffix in out:
+                out[suffix][sort[sel]] = self.shards[s][suffix][local]
+        return out
+
+    def make_batch(self, rows):
+        arrays = self.gather(rows)
+        tokens = arrays['tokens'].astype(np.int64)
+        labels = np.where(arrays['loss_mask'] == 1, tokens, IGNORE_INDEX)
+        batch = {
+            'input_ids': tokens,
+            'labels': labels,
+            'position_ids': position_ids(arrays['segments']),
+            'segment_ids': arrays['segments'].astype(np.int64)
+        }
+        if self.with_mask:
+            batch['attention_mask'] = attention_mask(arrays['segments'])
+        return batch
+
+    def __iter__(self):
+        """Continua de onde o state_dict parou; ao fim da época avança para a próxima."""
+        order = self.order(self.epoch)
+        while self.position < self.n_sequences:
+            rows = order[self.position:self.position + self.batch_size]
+            if self.drop_last and len(rows) < self.batch_size:
+                break
+            self.position += len(rows)
+            yield self.make_batch(rows)
+        self.epoch += 1
+        self.position = 0
+
+
+def to_torch(batch, device='cpu'):
+    import torch
+    return {key: torch.from_numpy(np.ascontiguousarray(value)).to(device) for key, value in batch.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize and pack the ISE B3 instruction dataset")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--tokenizer', default='byte', help="Hugging Face tokenizer path/name, or 'byte'")
+    parser.add_argument('--seq-len', type=int, default=1024)
+    parser.add_argument('--out', default=CACHE_DIR)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    index = build_shards(args.dataset, load_tokenizer(args.tokenizer), args.seq_len, args.out, force=args.force)
+    print(json.dumps({k: v for k, v in index.items() if k != 'shards'}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+import numpy as np
+from gemma_ft.data_pipeline import DATASET_PATH
+
+"""
+    Detecção de quase-duplicatas no dataset de fine-tuning (MinHash + LSH)
+    1. Cada campo vira um conjunto de 3-gramas de palavras (normalizado) e uma assinatura
+       MinHash; o custo é linear no número de shingles
+    2. LSH por bandas: só pares que caem no mesmo balde de alguma banda são comparados,
+       cada item com uma janela fixa de vizinhos do balde, então não há etapa quadrática
+    3. Duplicata = instrução e resposta juntas com Jaccard estimado >= limiar; cada cluster
+       mantém só o primeiro registro
+    4. Split sem vazamento: clusters que compartilham uma instrução OU uma resposta
+       parecida ficam no mesmo grupo, e grupos inteiros vão para treino ou avaliação
+    Uso: python -m gemma_ft.dedup [--threshold 0.8] [--eval-fraction 0.1]
+"""
+
+OUT_DIR = 'data/cache/ft_dedup'
+FIELDS = ('instruction', 'output')
+
+NUM_PERM = 128
+NGRAM = 3
+THRESHOLD = 0.8
+WINDOW = 8
+EVAL_FRACTION = 0.1
+
+# Primo de Mersenne 2^61 - 1: com a < 2^32 e hashes de 32 bits, a*x + b cabe em uint64
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+
+def normalize(text):
+    return re.findall(r'\w+', text.casefold())
+
+
+def shingles(text, ngram=NGRAM):
+    words = normalize(text)
+    if len(words) <= ngram:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + ngram]) for i in range(len(words) - ngram + 1)}
+
+
+def lsh_params(num_perm, threshold):
+    """(bandas, linhas) com b*r = num_perm e o ponto de inflexão (1/b)^(1/r) mais próximo do limiar."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, ngram=NGRAM, seed=42):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.ngram = ngram
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles(text, self.ngram)), dtype=np.uint64
+        )
+        if hashes.size == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        return ((hashes[:, None] * self.a + self.b) % MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+    def signatures(self, texts):
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            out[i] = self.signature(text)
+        return out
+
+
+def similar_pairs(signatures, threshold=THRESHOLD, window=WINDOW):
+    """Pares (i, j) com Jaccard estimado >= threshold, vindos dos baldes do LSH."""
+    # Assinaturas idênticas viram um único item antes do LSH (são pares com similaridade 1)
+    _, first, inverse = np.unique(signatures, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    found = [np.stack([first[inverse], np.arange(len(inverse))], axis=1)[first[inverse] != np.arange(len(inverse))]]
+
+    unique = signatures[first]
+    bands, rows = lsh_params(signatures.shape[1], threshold)
+    for band in range(bands):
+        block = np.ascontiguousarray(unique[:, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        bucket = np.unique(keys, return_inverse=True)[1].ravel()
+        order = np.argsort(bucket, kind='stable')
+        # Cada item é comparado só com os 'window' anteriores do mesmo balde: O(n * window) por banda
+        for offset in range(1, window + 1):
+            a, b = order[:-offset], order[offset:]
+            same = bucket[a] == bucket[b]
+            a, b = a[same], b[same]
+            if a.size == 0:
+                break
+            keep = (unique[a] == unique[b]).mean(axis=1) >= threshold
+            found.append(first[np.stack([a[keep], b[keep]], axis=1)])
+    return np.unique(np.concatenate(found).reshape(-1, 2), axis=0)
+
+
+def components(n, pairs):
+    """Union-find: rótulo de componente (o menor índice) para cada item."""
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+
+class Deduplicator:
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, ngram=NGRAM, seed=42):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, ngram, seed)
+
+    def field_signatures(self, examples):
+        return {field: self.hasher.signatures([ex.get(field, '') for ex in examples]) for field in FIELDS}
+
+    def clusters(self, examples, signatures=None):
+        """Rótulo de cluster por registro: instrução e resposta juntas (assinaturas concatenadas)."""
+        signatures = signatures or self.field_signatures(examples)
+        combined = np.concatenate([signatures[field] for field in FIELDS], axis=1)
+        return components(len(examples), similar_pairs(combined, self.threshold))
+
+    def groups(self, signatures, labels):
+        """Une clusters cujos representantes compartilham instrução ou resposta parecida."""
+        reps = np.unique(labels)
+        pairs = [reps[similar_pairs(signatures[field][reps], self.threshold)] for field in FIELDS]
+        rep_group = components(len(labels), np.concatenate(pairs))[reps]
+        return dict(zip(reps.tolist(), rep_group.tolist()))
+
+    def run(self, examples, eval_fraction=EVAL_FRACTION, seed=42):
+        signatures = self.field_signatures(examples)
+        labels = self.clusters(examples, signatures)
+        reps = np.unique(labels)
+        rep_group = self.groups(signatures, labels)
+
+        # Grupos inteiros, em ordem aleatória fixa, enchem a avaliação até a fração pedida
+        group_ids = sorted(set(rep_group.values()))
+        group_size = {g: 0 for g in group_ids}
+        for rep in reps.tolist():
+            group_size[rep_group[rep]] += 1
+        order = np.random.default_rng(seed).permutation(len(group_ids))
+        eval_groups, n_eval = set(), 0
+        target = eval_fraction * len(reps)
+        for k in order:
+            g = group_ids[k]
+            if n_eval >= target:
+                break
+            # Um grupo grande demais é pulado, a não ser que a avaliação ainda esteja vazia
+            if not eval_groups or n_eval + group_size[g] <= 1.5 * target:
+                eval_groups.add(g)
+                n_eval += group_size[g]
+
+        train = [examples[r] for r in reps.tolist() if rep_group[r] not in eval_groups]
+        evaluation = [examples[r] for r in reps.tolist() if rep_group[r] in eval_groups]
+
+        sizes = np.bincount(labels, minlength=len(examples))
+        report = [
+            {
+                'representative': int(rep),
+                'size': int(sizes[rep]),
+                'group': int(rep_group[rep]),
+                'split': 'eval' if rep_group[rep] in eval_groups else 'train',
+                'instruction': examples[rep]['instruction'],
+                'members': np.flatnonzero(labels == rep).tolist()
+            }
+            for rep in sorted(reps.tolist(), key=lambda r: -sizes[r])
+        ]
+        return {
+            'examples': len(examples),
+            'clusters': len(reps),
+            'duplicates': len(examples) - len(reps),
+            'groups': len(group_ids),
+            'train': train,
+            'eval': evaluation,
+            'report': report
+        }
+
+    def leakage(self, train, evaluation):
+        """Pares treino/avaliação parecidos em algum campo; deve ser 0."""
+        both = train + evaluation
+        signatures = self.field_signatures(both)
+        n_train = len(train)
+        leaks = 0
+        for field in FIELDS:
+            pairs = similar_pairs(signatures[field], self.threshold)
+            leaks += int(((pairs[:, 0] < n_train) != (pairs[:, 1] < n_train)).sum())
+        return leaks
+
+
+def write_json(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate detection and leakage-free split for the fine-tune corpus")
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--out', default=OUT_DIR)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--num-perm', type=int, default=NUM_PERM)
+    parser.add_argument('--eval-fraction', type=float, default=EVAL_FRACTION)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.dataset, 'r', encoding='utf-8') as f:
+        examples = json.load(f)
+
+    dedup = Deduplicator(args.threshold, args.num_perm, seed=args.seed)
+    result = dedup.run(examples, args.eval_fraction, args.seed)
+
+    os.makedirs(args.out, exist_ok=True)
+    write_json(os.path.join(args.out, 'train.json'), result['train'])
+    write_json(os.path.join(args.out, 'eval.json'), result['eval'])
+    write_json(os.path.join(args.out, 'dataset_dedup.json'), [examples[c['representative']] for c in
+                                                              sorted(result['report'], key=lambda c: c['representative'])])
+    write_json(os.path.join(args.out, 'clusters.json'), result['report'])
+
+    print(f"Examples: {result['examples']}, clusters: {result['clusters']} "
+          f"({result['duplicates']} near-duplicates removed), split groups: {result['groups']}")
+    print(f"Train: {len(result['train'])}, eval: {len(result['eval'])}, "
+          f"train/eval leaks: {dedup.leakage(result['train'], result['eval'])}")
+    for cluster in result['report'][:5]:
+        print(f"  {cluster['size']:5d}x  {cluster['instruction'][:70]}")
+    print(f"Outputs written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
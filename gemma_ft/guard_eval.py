@@ -0,0 +1,348 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import Counter, defaultdict
+from gemma_ft.data_pipeline import DATASET_PATH, dataset_fingerprint
+
+"""
+    Avaliação offline do guard e das respostas do ISEOrchestrator
+    O guard_prompt (e os 'examples' do brain_prompt.yaml) decide o que o chat responde,
+    mas nunca foi medido. Este job roda o mesmo guard_prompt_template e o mesmo
+    main_prompt_template do orquestrador sobre:
+    - todas as instruções do dataset ISE B3 (rótulo ALLOWED, sem repetições);
+    - o conjunto rotulado de fora do escopo (ft_dataset/guard_labels.json);
+    - os 'examples' do próprio brain_prompt.yaml.
+    A geração é gulosa em lotes grandes com padding à esquerda; os prompts são ordenados
+    por tamanho para cada lote ter pouco padding. Cada lote concluído é anexado a um
+    JSONL na pasta de saída, então um job interrompido retoma de onde parou (run.json
+    guarda modelo, prompts e parâmetros; se mudarem, é preciso --restart).
+    O relatório traz precisão/revocação do guard (BLOCKED é a classe positiva), erros
+    por fonte e a vazão em exemplos/s do guard e das respostas.
+    Uso: python -m gemma_ft.guard_eval run [--model models/gemma-2b-FT] [--batch-size 32] [--answers 500]
+         python -m gemma_ft.guard_eval report [--out data/cache/guard_eval]
+"""
+
+MODEL_PATH = 'models/gemma-2b-FT'
+PROMPTS_PATH = 'prompts/brain_prompt.yaml'
+LABELS_PATH = 'gemma_ft/ft_dataset/guard_labels.json'
+OUT_DIR = 'data/cache/guard_eval'
+
+BATCH_SIZE = 32
+ANSWER_TOKENS = 256
+ANSWER_SAMPLE = 500
+ERRORS_SHOWN = 10
+
+
+def example_id(source, question):
+    return hashlib.sha1(f"{source}\n{question}".encode('utf-8')).hexdigest()[:16]
+
+
+def load_examples(prompts, dataset_path=DATASET_PATH, labels_path=LABELS_PATH):
+    """Lista de {id, source, category, question, label}; a mesma pergunta só entra uma vez por fonte."""
+    examples = {}
+
+    def add(source, category, question, label):
+        question = question.strip()
+        key = example_id(source, question)
+        if question and key not in examples:
+            examples[key] = {'id': key, 'source': source, 'category': category, 'question': question, 'label': label}
+
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        for ex in json.load(f):
+            add('ise_b3_dataset', 'in_scope', ex['instruction'], 'ALLOWED')
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        for ex in json.load(f):
+            add('guard_labels', ex['category'], ex['question'], ex['label'])
+    for ex in prompts.get('examples', []):
+        add('prompt_examples', 'prompt_examples', ex['question'], ex['answer'].strip().upper())
+    return list(examples.values())
+
+
+def is_blocked(text):
+    # Mesma regra do ISEOrchestrator._is_blocked
+    return "BLOCKED" in text.strip().upper()
+
+
+class HFGenerator:
+    """Geração em lote (gulosa por padrão) com o modelo/tokenizer do GemmaLLM; só o texto novo é decodificado."""
+
+    def __init__(self, model, tokenizer):
+        import torch
+        self.torch = torch
+        self.model = model
+        self.tokenizer = tokenizer
+        # Padding à esquerda: todas as sequências do lote terminam juntas e o generate continua dali
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token_id is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+    def count_tokens(self, texts):
+        return [len(ids) for ids in self.tokenizer(texts)['input_ids']]
+
+    def generate(self, prompts, max_new_tokens, temperature=0.0):
+        """(textos, tokens gerados por prompt); amostra só com temperature > 0, como o GemmaLLM."""
+        inputs = self.tokenizer(prompts, return_tensors='pt', padding=True).to(self.model.device)
+        with self.torch.inference_mode():
+            output = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                do_sample=temperature > 0.0,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        new = output[:, inputs['input_ids'].shape[-1]:]
+        # Tokens até o primeiro eos (o resto do lote é padding do generate)
+        finished = (new == self.tokenizer.eos_token_id) | (new == self.tokenizer.pad_token_id)
+        lengths = self.torch.where(finished.any(dim=1), finished.int().argmax(dim=1), new.shape[1])
+        texts = self.tokenizer.batch_decode(new, skip_special_tokens=True)
+        return texts, lengths.tolist()
+
+
+def load_generator(model_path, prompts_path):
+    """Carrega pelo ISEOrchestrator para os templates serem exatamente os de produção."""
+    from models.gemma_orchestrator import ISEOrchestrator
+    orchestrator = ISEOrchestrator(model_path, prompts_path)
+    return orchestrator, HFGenerator(orchestrator.llm.model, orchestrator.llm.tokenizer)
+
+
+class Checkpoint:
+    """Resultados por exemplo em JSONL; cada lote é anexado e vai para o disco antes do próximo."""
+
+    def __init__(self, out_dir, name):
+        self.path = os.path.join(out_dir, f"{name}.jsonl")
+        self.done = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # Uma linha cortada no meio (job morto durante a escrita) é descartada e refeita
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.done[record['id']] = record
+
+    def append(self, records):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        for record in records:
+            self.done[record['id']] = record
+
+
+def run_fingerprint(args, guard_invocation):
+    digest = hashlib.sha256()
+    for path in (args.prompts, LABELS_PATH, args.dataset):
+        digest.update(dataset_fingerprint(path).encode('utf-8'))
+    return {
+        'inputs': digest.hexdigest(),
+        'model': os.path.abspath(args.model),
+        'guard': guard_invocation,
+        'answer_tokens': args.answer_tokens,
+        'answers': args.answers,
+    }
+
+
+def open_run(out_dir, fingerprint, restart=False):
+    """Cria ou retoma a pasta do job; resultados de outro modelo/prompt não se misturam."""
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, 'run.json')
+    if os.path.exists(path) and not restart:
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous != fingerprint:
+            raise ValueError(f"{out_dir} holds a run with a different model, prompts or settings; use --restart")
+        return True
+    for name in ('guard.jsonl', 'answers.jsonl', 'report.json'):
+        if os.path.exists(os.path.join(out_dir, name)):
+            os.remove(os.path.join(out_dir, name))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f, indent=2)
+    return False
+
+
+def batches(items, prompts, generator, batch_size):
+    """Lotes de (itens, prompts) em ordem de tamanho do prompt, para o padding ficar mínimo."""
+    lengths = generator.count_tokens(prompts)
+    order = sorted(range(len(items)), key=lambda i: lengths[i])
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        yield [items[i] for i in chunk], [prompts[i] for i in chunk]
+
+
+def run_stage(name, items, prompts, generator, checkpoint, batch_size, invocation, make_record):
+    pending = [i for i, item in enumerate(items) if item['id'] not in checkpoint.done]
+    print(f"{name}: {len(items) - len(pending)} done, {len(pending)} to go")
+    if not pending:
+        return
+    items, prompts = [items[i] for i in pending], [prompts[i] for i in pending]
+    finished = 0
+    start = time.perf_counter()
+    for batch, batch_prompts in batches(items, prompts, generator, batch_size):
+        t0 = time.perf_counter()
+        texts, tokens = generator.generate(batch_prompts, **invocation)
+        seconds = time.perf_counter() - t0
+        # Tempo do lote dividido igualmente: a vazão do relatório soma esses tempos
+        checkpoint.append([make_record(item, text, n, seconds / len(batch))
+                           for item, text, n in zip(batch, texts, tokens)])
+        finished += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"  {finished}/{len(items)}  {finished / elapsed:.1f} examples/s", flush=True)
+
+
+def guard_record(item, text, tokens, seconds):
+    return {
+        'id': item['id'], 'source': item['source'], 'category': item['category'],
+        'question': item['question'], 'label': item['label'],
+        'prediction': 'BLOCKED' if is_blocked(text) else 'ALLOWED',
+        'output': text.strip(), 'seconds': round(seconds, 5)
+    }
+
+
+def answer_record(item, text, tokens, seconds):
+    return {'id': item['id'], 'question': item['question'], 'answer': text.strip(),
+            'tokens': int(tokens), 'seconds': round(seconds, 5)}
+
+
+def answer_sample(examples, n):
+    """Amostra fixa das perguntas ALLOWED do dataset (a ordem dos ids é estável entre execuções)."""
+    allowed = [ex for ex in examples if ex['source'] == 'ise_b3_dataset']
+    return sorted(allowed, key=lambda ex: ex['id'])[:n]
+
+
+def run(args, orchestrator=None, generator=None):
+    if generator is None:
+        orchestrator, generator = load_generator(args.model, args.prompts)
+    # Os parâmetros do guard vêm do próprio orquestrador: o que se mede é o que roda no chat
+    guard_invocation = orchestrator.GUARD_INVOCATION
+    resumed = open_run(args.out, run_fingerprint(args, guard_invocation), args.restart)
+    print(f"{'Resuming' if resumed else 'Starting'} run in {args.out}")
+
+    examples = load_examples(orchestrator.prompts, args.dataset)
+    if args.limit:
+        examples = examples[:args.limit]
+    guard = Checkpoint(args.out, 'guard')
+    run_stage('guard', examples, [orchestrator.guard_prompt_template.format(question=ex['question']) for ex in examples],
+              generator, guard, args.batch_size, guard_invocation, guard_record)
+
+    sample = answer_sample(examples, args.answers)
+    answers = Checkpoint(args.out, 'answers')
+    run_stage('answers', sample,
+              [orchestrator.main_prompt_template.format(question=ex['question'], history="") for ex in sample],
+              generator, answers, args.batch_size, {'max_new_tokens': args.answer_tokens}, answer_record)
+    return report(args.out)
+
+
+def guard_metrics(records):
+    counts = Counter((r['label'], r['prediction']) for r in records)
+    tp, fp = counts['BLOCKED', 'BLOCKED'], counts['ALLOWED', 'BLOCKED']
+    fn, tn = counts['BLOCKED', 'ALLOWED'], counts['ALLOWED', 'ALLOWED']
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    return {
+        'examples': len(records), 'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': precision, 'recall': recall, 'f1': f1,
+        'accuracy': (tp + tn) / len(records) if records else None
+    }
+
+
+def throughput(records):
+    seconds = sum(r['seconds'] for r in records)
+    result = {'examples': len(records), 'seconds': round(seconds, 2),
+              'examples_per_second': len(records) / seconds if seconds else None}
+    if records and 'tokens' in records[0]:
+        tokens = sum(r['tokens'] for r in records)
+        result['tokens'] = tokens
+        result['tokens_per_second'] = tokens / seconds if seconds else None
+    return result
+
+
+def report(out_dir):
+    guard = list(Checkpoint(out_dir, 'guard').done.values())
+    answers = list(Checkpoint(out_dir, 'answers').done.values())
+    if not guard:
+        raise ValueError(f"no guard results in {out_dir}; run the 'run' command first")
+
+    by_source = defaultdict(list)
+    by_category = defaultdict(list)
+    for r in guard:
+        by_source[r['source']].append(r)
+        by_category[r['category']].append(r)
+    errors = [r for r in guard if r['label'] != r['prediction']]
+    result = {
+        'guard': guard_metrics(guard),
+        'by_source': {source: guard_metrics(rs) for source, rs in sorted(by_source.items())},
+        'by_category': {category: guard_metrics(rs) for category, rs in sorted(by_category.items())},
+        'false_positives': [{'question': r['question'], 'source': r['source'], 'output': r['output']}
+                            for r in errors if r['prediction'] == 'BLOCKED'],
+        'false_negatives': [{'question': r['question'], 'category': r['category'], 'output': r['output']}
+                            for r in errors if r['prediction'] == 'ALLOWED'],
+        'guard_throughput': throughput(guard),
+        'answer_throughput': throughput(answers),
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print_report(result)
+    return result
+
+
+def fmt(value):
+    return '-' if value is None else f"{value:.3f}"
+
+
+def print_report(result):
+    print(f"\n{'guard (BLOCKED = positive)':<28} {'n':>6} {'prec':>6} {'recall':>6} {'f1':>6} {'acc':>6} {'FP':>5} {'FN':>5}")
+    rows = [('all', result['guard'])] + list(result['by_source'].items()) + \
+           [(f"  {category}", m) for category, m in result['by_category'].items()]
+    for name, m in rows:
+        print(f"{name[:28]:<28} {m['examples']:6d} {fmt(m['precision']):>6} {fmt(m['recall']):>6} {fmt(m['f1']):>6} "
+              f"{fmt(m['accuracy']):>6} {m['fp']:5d} {m['fn']:5d}")
+    for title, key in (('False positives (in scope, blocked)', 'false_positives'),
+                       ('False negatives (out of scope, allowed)', 'false_negatives')):
+        if result[key]:
+            print(f"\n{title}: {len(result[key])}")
+            for error in result[key][:ERRORS_SHOWN]:
+                print(f"  {error['question'][:70]!r} -> {error['output'][:20]!r}")
+
+    guard, answers = result['guard_throughput'], result['answer_throughput']
+    print(f"\nGuard: {guard['examples']} examples in {guard['seconds']:.1f} s, {fmt(guard['examples_per_second'])} examples/s")
+    if answers['examples']:
+        print(f"Answers: {answers['examples']} in {answers['seconds']:.1f} s, {fmt(answers['examples_per_second'])} answers/s, "
+              f"{fmt(answers['tokens_per_second'])} tokens/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline batched evaluation of the chat guard and answers")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run (or resume) the guard and answer chains over the evaluation set")
+    run_parser.add_argument('--model', default=MODEL_PATH)
+    run_parser.add_argument('--prompts', default=PROMPTS_PATH)
+    run_parser.add_argument('--dataset', default=DATASET_PATH)
+    run_parser.add_argument('--out', default=OUT_DIR)
+    run_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    run_parser.add_argument('--limit', type=int, default=None, help="only the first N guard examples")
+    run_parser.add_argument('--answers', type=int, default=ANSWER_SAMPLE, help="in-scope questions to answer (0 skips)")
+    run_parser.add_argument('--answer-tokens', type=int, default=ANSWER_TOKENS)
+    run_parser.add_argument('--restart', action='store_true', help="discard previous results in --out")
+    report_parser = commands.add_parser('report', help="metrics from the results saved so far")
+    report_parser.add_argument('--out', default=OUT_DIR)
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'run':
+            run(args)
+        else:
+            report(args.out)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
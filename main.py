@@ -1,56 +1,361 @@
 import sys
-import pandas as pd
-from PyQt6.QtWidgets import QApplication, QMessageBox
-from data.data_treatment import DataTreatment 
-from models.DEC_TREE import RegressionTree
-from models.MLP import NeuralNetwork
-from models.XGBoost import Xgboost
-from models.gemma_orchestrator import ISEOrchestrator
-from app.integrated_ui import IntegratedMainWindow
+import argparse
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+"""
+    Ponto de entrada da plataforma
+    Sem subcomando abre a UI integrada (treina ou carrega os modelos e sobe o chat).
+    Subcomandos headless, sem Qt: train, evaluate, score e chat.
+    Os imports pesados (PyQt6, sklearn, xgboost, torch/transformers, matplotlib) ficam
+    dentro das funções de cada comando, então cada um carrega só o que usa e --help
+    responde sem importar nada além do argparse.
+    Uso: python main.py [--model-version current] [--in-process-llm] [--profile DIR]
+         python main.py train [--publish] [--out-of-core CSV]
+         python main.py evaluate [--model-version current] [--dataset test=data/db/datasetEsgTEST.csv]
+         python main.py score entrada.csv --out predicoes.csv [--invalid rejeitadas.csv]
+         python main.py chat
+"""
 
-    model_path = 'models/gemma-2b-FT'
-    prompts_path = 'prompts/brain_prompt.yaml'
-    
-    orchestrator = ISEOrchestrator(model_path, prompts_path)
+TRAIN_SEED_PATH = 'data/db/datasetEsgTRAIN.csv'
+TEST_PATH = 'data/db/datasetEsgTEST.csv'
+MODEL_PATH = 'models/gemma-2b-FT'
+PROMPTS_PATH = 'prompts/brain_prompt.yaml'
+REGISTRY_PATH = 'models/registry'
+LLM_FACTORY = 'models.gemma_orchestrator:ISEOrchestrator'
+
+
+def export_training_csv(out_of_core=None):
+    """Os registros vivem no SQLite; o treino lê um snapshot em CSV exportado dele."""
+    from data.record_store import RecordStore
+    record_store = RecordStore()
+    record_store.bootstrap(TRAIN_SEED_PATH)
+    return record_store, out_of_core or record_store.export_csv()
+
+
+def train_bundle(args, training_path, profiler, governor=None):
+    """Treina os três modelos (ou carrega do registro) e avalia; devolve (bundle, evaluator, datasets de avaliação)."""
+    from data.schema import load_dataset, file_fingerprint, MemoryReport
+    from models.hyperparameter_search import best_params
+    from models.registry import ModelRegistry, ModelBundle
+    from models.evaluation import Evaluator, metrics_summary, print_reports
+
+    registry = ModelRegistry(args.registry)
+    evaluation_datasets = {'test': TEST_PATH}
+
+    if args.model_version:
+        print(f"01- Loading models '{args.model_version}' from the registry")
+        with profiler.stage("registry load"):
+            bundle = registry.load(args.model_version)
+        print(f"01- Finished ({bundle.version})\n")
+    elif args.out_of_core:
+        from models.out_of_core import OutOfCoreTrainer
+        print("01- Out-of-core training")
+        trainer = OutOfCoreTrainer(
+            args.out_of_core,
+            chunksize=args.chunksize,
+            tree_params=best_params('tree'),
+            mlp_params=best_params('mlp'),
+            xgb_params=best_params('xgb')
+        )
+        with profiler.stage("out-of-core training"):
+            reg_tree, mlp_nn, xg_boost, preprocessor = trainer.train()
+        print("01- Finished\n")
+    else:
+        from data.data_treatment import DataTreatment
+        from models.DEC_TREE import RegressionTree
+        from models.MLP import NeuralNetwork
+        from models.XGBoost import Xgboost
+
+        memory_report = MemoryReport()
+        with profiler.stage("load dataset"):
+            training_df = load_dataset(training_path, report=memory_report)
 
-    training_df = pd.read_csv('data/db/datasetEsgTRAIN.csv')
-    
-    try:
         print("01- Data treatment")
-        inst = DataTreatment(training_df.copy())
-        X_train_tree, X_test_tree, y_train_tree, y_test_tree, le_tree = inst.tree_treatment()
-        X_train_mlp, X_test_mlp, y_train_mlp, y_test_mlp, preprocessor = inst.mlp_treatment()
-        X_train_xg, X_test_xg, y_train_xg, y_test_xg, le_processor = inst.xgboost_treatment()
+        with profiler.stage("data treatment"):
+            inst = DataTreatment(training_df, report=memory_report)
+            X_train_tree, X_test_tree, y_train_tree, y_test_tree, le_tree = inst.tree_treatment()
+            X_train_mlp, X_test_mlp, y_train_mlp, y_test_mlp, preprocessor = inst.mlp_treatment()
+            X_train_xg, X_test_xg, y_train_xg, y_test_xg, le_processor = inst.xgboost_treatment()
+        memory_report.print_report()
+        evaluation_datasets = {'split': inst.holdout(), 'test': TEST_PATH}
         print("01- Finished\n")
 
         print("02- Training Regression Tree")
-        reg_tree = RegressionTree()
-        reg_tree.train_tree(X_train_tree, y_train_tree, le_tree, X_test_tree, y_test_tree)
+        with profiler.stage("train tree"):
+            reg_tree = RegressionTree(params=best_params('tree'))
+            reg_tree.train_tree(X_train_tree, y_train_tree, le_tree, X_test_tree, y_test_tree)
         print("02- Finished\n")
-        
+
         print("03- Training MLP")
-        mlp_nn = NeuralNetwork(X_train_mlp, X_test_mlp, y_train_mlp, y_test_mlp, preprocessor)
-        mlp_nn.train_mlp()
+        with profiler.stage("train mlp"):
+            mlp_nn = NeuralNetwork(X_train_mlp, X_test_mlp, y_train_mlp, y_test_mlp, preprocessor, params=best_params('mlp'))
+            mlp_nn.train_mlp()
         print("03- Finished\n")
-        
+
         print("04- Training XGBoost")
-        xg_boost = Xgboost(X_train_xg, X_test_xg, y_train_xg, y_test_xg, le_processor)
-        xg_boost.build_xgboost()
+        with profiler.stage("train xgboost"):
+            xg_boost = Xgboost(X_train_xg, X_test_xg, y_train_xg, y_test_xg, le_processor, params=best_params('xgb'))
+            xg_boost.build_xgboost()
         print("04- Finished\n")
-        
+
+    evaluator = Evaluator(governor=governor)
+    if not args.model_version:
+        bundle = ModelBundle(reg_tree, mlp_nn, xg_boost, preprocessor, dataset_hash=file_fingerprint(training_path))
+
+    print("05- Evaluating models")
+    with profiler.stage("evaluation"):
+        reports = evaluator.evaluate(bundle, evaluation_datasets)
+    print_reports(reports)
+    print("05- Finished\n")
+
+    if not args.model_version:
+        bundle.metrics = metrics_summary(reports)
+        if args.publish:
+            print(f"Published models as {registry.publish(bundle)}")
+    return registry, bundle, evaluator, evaluation_datasets
+
+
+def start_orchestrator(args, governor, profiler):
+    from models.resource_governor import set_torch_threads
+    from models.llm_worker import LLMWorkerClient, load_factory
+
+    if args.in_process_llm:
+        with profiler.stage("llm load"):
+            orchestrator = load_factory(args.llm_factory)(args.llm_model, args.prompts)
+            set_torch_threads(governor.budget('llm'))
+        return orchestrator
+    # O LLM carrega no processo worker enquanto o resto segue aqui
+    orchestrator = LLMWorkerClient(
+        args.llm_model, args.prompts, factory=args.llm_factory, threads=governor.budget('llm')
+    ).start()
+    profiler.watch("llm load (worker)", orchestrator.wait_ready)
+    return orchestrator
+
+
+def run_ui(args, qt_args):
+    from PyQt6.QtWidgets import QApplication, QMessageBox
+    from app.profiling import Profiler
+    from models.resource_governor import ResourceGovernor
+
+    profiler = Profiler.from_args(args.profile).start()
+    app = QApplication(sys.argv[:1] + qt_args)
+
+    # Orçamentos de threads: o treino desta thread, o LLM e as predições interativas não disputam os mesmos núcleos
+    governor = ResourceGovernor().install('background')
+
+    with profiler.stage("record store"):
+        record_store, training_path = export_training_csv(args.out_of_core)
+    orchestrator = start_orchestrator(args, governor, profiler)
+
+    try:
+        registry, bundle, evaluator, evaluation_datasets = train_bundle(args, training_path, profiler, governor)
+
+        from data.drift_monitor import DriftMonitor
+        from app.integrated_ui import IntegratedMainWindow
+
+        # Baseline do drift: o mesmo CSV que alimentou o treino (só é recalculado se ele mudou)
+        with profiler.stage("drift baseline"):
+            drift_monitor = DriftMonitor.for_training(training_path)
+
         print("Initializing Integrated UI")
-        main_window = IntegratedMainWindow(reg_tree, mlp_nn, xg_boost, preprocessor, orchestrator)
-        main_window.show()
-        
-        sys.exit(app.exec())
-        
+        with profiler.stage("ui init"):
+            main_window = IntegratedMainWindow(
+                bundle.reg_tree, bundle.mlp_nn, bundle.xg_boost, bundle.preprocessor, orchestrator,
+                registry=registry, bundle=bundle,
+                evaluator=evaluator, evaluation_datasets=evaluation_datasets,
+                record_store=record_store, drift_monitor=drift_monitor, governor=governor,
+                profiler=profiler, training_path=training_path
+            )
+            main_window.show()
+
+        exit_code = app.exec()
+        # O perfil cobre a sessão inteira: as primeiras predições acontecem com a janela aberta
+        profiler.finish()
+        return exit_code
+
     except Exception as e:
+        profiler.finish()
         error_box = QMessageBox()
         error_box.setIcon(QMessageBox.Icon.Critical)
         error_box.setText("Error")
         error_box.setInformativeText(f"Training error.\n\nDetails: {e}")
         error_box.exec()
-        sys.exit(1)
\ No newline at end of file
+        return 1
+
+
+def cmd_train(args):
+    from app.profiling import Profiler
+    from models.resource_governor import ResourceGovernor
+
+    profiler = Profiler.from_args(args.profile).start()
+    governor = ResourceGovernor().install('background')
+    args.model_version = None
+    _, training_path = export_training_csv(args.out_of_core)
+    try:
+        train_bundle(args, training_path, profiler, governor)
+    finally:
+        profiler.finish()
+    return 0
+
+
+def cmd_evaluate(args):
+    from models.registry import ModelRegistry
+    from models.evaluation import Evaluator, print_reports
+
+    datasets = {}
+    for name, path in args.dataset or [('test', TEST_PATH)]:
+        datasets[name] = path
+    bundle = ModelRegistry(args.registry).load(args.model_version or 'current')
+    print(f"Evaluating {bundle.version} on {', '.join(datasets)}")
+    print_reports(Evaluator().evaluate(bundle, datasets))
+    return 0
+
+
+def cmd_score(args):
+    import pandas as pd
+    from data.validation import validate
+    from models.registry import ModelRegistry
+    from models.evaluation import MODEL_NAMES, predict_batch
+
+    bundle = ModelRegistry(args.registry).load(args.model_version or 'current')
+    rows = invalid = 0
+    header = True
+    # Em blocos, como o validate_csv: linhas inválidas saem com os erros e não travam o lote
+    for chunk in pd.read_csv(args.csv, dtype=str, chunksize=args.chunksize):
+        result = validate(chunk)
+        clean = result.clean()
+        scored = clean.copy()
+        for model_name in MODEL_NAMES:
+            scored[f"PRED_{model_name.upper()}"] = predict_batch(bundle, model_name, clean) if len(clean) else []
+        mode = 'w' if header else 'a'
+        scored.to_csv(args.out, index=False, header=header, mode=mode)
+        if args.invalid:
+            result.rejected().to_csv(args.invalid, index=False, header=header, mode=mode)
+        header = False
+        rows += len(chunk)
+        invalid += result.n_invalid
+    print(f"Scored {rows - invalid} of {rows} rows with {bundle.version} into {args.out} ({invalid} rejected)")
+    return 0
+
+
+def cmd_chat(args):
+    from app.profiling import Profiler
+    from models.resource_governor import ResourceGovernor
+
+    governor = ResourceGovernor()
+    orchestrator = start_orchestrator(args, governor, Profiler())
+    try:
+        if hasattr(orchestrator, 'wait_ready'):
+            print("Loading the chat model...")
+            orchestrator.wait_ready()
+        print("ESG Assistant. Type /reset to clear the conversation and /quit (or Ctrl-D) to leave.")
+        while True:
+            try:
+                question = input("\n> ").strip()
+            except EOFError:
+                break
+            if not question:
+                continue
+            if question == '/quit':
+                break
+            if question == '/reset':
+                orchestrator.reset_session()
+                continue
+            try:
+                for chunk in orchestrator.stream_response(question):
+                    print(chunk, end='', flush=True)
+                print()
+            except KeyboardInterrupt:
+                # Fechar o gerador cancela a geração no worker
+                print("\n[interrupted]")
+    finally:
+        if hasattr(orchestrator, 'close'):
+            orchestrator.close()
+    return 0
+
+
+def option_default(value, subcommand):
+    # Opções repetidas no subcomando não têm default próprio: senão o default do subparser
+    # sobrescreve o valor dado antes do subcomando (main.py --profile DIR train)
+    return argparse.SUPPRESS if subcommand else value
+
+
+def dataset_spec(spec):
+    # Divide no primeiro '=': o caminho do CSV pode conter '=', o nome não
+    name, sep, path = spec.partition('=')
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=CSV, got '{spec}'")
+    return name, path
+
+
+def add_model_options(parser):
+    parser.add_argument('--registry', default=argparse.SUPPRESS, help=f"model registry directory (default: {REGISTRY_PATH})")
+    parser.add_argument('--model-version', metavar='VERSION', default=argparse.SUPPRESS,
+                        help="registry version to use ('current' or vNNNN; default: current)")
+
+
+def add_training_options(parser, subcommand=False):
+    parser.add_argument('--out-of-core', metavar='CSV', default=option_default(None, subcommand),
+                        help="train by streaming this CSV in chunks instead of loading it in memory")
+    parser.add_argument('--chunksize', type=int, default=option_default(100_000, subcommand))
+    parser.add_argument('--publish', action='store_true', default=option_default(False, subcommand),
+                        help="publish the trained models to the registry and make them current")
+    parser.add_argument('--profile', metavar='DIR', default=option_default(None, subcommand),
+                        help="write stage timings, cProfile stats, collapsed stacks and allocations to DIR (or set ISE_PROFILE)")
+
+
+def add_llm_options(parser, subcommand=False):
+    parser.add_argument('--in-process-llm', action='store_true', default=option_default(False, subcommand),
+                        help="run the chat model in this process instead of a worker process")
+    parser.add_argument('--llm-model', default=option_default(MODEL_PATH, subcommand), help="chat model directory")
+    parser.add_argument('--prompts', default=option_default(PROMPTS_PATH, subcommand), help="prompt templates (YAML)")
+    parser.add_argument('--llm-factory', default=option_default(LLM_FACTORY, subcommand),
+                        help="orchestrator class as module:Class")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ESG Platform. Without a command, opens the integrated UI.")
+    add_training_options(parser)
+    add_llm_options(parser)
+    parser.add_argument('--registry', default=REGISTRY_PATH, help="model registry directory")
+    parser.add_argument('--model-version', metavar='VERSION',
+                        help="load this registry version ('current' or vNNNN) instead of training")
+
+    commands = parser.add_subparsers(dest='command', title='headless commands')
+
+    train = commands.add_parser('train', help="train, evaluate and optionally publish the models")
+    train.add_argument('--registry', default=argparse.SUPPRESS, help=f"model registry directory (default: {REGISTRY_PATH})")
+    add_training_options(train, subcommand=True)
+    train.set_defaults(handler=cmd_train)
+
+    evaluate = commands.add_parser('evaluate', help="evaluate a registry version on CSV datasets")
+    add_model_options(evaluate)
+    evaluate.add_argument('--dataset', action='append', type=dataset_spec, metavar='NAME=CSV',
+                          help=f"dataset to evaluate on; repeatable (default: test={TEST_PATH})")
+    evaluate.set_defaults(handler=cmd_evaluate)
+
+    score = commands.add_parser('score', help="validate a CSV and write the predictions of the three models")
+    score.add_argument('csv')
+    score.add_argument('--out', required=True, help="CSV with the valid rows and one PRED_<MODEL> column per model")
+    score.add_argument('--invalid', help="write the rejected rows, with an ERRORS column, to this CSV")
+    score.add_argument('--chunksize', type=int, default=500_000)
+    add_model_options(score)
+    score.set_defaults(handler=cmd_score)
+
+    chat = commands.add_parser('chat', help="chat with the ESG assistant in the terminal")
+    add_llm_options(chat, subcommand=True)
+    chat.set_defaults(handler=cmd_chat)
+    return parser
+
+
+def main(argv=None):
+    args, extra = build_parser().parse_known_args(argv)
+    if args.command is None:
+        # Argumentos desconhecidos vão para o Qt (ex.: -platform offscreen)
+        return run_ui(args, extra)
+    if extra:
+        build_parser().error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,43 +1,105 @@
+import time
+import numpy as np
 from sklearn.neural_network import MLPRegressor
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.metrics import mean_squared_error
+from models.mlp_inference import FoldedMLP
+from data.data_treatment import validation_split
+
+
+DEFAULT_PARAMS = {
+    'hidden_layer_sizes': (250, 250),
+    'activation': 'relu',
+    'solver': 'adam',
+    'random_state': 42
+}
 
 
 class NeuralNetwork():
-    def __init__(self, X_train, X_test, y_train, y_test, preprocessor):
+    def __init__(self, X_train, X_test, y_train, y_test, preprocessor,
+                 max_iter=1000, patience=20, tol=1e-6, time_budget=None, params=None, X_val=None, y_val=None):
         self.X_train = X_train
         self.X_test = X_test
         self.y_train = y_train
         self.y_test = y_test
+        # Validação da parada antecipada; sem ela, sai do próprio treino (o teste fica só para a avaliação)
+        self.X_val = X_val
+        self.y_val = y_val
         self.mlp = None
         self.preprocessor = preprocessor
+        self.inference = None
+
+        # Orçamentos de treino: épocas, paciência sem melhora na validação e segundos
+        self.max_iter = max_iter
+        self.patience = patience
+        self.tol = tol
+        self.time_budget = time_budget
+        self.best_epoch = None
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+
+    def train_mlp(self, epoch_batches=None):
+        """epoch_batches: função que devolve um iterador de (X, y) por época, para treino out-of-core."""
+        self.mlp = MLPRegressor(**self.params)
+        X_fit, y_fit, X_val, y_val = self.X_train, self.y_train, self.X_val, self.y_val
+        if X_val is None:
+            X_fit, X_val, y_fit, y_val = validation_split(self.X_train, self.y_train)
+
+        start = time.perf_counter()
+        best_loss = np.inf
+        best_state = None
+        self.best_epoch = 0
+        stop_reason = 'max_iter'
 
-    def train_mlp(self):
-        self.mlp = MLPRegressor(
-            hidden_layer_sizes=(250, 250), 
-            activation='relu',
-            solver='adam',
-            max_iter=1000,
-            random_state=42
-        )
+        for epoch in range(1, self.max_iter + 1):
+            if epoch_batches is None:
+                self.mlp.partial_fit(X_fit, y_fit)
+            else:
+                for X_batch, y_batch in epoch_batches():
+                    self.mlp.partial_fit(X_batch, y_batch)
+            val_loss = mean_squared_error(y_val, self.mlp.predict(X_val))
 
-        self.mlp.fit(self.X_train, self.y_train)
+            if not np.isfinite(val_loss):
+                stop_reason = 'diverged'
+                break
+            if val_loss < best_loss - self.tol:
+                best_loss = val_loss
+                self.best_epoch = epoch
+                best_state = (
+                    [w.copy() for w in self.mlp.coefs_],
+                    [b.copy() for b in self.mlp.intercepts_]
+                )
+            elif epoch - self.best_epoch >= self.patience:
+                stop_reason = 'plateau'
+                break
 
-        y_pred = self.mlp.predict(self.X_test)
+            if self.time_budget is not None and time.perf_counter() - start > self.time_budget:
+                stop_reason = 'time budget'
+                break
+
+        # Sem nenhuma época finita (divergiu logo na primeira) ficam os últimos pesos
+        if best_state is not None:
+            self.mlp.coefs_, self.mlp.intercepts_ = best_state
+
+        print(f"  Stopped at epoch {epoch} ({stop_reason}), best epoch {self.best_epoch}, "
+              f"val MSE {best_loss:.6f}, {time.perf_counter() - start:.1f}s")
 
-        mse = mean_squared_error(self.y_test, y_pred)
-        mae = mean_absolute_error(self.y_test, y_pred)
-        r2 = r2_score(self.y_test, y_pred)
-        
         print("Multi-layer Perceptron Model trained")
-        print(f'  MAE: {mae}')
-        print(f'  MSE: {mse}')
-        print(f'  R²: {r2}')
+
+        self.export_inference()
+
+    def export_inference(self, path=None):
+        self.inference = FoldedMLP.from_sklearn(self.mlp, self.preprocessor)
+        if path is not None:
+            self.inference.save(path)
+        return self.inference
     
-    def predict_mlp(self, user_input_df, preprocessor):
-        final_df = user_input_df.drop(columns=['ID', 'EMPRESA'])
-        
-        fit_final_df = preprocessor.transform(final_df)
-        
-        final_pred = self.mlp.predict(fit_final_df)
-        print(f'Predição da Rede Neural para a entrada atual: {final_pred}')
+    def predict_mlp(self, user_input_df, preprocessor, verbose=True):
+        if self.inference is not None and preprocessor is self.preprocessor:
+            final_pred = self.inference.predict(user_input_df)
+        else:
+            final_df = user_input_df.drop(columns=['ID', 'EMPRESA'], errors='ignore')
+            fit_final_df = preprocessor.transform(final_df)
+            final_pred = self.mlp.predict(fit_final_df)
+
+        if verbose:
+            print(f'Predição da Rede Neural para a entrada atual: {final_pred}')
         return final_pred
\ No newline at end of file
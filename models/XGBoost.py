@@ -1,52 +1,117 @@
+import time
 import xgboost as xgb
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from data.data_treatment import validation_split
 
 """
     Extreme Gradient Boosting model
 """
 
+class TimeBudget(xgb.callback.TrainingCallback):
+    """Interrompe o boosting quando o tempo de parede estoura o orçamento."""
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+        self.start = None
+        self.exhausted = False
+
+    def before_training(self, model):
+        self.start = time.perf_counter()
+        return model
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.exhausted = time.perf_counter() - self.start > self.seconds
+        return self.exhausted
+
+
+DEFAULT_PARAMS = {
+    'objective': 'reg:squarederror',
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'random_state': 42
+}
+
 class Xgboost:
-    def __init__(self, X_train, X_test, y_train, y_test, le):
+    def __init__(self, X_train, X_test, y_train, y_test, le,
+                 num_boost_round=1000, early_stopping_rounds=20, time_budget=None, params=None, X_val=None, y_val=None):
         self.X_train = X_train
         self.X_test = X_test
         self.y_train = y_train
         self.y_test = y_test
+        # Validação da parada antecipada; sem ela, sai do próprio treino (o teste fica só para a avaliação)
+        self.X_val = X_val
+        self.y_val = y_val
         self.le = le
         self.model = None
 
-    def build_xgboost(self):
-        dtrain = xgb.DMatrix(self.X_train, label=self.y_train)
-        dtest = xgb.DMatrix(self.X_test, label=self.y_test)
+        # Orçamentos de treino: rounds máximos, paciência na validação e segundos
+        self.num_boost_round = num_boost_round
+        self.early_stopping_rounds = early_stopping_rounds
+        self.time_budget = time_budget
+        self.best_iteration = None
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+
+    def build_xgboost(self, dtrain=None):
+        """dtrain: DMatrix já construída (ex.: external memory, exige X_val); senão é montada a partir de X_train."""
+        X_val, y_val = self.X_val, self.y_val
+        if dtrain is None:
+            X_fit, y_fit = self.X_train, self.y_train
+            if X_val is None:
+                X_fit, X_val, y_fit, y_val = validation_split(X_fit, y_fit)
+            dtrain = xgb.DMatrix(X_fit, label=y_fit)
+        dval = xgb.DMatrix(X_val, label=y_val)
+
+        # EarlyStopping vem primeiro para registrar o melhor round mesmo quando o orçamento de tempo para o treino
+        callbacks = []
+        if self.early_stopping_rounds is not None:
+            callbacks.append(xgb.callback.EarlyStopping(rounds=self.early_stopping_rounds))
+        budget = None
+        if self.time_budget is not None:
+            budget = TimeBudget(self.time_budget)
+            callbacks.append(budget)
+
+        start = time.perf_counter()
+        self.model = xgb.train(
+            self.params,
+            dtrain,
+            num_boost_round=self.num_boost_round,
+            evals=[(dval, 'validation')],
+            callbacks=callbacks,
+            verbose_eval=False
+        )
+        rounds_run = self.model.num_boosted_rounds()
+
+        if self.early_stopping_rounds is not None:
+            self.best_iteration = self.model.best_iteration
+            best_score = self.model.best_score
+        else:
+            self.best_iteration = rounds_run - 1
+            best_score = None
 
-        params = {
-            'objective': 'reg:squarederror', 
-            'max_depth': 6,                   
-            'learning_rate': 0.1,                         
-            'random_state': 42                
-        }
+        if budget is not None and budget.exhausted:
+            stop_reason = 'time budget'
+        elif rounds_run < self.num_boost_round:
+            stop_reason = 'plateau'
+        else:
+            stop_reason = 'num_boost_round'
 
-        num_round = 100
-        self.model = xgb.train(params, dtrain, num_round)
+        # Mantém só as árvores até o melhor round para a predição não usar as excedentes
+        self.model = self.model[: self.best_iteration + 1]
 
-        y_pred = self.model.predict(dtest)
+        print(f"  Stopped at round {rounds_run} ({stop_reason}), best round {self.best_iteration + 1}, "
+              f"val RMSE {best_score}, {time.perf_counter() - start:.1f}s")
 
-        mse = mean_squared_error(self.y_test, y_pred)
-        r2 = r2_score(self.y_test, y_pred)
-        mae = mean_absolute_error(self.y_test, y_pred)
-        
         print("XGBoost trained")
-        print(f'  MAE: {mae}')
-        print(f'  MSE: {mse}')
-        print(f'  R²: {r2}')
 
         return self.model
     
-    def predict_xgboost(self, user_input):
-        final_df = user_input.drop(columns=['ID', 'EMPRESA', 'INDICE_SUSTENTABILIDADE'])
+    def predict_xgboost(self, user_input, verbose=True):
+        final_df = user_input.drop(columns=['ID', 'EMPRESA', 'INDICE_SUSTENTABILIDADE'], errors='ignore')
         final_df['SETOR'] = self.le.transform(final_df['SETOR'])
 
         duser = xgb.DMatrix(final_df) 
         xgboost_pred = self.model.predict(duser)
 
-        print(f'Predição do Extreme Gradient Boosting para a entrada atual: {xgboost_pred}')
+        if verbose:
+            print(f'Predição do Extreme Gradient Boosting para a entrada atual: {xgboost_pred}')
         return xgboost_pred
\ No newline at end of file
@@ -0,0 +1,133 @@
+import time
+import weakref
+import numpy as np
+import xgboost as xgb
+from collections import OrderedDict
+from data.schema import FEATURE_COLUMNS, SECTOR_COLUMN
+from models.mlp_inference import FoldedMLP
+from models.evaluation import bundle_key
+
+"""
+    Contribuição de cada feature para uma predição
+    - XGBoost: TreeSHAP nativo (pred_contribs)
+    - Árvore de regressão: atribuição pelo caminho (Saabas): cada nó do caminho
+      credita à feature do split a variação do valor médio entre pai e filho
+    - MLP: Shapley amostrado por permutações sobre um conjunto de referência,
+      com todas as permutações avaliadas num único forward do MLP dobrado
+    Em todos os casos base + soma das contribuições = predição (na MLP, em média).
+    Os resultados ficam num cache LRU por versão do modelo + vetor de entrada.
+"""
+
+MLP_PERMUTATIONS = 128
+
+
+def _ranked(features, values, base, prediction):
+    order = np.argsort(-np.abs(values), kind='stable')
+    return {
+        'base': float(base),
+        'prediction': float(prediction),
+        'contributions': [(features[i], float(values[i])) for i in order]
+    }
+
+
+def xgboost_attributions(xg_boost, row):
+    final_df = row.drop(columns=['ID', 'EMPRESA', 'INDICE_SUSTENTABILIDADE'], errors='ignore')
+    final_df = final_df.assign(**{SECTOR_COLUMN: xg_boost.le.transform(final_df[SECTOR_COLUMN])})
+    contribs = xg_boost.model.predict(xgb.DMatrix(final_df), pred_contribs=True)[0]
+    # A última coluna é o bias (valor esperado do modelo)
+    return _ranked(list(final_df.columns), contribs[:-1], contribs[-1], contribs.sum())
+
+
+def tree_attributions(reg_tree, row):
+    X = row[FEATURE_COLUMNS].assign(**{SECTOR_COLUMN: reg_tree.label_encoder.transform(row[SECTOR_COLUMN])})
+    X = X[reg_tree.training_columns]
+    tree = reg_tree.tree_model.tree_
+    node_values = tree.value[:, 0, 0]
+
+    nodes = reg_tree.tree_model.decision_path(X).indices
+    contribs = np.zeros(len(reg_tree.training_columns))
+    np.add.at(contribs, tree.feature[nodes[:-1]], np.diff(node_values[nodes]))
+    return _ranked(reg_tree.training_columns, contribs, node_values[0], node_values[nodes[-1]])
+
+
+class MLPShapley:
+    """Shapley amostrado: cada permutação vai de uma linha de referência até a entrada, trocando uma feature por vez."""
+
+    def __init__(self, engine, background, n_permutations=MLP_PERMUTATIONS, seed=42):
+        self.engine = engine
+        self.features = [SECTOR_COLUMN] + engine.numeric_features
+        self.n_permutations = n_permutations
+        self.seed = seed
+        self.bg_num, self.bg_setor = engine.encode(background)
+
+    def explain(self, row):
+        x_num, x_setor = self.engine.encode(row)
+        n_num = len(self.engine.numeric_features)
+        d = n_num + 1
+        M = self.n_permutations
+
+        # Semente fixa: a mesma entrada sempre recebe a mesma atribuição
+        rng = np.random.default_rng(self.seed)
+        pick = rng.integers(0, len(self.bg_num), M)
+        perms = np.argsort(rng.random((M, d)), axis=1)
+
+        # switched[m, k, j]: a feature j já é a da entrada no passo k da permutação m
+        rank = np.argsort(perms, axis=1)
+        switched = rank[:, None, :] < np.arange(d + 1)[None, :, None]
+
+        # A feature 0 é 'SETOR' (índice de categoria), as demais são as numéricas
+        Z_num = np.where(switched[:, :, 1:], x_num[0], self.bg_num[pick][:, None, :])
+        Z_setor = np.where(switched[:, :, 0], x_setor[0], self.bg_setor[pick][:, None])
+
+        f = self.engine.forward(
+            np.ascontiguousarray(Z_num.reshape(-1, n_num)), Z_setor.reshape(-1)
+        ).reshape(M, d + 1)
+
+        # O passo k troca a feature perms[m, k]; o ganho do passo vai para ela
+        deltas = np.diff(f, axis=1)
+        contribs = np.zeros(d)
+        np.add.at(contribs, perms.ravel(), deltas.ravel())
+        contribs /= M
+        return _ranked(self.features, contribs, f[:, 0].mean(), f[0, -1])
+
+
+class AttributionExplainer:
+    def __init__(self, background, cache_size=256, n_permutations=MLP_PERMUTATIONS):
+        """background: amostra do dataset (layout do CSV) usada como referência da MLP."""
+        self.background = background
+        self.cache_size = cache_size
+        self.n_permutations = n_permutations
+        self._cache = OrderedDict()
+        self._mlp = {}
+        # bundle_key serializa os modelos (~15 ms); calculado uma vez por bundle vivo
+        self._keys = weakref.WeakKeyDictionary()
+
+    def _mlp_explainer(self, bundle, model_key):
+        if model_key not in self._mlp:
+            engine = bundle.mlp_nn.inference or FoldedMLP.from_sklearn(bundle.mlp_nn.mlp, bundle.preprocessor)
+            self._mlp[model_key] = MLPShapley(engine, self.background, self.n_permutations)
+        return self._mlp[model_key]
+
+    def explain(self, bundle, row):
+        """Devolve {modelo: {'base', 'prediction', 'contributions': [(feature, valor)] ordenadas por |valor|}}."""
+        model_key = self._keys.get(bundle)
+        if model_key is None:
+            model_key = self._keys[bundle] = bundle_key(bundle)
+        key = (model_key, tuple(row[FEATURE_COLUMNS].iloc[0].tolist()))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        start = time.perf_counter()
+        row = row.iloc[:1]
+        result = {
+            'tree': tree_attributions(bundle.reg_tree, row),
+            'mlp': self._mlp_explainer(bundle, model_key).explain(row),
+            'xgboost': xgboost_attributions(bundle.xg_boost, row),
+            'seconds': time.perf_counter() - start
+        }
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
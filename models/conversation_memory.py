@@ -0,0 +1,118 @@
+from collections import deque
+
+"""
+    Memória de conversa com orçamento de tokens
+    As últimas trocas ficam literais; quando o histórico passa do orçamento, as
+    mais antigas são condensadas num resumo acumulado. Cada troca é tokenizada
+    uma única vez ao entrar na memória, e o resumo só quando muda, então o custo
+    por turno não cresce com o tamanho da conversa.
+"""
+
+DEFAULT_BUDGET = 768
+DEFAULT_SUMMARY_BUDGET = 192
+MIN_RECENT_TURNS = 1
+
+
+def format_turn(question, answer):
+    return f"User: {question}\nAssistant: {answer}\n"
+
+
+def truncate_to_budget(text, count_tokens, budget):
+    """Resumo sem LLM: mantém o final do texto (o mais recente) dentro do orçamento."""
+    words = text.split()
+    lo, hi = 0, len(words)
+    # Busca binária pelo maior sufixo que cabe, em O(log n) contagens
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if count_tokens(' '.join(words[mid:])) <= budget:
+            hi = mid
+        else:
+            lo = mid + 1
+    return ' '.join(words[lo:])
+
+
+class ConversationMemory:
+    def __init__(self, count_tokens, summarize=None, budget=DEFAULT_BUDGET,
+                 summary_budget=DEFAULT_SUMMARY_BUDGET, min_recent=MIN_RECENT_TURNS):
+        """
+            count_tokens(text) -> int, normalmente o tokenizer do modelo
+            summarize(summary, turns_text, budget) -> str, resumo novo; sem ele o texto é truncado
+        """
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.min_recent = min_recent
+
+        self.turns = deque()
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turn_tokens = 0
+
+    @property
+    def total_tokens(self):
+        return self.summary_tokens + self.turn_tokens
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add_turn(self, question, answer):
+        text = format_turn(question, answer)
+        tokens = self.count_tokens(text)
+        self.turns.append((text, tokens))
+        self.turn_tokens += tokens
+        self._fit()
+
+    def _fit(self):
+        if self.total_tokens <= self.budget:
+            return
+
+        # Esvazia até metade do espaço literal, para o resumo (uma chamada ao LLM) não rodar a cada turno
+        low_water = (self.budget - self.summary_budget) // 2
+        evicted = []
+        while len(self.turns) > self.min_recent and self.turn_tokens > low_water:
+            text, tokens = self.turns.popleft()
+            self.turn_tokens -= tokens
+            evicted.append(text)
+        if evicted:
+            self._fold(''.join(evicted))
+        self._truncate_recent()
+
+    def _fold(self, evicted_text):
+        if self.summarize is not None:
+            summary = self.summarize(self.summary, evicted_text, self.summary_budget)
+        else:
+            summary = f"{self.summary} {evicted_text}".strip()
+        self.summary = summary
+        self.summary_tokens = self.count_tokens(summary)
+        if self.summary_tokens > self.summary_budget:
+            self.summary = truncate_to_budget(summary, self.count_tokens, self.summary_budget)
+            self.summary_tokens = self.count_tokens(self.summary)
+
+    def _truncate_recent(self):
+        # As min_recent trocas ficam mesmo se sozinhas passarem do orçamento; aí são cortadas
+        # (da mais antiga para a mais nova, mantendo o final de cada uma) até caber
+        for i in range(len(self.turns)):
+            if self.total_tokens <= self.budget:
+                return
+            text, tokens = self.turns[i]
+            room = max(self.budget - (self.total_tokens - tokens), 0)
+            text = truncate_to_budget(text, self.count_tokens, room)
+            new_tokens = self.count_tokens(text)
+            self.turns[i] = (text, new_tokens)
+            self.turn_tokens += new_tokens - tokens
+
+    def render(self):
+        """Bloco de histórico para o prompt; vazio numa conversa nova."""
+        parts = []
+        if self.summary:
+            parts.append(f"### Conversation Summary:\n{self.summary}\n")
+        if self.turns:
+            parts.append("### Recent Conversation:\n" + ''.join(text for text, _ in self.turns))
+        return '\n'.join(parts)
+
+    def clear(self):
+        self.turns.clear()
+        self.summary = ""
+        self.summary_tokens = 0
+        self.turn_tokens = 0
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from data.schema import TARGET_COLUMN, load_dataset, file_fingerprint
+from models.registry import TRAINING_DATA_ATTRS
+
+"""
+    Avaliação em lote dos três modelos
+    Cada (modelo, dataset) é pontuado numa única chamada de predição, em paralelo.
+    Os relatórios ficam em cache em disco por versão do modelo + hash do dataset,
+    então reabrir o app com os mesmos modelos e dados não recalcula nada.
+"""
+
+EVALUATION_CACHE_PATH = 'data/cache/evaluations'
+# Sobrepõe o diretório do cache (ex.: benchmarks que não devem escrever no cache real)
+EVALUATION_CACHE_ENV = 'ISE_EVALUATION_CACHE'
+
+MODEL_NAMES = ('tree', 'mlp', 'xgboost')
+
+
+def dataframe_fingerprint(df):
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update(','.join(map(str, df.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def bundle_key(bundle):
+    """Conteúdo dos modelos: hash do bundle.pkl do registro ou, para modelos recém-treinados,
+    dos modelos serializados. A versão sozinha não serve: registros diferentes (ou um
+    registro apagado e republicado) reutilizam 'v0001'; ela entra só para leitura."""
+    bundle_hash = getattr(bundle, 'bundle_hash', None)
+    if bundle_hash:
+        return f"{bundle.version}-{bundle_hash[:16]}"
+    digest = hashlib.sha256()
+    for model in (bundle.reg_tree, bundle.mlp_nn, bundle.xg_boost):
+        state = {k: v for k, v in vars(model).items() if k not in TRAINING_DATA_ATTRS}
+        digest.update(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+    return f"unregistered-{digest.hexdigest()[:16]}"
+
+
+def predict_batch(bundle, model_name, df):
+    if model_name == 'tree':
+        return bundle.reg_tree.predict_tree(df.copy(), verbose=False)
+    if model_name == 'mlp':
+        return bundle.mlp_nn.predict_mlp(df, bundle.preprocessor, verbose=False)
+    return bundle.xg_boost.predict_xgboost(df.copy(), verbose=False)
+
+
+def score(y_true, y_pred):
+    return {
+        'MAE': float(mean_absolute_error(y_true, y_pred)),
+        'MSE': float(mean_squared_error(y_true, y_pred)),
+        'R2': float(r2_score(y_true, y_pred)),
+        'rows': int(len(y_true))
+    }
+
+
+class Evaluator:
+    def __init__(self, cache_dir=None, max_workers=None, governor=None):
+        self.cache_dir = cache_dir or os.environ.get(EVALUATION_CACHE_ENV) or EVALUATION_CACHE_PATH
+        self.max_workers = max_workers
+        # Com um ResourceGovernor, os workers dividem o orçamento 'background' em vez de usar todos os núcleos cada
+        self.governor = governor
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _cache_path(self, model_key, dataset_hash):
+        return os.path.join(self.cache_dir, f"{model_key}-{dataset_hash[:16]}.json")
+
+    def _cached(self, model_key, dataset_hash):
+        key = (model_key, dataset_hash)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        path = self._cache_path(model_key, dataset_hash)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        with self._lock:
+            self._memory[key] = report
+        return report
+
+    def _store(self, model_key, dataset_hash, report):
+        with self._lock:
+            self._memory[(model_key, dataset_hash)] = report
+        path = self._cache_path(model_key, dataset_hash)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _resolve(self, dataset):
+        """dataset: caminho do CSV ou DataFrame no layout do CSV."""
+        if isinstance(dataset, str):
+            return file_fingerprint(dataset), lambda: load_dataset(dataset, keep_company=True)
+        return dataframe_fingerprint(dataset), lambda: dataset
+
+    def evaluate(self, bundle, datasets):
+        """datasets: {nome: caminho ou DataFrame}. Devolve {nome: relatório}."""
+        model_key = bundle_key(bundle)
+        reports = {}
+        pending = {}
+
+        for name, dataset in datasets.items():
+            dataset_hash, loader = self._resolve(dataset)
+            cached = self._cached(model_key, dataset_hash)
+            if cached is not None:
+                reports[name] = cached
+            else:
+                pending[name] = (dataset_hash, loader)
+
+        if pending:
+            frames = {name: loader() for name, (_, loader) in pending.items()}
+            tasks = [(name, model_name) for name in pending for model_name in MODEL_NAMES]
+
+            def run(task):
+                name, model_name = task
+                df = frames[name]
+                start = time.perf_counter()
+                y_pred = predict_batch(bundle, model_name, df)
+                result = score(df[TARGET_COLUMN], y_pred)
+                result['seconds'] = round(time.perf_counter() - start, 4)
+                return task, result
+
+            workers = self.max_workers or len(tasks)
+            budget = {}
+            if self.governor is not None:
+                budget = {'initializer': self.governor.enter_thread, 'initargs': ('background', workers)}
+            with ThreadPoolExecutor(max_workers=workers, **budget) as executor:
+                results = dict(executor.map(run, tasks))
+
+            for name, (dataset_hash, _) in pending.items():
+                report = {
+                    'model_version': bundle.version or 'unregistered',
+                    'model_key': model_key,
+                    'dataset': name,
+                    'dataset_hash': dataset_hash,
+                    'models': {model_name: results[(name, model_name)] for model_name in MODEL_NAMES}
+                }
+                self._store(model_key, dataset_hash, report)
+                reports[name] = report
+
+        return reports
+
+
+def metrics_summary(reports):
+    """Formato guardado no manifest do registro: {dataset: {modelo: métricas}}."""
+    return {name: report['models'] for name, report in reports.items()}
+
+
+def print_reports(reports):
+    for name, report in reports.items():
+        print(f"  {name} ({report['model_version']}, dataset {report['dataset_hash'][:12]})")
+        for model_name, m in report['models'].items():
+            print(f"    {model_name:<8} MAE {m['MAE']:.5f}  MSE {m['MSE']:.6f}  R² {m['R2']:.4f}  ({m['rows']} rows)")
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import torch
+import transformers
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+
+"""
+    Carga rápida do Gemma: modelo preparado em disco + warmup
+    'prepare' carrega o checkpoint uma vez, quantiza (int8, bitsandbytes) e grava o
+    resultado em safetensors ao lado do original ('<modelo>-prepared'). Nas execuções
+    seguintes os pesos já quantizados são lidos por mmap, sem cópia intermediária
+    nem quantização. Um manifesto guarda a impressão digital do checkpoint de
+    origem; se o original mudar, o preparado é ignorado até ser regerado.
+    Uso: python -m models.gemma_loader prepare [--model models/gemma-2b-FT] [--quantization int8|none]
+"""
+
+PREPARED_SUFFIX = '-prepared'
+MANIFEST = 'prepared.json'
+QUANTIZATIONS = ('int8', 'none')
+WARMUP_PROMPT = "### User Question:\nWhat is the ISE B3?\n\n### Assistant Response:\n"
+
+
+def source_fingerprint(model_path):
+    """Nome, tamanho e mtime dos arquivos do checkpoint; não lê os pesos."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(model_path)):
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def prepared_path(model_path):
+    return os.path.normpath(model_path) + PREPARED_SUFFIX
+
+
+def quantization_config(quantization):
+    if quantization == 'int8':
+        return BitsAndBytesConfig(load_in_8bit=True, llm_int8_threshold=6.0)
+    return None
+
+
+def load_original(model_path, quantization='int8'):
+    """Caminho antigo: pesos copiados para a memória e quantizados a cada carga."""
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        quantization_config=quantization_config(quantization),
+        device_map="auto"
+    )
+    return tokenizer, model
+
+
+def prepare(model_path, out_dir=None, quantization='int8'):
+    out_dir = out_dir or prepared_path(model_path)
+    tokenizer, model = load_original(model_path, quantization)
+    os.makedirs(out_dir, exist_ok=True)
+    # O quantization_config vai para o config.json: na carga os pesos int8 são usados como estão
+    model.save_pretrained(out_dir, safe_serialization=True, max_shard_size="2GB")
+    tokenizer.save_pretrained(out_dir)
+    manifest = {
+        'source': os.path.normpath(model_path),
+        'source_fingerprint': source_fingerprint(model_path),
+        'quantization': quantization,
+        'transformers': transformers.__version__
+    }
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Prepared model written to {out_dir}")
+    return out_dir
+
+
+def read_manifest(path):
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def find_prepared(model_path, quantization=None):
+    """Diretório preparado e válido para model_path (ou o próprio, se já for um), senão None.
+    Com quantization, um preparado com outra quantização não serve."""
+    manifest = read_manifest(model_path)
+    if manifest is not None:
+        if quantization is not None and manifest.get('quantization') != quantization:
+            raise ValueError(f"{model_path} was prepared with quantization '{manifest.get('quantization')}', "
+                             f"not '{quantization}'; load the original checkpoint instead")
+        return model_path
+
+    path = prepared_path(model_path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        return None
+    # Só o preparado foi publicado: sem o original não há como checar se está defasado
+    has_source = os.path.isdir(model_path)
+    if quantization is not None and manifest.get('quantization') != quantization:
+        if not has_source:
+            raise ValueError(f"{path} was prepared with quantization '{manifest.get('quantization')}', "
+                             f"not '{quantization}', and {model_path} is not available")
+        print(f"Prepared model in {path} uses quantization '{manifest.get('quantization')}'; loading {model_path} instead")
+        return None
+    if has_source and manifest.get('source_fingerprint') != source_fingerprint(model_path):
+        print(f"Prepared model in {path} is stale; loading {model_path} instead")
+        return None
+    return path
+
+
+def load_model(model_path, quantization=None, use_prepared=True):
+    """(tokenizer, model, prepared): usa o modelo preparado quando existe e está em dia.
+    quantization=None aceita o preparado como ele foi gerado; o original é carregado em int8."""
+    path = find_prepared(model_path, quantization) if use_prepared else None
+    if path is None:
+        tokenizer, model = load_original(model_path, quantization or 'int8')
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(path)
+        model = AutoModelForCausalLM.from_pretrained(
+            path,
+            device_map="auto",
+            low_cpu_mem_usage=True,
+            use_safetensors=True
+        )
+    model.eval()
+    return tokenizer, model, path is not None
+
+
+def warmup(model, tokenizer, max_new_tokens=4):
+    """Geração curta descartada: kernels, cache de KV e alocador ficam prontos antes da 1a pergunta."""
+    inputs = tokenizer(WARMUP_PROMPT, return_tensors="pt").to(model.device)
+    with torch.inference_mode():
+        model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepared Gemma weights for fast cold start")
+    sub = parser.add_subparsers(dest='command', required=True)
+    prepare_cmd = sub.add_parser('prepare')
+    prepare_cmd.add_argument('--model', default='models/gemma-2b-FT')
+    prepare_cmd.add_argument('--out')
+    prepare_cmd.add_argument('--quantization', choices=QUANTIZATIONS, default='int8',
+                             help="'none' keeps the original dtype (CPU-only machines, tiny test models)")
+    args = parser.parse_args()
+
+    prepare(args.model, args.out, args.quantization)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,36 @@
 import yaml
 import torch
-from typing import Optional, List, Any 
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import threading
+from typing import Optional, List, Any, Iterator
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 from langchain_core.prompts import PromptTemplate
 from langchain_core.language_models.llms import LLM
-from transformers import BitsAndBytesConfig
+from models.conversation_memory import ConversationMemory, DEFAULT_BUDGET
+from models.gemma_loader import load_model, warmup
+
+class EventStoppingCriteria(StoppingCriteria):
+    """Interrompe o generate quando o evento é sinalizado (cancelamento vindo da UI)."""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
 
 class GemmaLLM(LLM):
     model_path: str
     model: Optional[Any] = None
     tokenizer: Optional[Any] = None
-    bnb_config: Optional[Any] = None
     temperature: float = 0.2
     max_new_tokens: int = 500
+    warmup_on_load: bool = True
 
     def __init__(self, model_path: str, **kwargs):
         super().__init__(model_path=model_path, **kwargs)
-        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
-        self.bnb_config = BitsAndBytesConfig(
-                load_in_8bit=True,
-                llm_int8_threshold=6.0
-            )
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            quantization_config=self.bnb_config,
-            device_map="auto"
-        )
+        # Usa '<model_path>-prepared' (int8 em safetensors, lido por mmap) quando existe
+        self.tokenizer, self.model, _ = load_model(model_path)
+        if self.warmup_on_load:
+            warmup(self.model, self.tokenizer)
 
     @property
     def _llm_type(self) -> str:
@@ -56,11 +61,48 @@ class GemmaLLM(LLM):
 
         return response.strip()
 
-class ISEOrchestrator:
+    def stream_text(self, prompt: str, stop_event: Optional[threading.Event] = None, **kwargs) -> Iterator[str]:
+        """Gera numa thread auxiliar e devolve o texto em pedaços conforme os tokens saem."""
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.model.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
 
-    def __init__(self, model_path: str, prompts_path: str):
-        self.llm = GemmaLLM(model_path=model_path)
+        current_max_tokens = kwargs.get('max_new_tokens', self.max_new_tokens)
+        current_temp = kwargs.get('temperature', self.temperature)
+        current_do_sample = kwargs.get('do_sample', current_temp > 0.0)
+        stopping = StoppingCriteriaList([EventStoppingCriteria(stop_event)]) if stop_event is not None else None
+
+        thread = threading.Thread(
+            target=self.model.generate,
+            kwargs=dict(
+                **inputs,
+                max_new_tokens=current_max_tokens,
+                temperature=current_temp,
+                do_sample=current_do_sample,
+                pad_token_id=self.tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=stopping,
+            ),
+            daemon=True
+        )
+        thread.start()
+        for text in streamer:
+            if text:
+                yield text
+        thread.join()
+
+class ISEOrchestrator:
+    # Parâmetros da chamada do guard; o gemma_ft.guard_eval lê daqui para medir o mesmo guard
+    GUARD_INVOCATION = {"max_new_tokens": 5, "temperature": 0.0}
+
+    def __init__(self, model_path: str, prompts_path: str, history_budget: int = DEFAULT_BUDGET,
+                 max_new_tokens: Optional[int] = None):
+        # max_new_tokens: teto das respostas (None mantém o padrão do GemmaLLM)
+        llm_kwargs = {} if max_new_tokens is None else {"max_new_tokens": max_new_tokens}
+        self.llm = GemmaLLM(model_path=model_path, **llm_kwargs)
         self.prompts = self._load_prompts(prompts_path)
+        self.history_budget = history_budget
+        # Uma memória por sessão de chat; o prompt só recebe o histórico já dentro do orçamento
+        self.sessions = {}
 
         guard_template_str = self.prompts["guard_prompt"] + "\n\nQuestion: {question}\nAnswer:"
         self.guard_prompt_template = PromptTemplate(
@@ -69,9 +111,10 @@ class ISEOrchestrator:
         )
 
         self.main_prompt_template = PromptTemplate(
-            input_variables=["question"],
+            input_variables=["question", "history"],
             template=(
                 "{system_prompt}\n\n" 
+                "{history}"
                 "### User Question:\n"
                 "{question}\n\n"
                 "### Assistant Response:\n"
@@ -79,27 +122,76 @@ class ISEOrchestrator:
             partial_variables={"system_prompt": self.prompts["system_prompt"]}
         )
 
+        self.summary_prompt_template = PromptTemplate(
+            input_variables=["summary", "turns"],
+            template=(
+                "{summary_prompt}\n\n"
+                "### Current Summary:\n{summary}\n\n"
+                "### New Turns:\n{turns}\n"
+                "### Updated Summary:\n"
+            ),
+            partial_variables={"summary_prompt": self.prompts["summary_prompt"]}
+        )
+
     def _load_prompts(self, path: str):
         with open(path, "r", encoding="utf-8") as f:
             return yaml.safe_load(f)
 
-    def get_response(self, question: str) -> str:
-        guard_chain = self.guard_prompt_template | self.llm
-
-        guard_output = guard_chain.invoke(
-            {"question": question},
-            config={
-                "max_new_tokens": 5,
-                "temperature": 0.0
-            }
-        ).strip().upper()
-        if "BLOCKED" in guard_output:
+    def _count_tokens(self, text: str) -> int:
+        return len(self.llm.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def _summarize(self, summary: str, turns: str, budget: int) -> str:
+        # Os limites vão como kwargs do invoke, que chegam ao _call; no config= o LangChain os ignora
+        prompt = self.summary_prompt_template.format(summary=summary or "(empty)", turns=turns)
+        return self.llm.invoke(prompt, max_new_tokens=budget, temperature=0.0)
+
+    def session(self, session_id: str = "default") -> ConversationMemory:
+        if session_id not in self.sessions:
+            self.sessions[session_id] = ConversationMemory(
+                self._count_tokens, self._summarize, budget=self.history_budget
+            )
+        return self.sessions[session_id]
+
+    def reset_session(self, session_id: str = "default"):
+        self.sessions.pop(session_id, None)
+
+    def _is_blocked(self, question: str) -> bool:
+        # Como no _summarize: kwargs do invoke, não config=, senão a geração usa os 500 tokens padrão
+        prompt = self.guard_prompt_template.format(question=question)
+        guard_output = self.llm.invoke(prompt, **self.GUARD_INVOCATION).strip().upper()
+        return "BLOCKED" in guard_output
+
+    def get_response(self, question: str, session_id: str = "default") -> str:
+        if self._is_blocked(question):
             return self.prompts["rejection_message"]
 
+        memory = self.session(session_id)
+        history = memory.render()
         main_chain = self.main_prompt_template | self.llm
   
         response = main_chain.invoke(
-            {"question": question}
+            {"question": question, "history": f"{history}\n" if history else ""}
         )
-        
+
+        memory.add_turn(question, response)
         return response
+
+    def stream_response(self, question: str, session_id: str = "default",
+                        stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Como get_response, mas devolve a resposta em pedaços; com stop_event sinalizado, para no meio."""
+        if self._is_blocked(question):
+            yield self.prompts["rejection_message"]
+            return
+
+        memory = self.session(session_id)
+        history = memory.render()
+        prompt = self.main_prompt_template.format(question=question, history=f"{history}\n" if history else "")
+
+        chunks = []
+        for chunk in self.llm.stream_text(prompt, stop_event=stop_event):
+            chunks.append(chunk)
+            yield chunk
+
+        # Resposta interrompida não entra no histórico
+        if stop_event is None or not stop_event.is_set():
+            memory.add_turn(question, ''.join(chunks).strip())
@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import warnings
+import numpy as np
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.metrics import mean_squared_error
+from threadpoolctl import threadpool_limits
+from data.data_treatment import make_mlp_preprocessor
+from data.schema import load_dataset
+from models.evaluation import dataframe_fingerprint
+
+"""
+    Busca de hiperparâmetros com successive halving / Hyperband
+    Cada configuração é avaliada em K folds; os folds pré-processados e as DMatrix
+    ficam em cache dentro de cada processo worker e são reutilizados por todos os trials.
+    O leaderboard é um JSONL gravado a cada trial, então uma busca interrompida
+    retoma pulando os pares (configuração, recurso) já avaliados. A primeira linha é
+    um cabeçalho com o dataset, os folds e a semente; notas calculadas com outros
+    valores não são reaproveitadas (a busca recusa, ou recomeça com --restart).
+"""
+
+LEADERBOARD_PATH = 'data/search/leaderboard.jsonl'
+# Muda quando a montagem dos folds muda (2: linhas de treino embaralhadas antes dos rungs da árvore)
+FOLDS_VERSION = 2
+TARGET = 'INDICE_SUSTENTABILIDADE'
+
+# Recurso máximo de cada modelo: fração das linhas para a árvore, épocas para a MLP e rounds para o XGBoost
+MAX_RESOURCE = {
+    'tree': 1.0,
+    'mlp': 300,
+    'xgb': 1000
+}
+
+
+def _log_uniform(rng, low, high):
+    return float(f"{math.exp(rng.uniform(math.log(low), math.log(high))):.4g}")
+
+
+SEARCH_SPACES = {
+    'tree': lambda rng: {
+        'max_depth': rng.choice([None, 4, 6, 8, 10, 14, 20]),
+        'min_samples_leaf': rng.choice([1, 2, 4, 8, 16]),
+        'min_samples_split': rng.choice([2, 5, 10]),
+        'max_features': rng.choice([None, 'sqrt', 0.5, 0.8])
+    },
+    'mlp': lambda rng: {
+        'hidden_layer_sizes': rng.choice([[64], [128], [64, 64], [128, 128], [250, 250], [256, 128]]),
+        'alpha': _log_uniform(rng, 1e-6, 1e-2),
+        'learning_rate_init': _log_uniform(rng, 1e-4, 1e-2),
+        'batch_size': rng.choice([32, 64, 128, 200])
+    },
+    'xgb': lambda rng: {
+        'max_depth': rng.randint(3, 10),
+        'learning_rate': _log_uniform(rng, 0.01, 0.3),
+        'subsample': round(rng.uniform(0.5, 1.0), 2),
+        'colsample_bytree': round(rng.uniform(0.5, 1.0), 2),
+        'min_child_weight': _log_uniform(rng, 1, 20),
+        'reg_lambda': _log_uniform(rng, 0.1, 10)
+    }
+}
+
+
+def config_id(model_name, params):
+    payload = json.dumps([model_name, params], sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def sample_configs(model_name, n, seed=42):
+    rng = random.Random(f"{model_name}-{seed}")
+    configs = []
+    seen = set()
+    while len(configs) < n:
+        params = SEARCH_SPACES[model_name](rng)
+        cid = config_id(model_name, params)
+        if cid not in seen:
+            seen.add(cid)
+            configs.append(params)
+    return configs
+
+
+def to_model_params(model_name, params):
+    """Converte a configuração serializada em JSON para os parâmetros dos modelos."""
+    params = dict(params)
+    if model_name == 'mlp' and 'hidden_layer_sizes' in params:
+        params['hidden_layer_sizes'] = tuple(params['hidden_layer_sizes'])
+    return params
+
+
+# ============================================================================
+# WORKER (cache de folds por processo)
+# ============================================================================
+
+_WORKER_DF = None
+_WORKER_N_FOLDS = None
+_WORKER_SEED = None
+_FOLD_CACHE = {}
+
+
+def _init_worker(df, n_folds, seed):
+    global _WORKER_DF, _WORKER_N_FOLDS, _WORKER_SEED
+    _WORKER_DF = df
+    _WORKER_N_FOLDS = n_folds
+    _WORKER_SEED = seed
+    _FOLD_CACHE.clear()
+    # Um trial por core: as bibliotecas de BLAS/OpenMP não devem abrir threads próprias
+    threadpool_limits(1)
+
+
+def _folds(model_name):
+    if model_name in _FOLD_CACHE:
+        return _FOLD_CACHE[model_name]
+
+    final_df = _WORKER_DF.drop(columns=['ID', 'EMPRESA'], errors='ignore')
+    X = final_df.drop(TARGET, axis=1)
+    y = final_df[TARGET].to_numpy()
+
+    if model_name in ('tree', 'xgb'):
+        X = X.copy()
+        X['SETOR'] = LabelEncoder().fit_transform(X['SETOR']).astype(int)
+
+    kfold = KFold(n_splits=_WORKER_N_FOLDS, shuffle=True, random_state=_WORKER_SEED)
+    rng = np.random.default_rng(_WORKER_SEED)
+    folds = []
+    for train_idx, val_idx in kfold.split(X):
+        # O KFold devolve os índices em ordem; embaralhados, os rungs baixos da árvore
+        # (X_train[:n_rows]) treinam numa amostra aleatória e não no começo do arquivo
+        train_idx = rng.permutation(train_idx)
+        X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+        y_train, y_val = y[train_idx], y[val_idx]
+
+        if model_name == 'tree':
+            folds.append((X_train.to_numpy(), X_val.to_numpy(), y_train, y_val))
+        elif model_name == 'mlp':
+            preprocessor = make_mlp_preprocessor(X_train)
+            folds.append((preprocessor.fit_transform(X_train), preprocessor.transform(X_val), y_train, y_val))
+        else:
+            folds.append((xgb.DMatrix(X_train, label=y_train), xgb.DMatrix(X_val, label=y_val), y_train, y_val))
+
+    _FOLD_CACHE[model_name] = folds
+    return folds
+
+
+def _score_fold(model_name, params, resource, fold):
+    X_train, X_val, y_train, y_val = fold
+    params = to_model_params(model_name, params)
+
+    if model_name == 'tree':
+        n_rows = max(2, int(len(y_train) * resource))
+        model = DecisionTreeRegressor(random_state=_WORKER_SEED, **params)
+        model.fit(X_train[:n_rows], y_train[:n_rows])
+        y_pred = model.predict(X_val)
+
+    elif model_name == 'mlp':
+        model = MLPRegressor(activation='relu', solver='adam', max_iter=int(resource),
+                             random_state=_WORKER_SEED, **params)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model.fit(X_train, y_train)
+        y_pred = model.predict(X_val)
+
+    else:
+        booster = xgb.train(
+            {'objective': 'reg:squarederror', 'random_state': _WORKER_SEED, 'nthread': 1, **params},
+            X_train,
+            num_boost_round=int(resource)
+        )
+        y_pred = booster.predict(X_val)
+
+    return mean_squared_error(y_val, y_pred)
+
+
+def _run_trial(model_name, params, resource):
+    start = time.perf_counter()
+    fold_scores = [_score_fold(model_name, params, resource, fold) for fold in _folds(model_name)]
+    return float(np.mean(fold_scores)), fold_scores, time.perf_counter() - start
+
+
+# ============================================================================
+# LEADERBOARD
+# ============================================================================
+
+class Leaderboard:
+    def __init__(self, path=LEADERBOARD_PATH, header=None, restart=False):
+        """header: dataset, folds e semente da busca; um leaderboard de outra busca só é aberto com restart."""
+        self.path = path
+        self.header = None
+        self.records = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Última linha truncada por uma interrupção no meio da escrita
+                        continue
+                    if 'header' in record:
+                        self.header = record['header']
+                    else:
+                        self.records[self._key(record)] = record
+
+        if header is not None:
+            if self.header is None and not self.records:
+                self._append({'header': header})
+                self.header = header
+            elif self.header != header:
+                raise ValueError(f"{path} holds scores from a different dataset, fold count or seed; "
+                                 f"use --restart or another --leaderboard")
+
+    @staticmethod
+    def _key(record):
+        return (record['model'], record['config_id'], float(record['resource']))
+
+    def get(self, model_name, cid, resource):
+        return self.records.get((model_name, cid, float(resource)))
+
+    def add(self, record):
+        self.records[self._key(record)] = record
+        self._append(record)
+
+    def _append(self, record):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def ranking(self, model_name, resource=None):
+        records = [r for r in self.records.values() if r['model'] == model_name]
+        if resource is not None:
+            records = [r for r in records if float(r['resource']) == float(resource)]
+        return sorted(records, key=lambda r: r['score'])
+
+
+def best_params(model_name, path=LEADERBOARD_PATH):
+    """Melhores parâmetros no recurso máximo do leaderboard, ou None se não houver busca."""
+    if not os.path.exists(path):
+        return None
+    ranking = Leaderboard(path).ranking(model_name, MAX_RESOURCE[model_name])
+    if not ranking:
+        return None
+    return to_model_params(model_name, ranking[0]['params'])
+
+
+# ============================================================================
+# SUCCESSIVE HALVING / HYPERBAND
+# ============================================================================
+
+class HyperparameterSearch:
+    def __init__(self, df, leaderboard_path=LEADERBOARD_PATH, n_folds=3, eta=3, n_jobs=None, seed=42, restart=False):
+        self.df = df
+        header = {'dataset': dataframe_fingerprint(df), 'n_folds': n_folds, 'seed': seed, 'folds_version': FOLDS_VERSION}
+        self.leaderboard = Leaderboard(leaderboard_path, header, restart)
+        self.n_folds = n_folds
+        self.eta = eta
+        self.n_jobs = n_jobs or os.cpu_count()
+        self.seed = seed
+        self.executor = None
+
+    def __enter__(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs,
+            initializer=_init_worker,
+            initargs=(self.df, self.n_folds, self.seed)
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self.executor.shutdown(cancel_futures=True)
+        self.executor = None
+
+    def _resource(self, model_name, fraction):
+        if model_name == 'tree':
+            return round(fraction, 6)
+        return max(1, int(round(MAX_RESOURCE[model_name] * fraction)))
+
+    def _evaluate_rung(self, model_name, configs, resource, rung):
+        results = {}
+        pending = {}
+
+        for params in configs:
+            cid = config_id(model_name, params)
+            cached = self.leaderboard.get(model_name, cid, resource)
+            if cached is not None:
+                results[cid] = cached
+            else:
+                future = self.executor.submit(_run_trial, model_name, params, resource)
+                pending[future] = (cid, params)
+
+        for future in as_completed(pending):
+            cid, params = pending[future]
+            score, fold_scores, seconds = future.result()
+            record = {
+                'model': model_name,
+                'config_id': cid,
+                'params': params,
+                'resource': resource,
+                'rung': rung,
+                'score': score,
+                'fold_scores': fold_scores,
+                'seconds': round(seconds, 3)
+            }
+            self.leaderboard.add(record)
+            results[cid] = record
+
+        print(f"  {model_name} rung {rung}: {len(configs)} configs at resource {resource} "
+              f"({len(configs) - len(pending)} resumed)")
+        return results
+
+    def successive_halving(self, model_name, configs, min_fraction=None):
+        if min_fraction is None:
+            n_rungs = 1
+            while self.eta ** n_rungs <= len(configs):
+                n_rungs += 1
+            min_fraction = self.eta ** -(n_rungs - 1)
+
+        survivors = list(configs)
+        rung = 0
+        while True:
+            fraction = min(min_fraction * self.eta ** rung, 1.0)
+            resource = self._resource(model_name, fraction)
+            results = self._evaluate_rung(model_name, survivors, resource, rung)
+            ranked = sorted(survivors, key=lambda p: results[config_id(model_name, p)]['score'])
+
+            if fraction >= 1.0 - 1e-9 or len(ranked) <= 1:
+                best = results[config_id(model_name, ranked[0])]
+                print(f"  {model_name} best: score {best['score']:.6f} params {best['params']}")
+                return best
+
+            survivors = ranked[:max(1, len(ranked) // self.eta)]
+            rung += 1
+
+    def hyperband(self, model_name):
+        s_max = 0
+        while self.eta ** (s_max + 1) <= self._max_configs(model_name):
+            s_max += 1
+        best = None
+        for s in range(s_max, -1, -1):
+            n = int(math.ceil((s_max + 1) / (s + 1) * self.eta ** s))
+            configs = sample_configs(model_name, n, seed=f"{self.seed}-bracket{s}")
+            candidate = self.successive_halving(model_name, configs, min_fraction=self.eta ** -s)
+            if best is None or candidate['score'] < best['score']:
+                best = candidate
+        return best
+
+    def _max_configs(self, model_name):
+        # Número de rungs que o recurso mínimo ainda suporta (árvore: ~1% das linhas, MLP/XGB: ~1 época/round)
+        return self.eta ** 4 if model_name == 'tree' else min(self.eta ** 4, MAX_RESOURCE[model_name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter search with successive halving / Hyperband")
+    parser.add_argument('--data', default='data/db/datasetEsgTRAIN.csv')
+    parser.add_argument('--models', nargs='+', default=['tree', 'mlp', 'xgb'], choices=list(SEARCH_SPACES))
+    parser.add_argument('--strategy', choices=['halving', 'hyperband'], default='halving')
+    parser.add_argument('--n-configs', type=int, default=27)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--folds', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--leaderboard', default=LEADERBOARD_PATH)
+    parser.add_argument('--restart', action='store_true', help="discard a leaderboard built with other data, folds or seed")
+    args = parser.parse_args()
+
+    df = load_dataset(args.data)
+    try:
+        search = HyperparameterSearch(df, args.leaderboard, args.folds, args.eta, args.jobs, args.seed, args.restart)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    with search:
+        for model_name in args.models:
+            print(f"Searching {model_name}")
+            if args.strategy == 'hyperband':
+                search.hyperband(model_name)
+            else:
+                configs = sample_configs(model_name, args.n_configs, seed=args.seed)
+                search.successive_halving(model_name, configs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+import os
+import time
+import queue
+import itertools
+import importlib
+import threading
+import traceback
+import multiprocessing as mp
+from collections import deque
+from models.resource_governor import thread_env, set_torch_threads
+
+"""
+    Orquestrador do Gemma num processo dedicado
+    O LLM deixa de disputar o GIL e a memória com a UI e os modelos sklearn/XGBoost,
+    e uma falha na geração derruba só o worker. A comunicação é um Pipe do
+    multiprocessing com mensagens pequenas (tuplas): cada pedaço de texto gerado
+    chega como ('token', id, texto) assim que sai do streamer.
+    Saúde: o worker manda um heartbeat por segundo numa thread própria; se o processo
+    morre ou o heartbeat para, o cliente encerra o worker, falha as requisições
+    pendentes e sobe outro (com backoff). O histórico das sessões vive no worker e
+    se perde num restart.
+    'threads' é o orçamento do LLM (ResourceGovernor): vai para o ambiente do worker
+    antes do import do torch e depois para torch.set_num_threads.
+"""
+
+DEFAULT_FACTORY = 'models.gemma_orchestrator:ISEOrchestrator'
+HEARTBEAT_INTERVAL = 1.0
+HEARTBEAT_TIMEOUT = 30.0
+START_TIMEOUT = 600.0
+RESTART_BACKOFF = (1.0, 2.0, 5.0, 10.0, 30.0)
+MAX_RESTARTS = 5
+
+
+class WorkerError(Exception):
+    pass
+
+
+def load_factory(path):
+    module, name = path.split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def serve(conn, factory_path, args, threads=None, kwargs=None):
+    """Laço do processo worker: uma pergunta por vez, pings e cancelamentos atendidos entre os tokens."""
+    if threads:
+        os.environ.update(thread_env(threads))
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            conn.send(message)
+
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            send('heartbeat')
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        orchestrator = load_factory(factory_path)(*args, **(kwargs or {}))
+        if threads:
+            set_torch_threads(threads)
+    except Exception:
+        send('fatal', traceback.format_exc())
+        stopped.set()
+        return
+    send('ready', os.getpid())
+
+    pending = deque()
+    while True:
+        try:
+            message = pending.popleft() if pending else conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = message[0]
+        if kind == 'shutdown':
+            break
+        elif kind == 'ping':
+            send('pong', message[1])
+        elif kind == 'reset':
+            orchestrator.reset_session(message[1])
+        elif kind == 'ask':
+            _, request_id, question, session_id = message
+            stop_event = threading.Event()
+            try:
+                for chunk in orchestrator.stream_response(question, session_id, stop_event=stop_event):
+                    send('token', request_id, chunk)
+                    while conn.poll():
+                        incoming = conn.recv()
+                        if incoming[0] == 'cancel' and incoming[1] == request_id:
+                            stop_event.set()
+                        elif incoming[0] == 'ping':
+                            send('pong', incoming[1])
+                        elif incoming[0] != 'cancel':
+                            if incoming[0] == 'shutdown':
+                                stop_event.set()
+                            pending.append(incoming)
+                send('done', request_id, stop_event.is_set())
+            except Exception as e:
+                traceback.print_exc()
+                send('error', request_id, f"{type(e).__name__}: {e}")
+    stopped.set()
+
+
+class LLMWorkerClient:
+    """Lado da UI: mesma interface do ISEOrchestrator (get_response, stream_response, reset_session)."""
+
+    def __init__(self, *args, factory=DEFAULT_FACTORY, heartbeat_timeout=HEARTBEAT_TIMEOUT,
+                 start_timeout=START_TIMEOUT, max_restarts=MAX_RESTARTS, threads=None, factory_kwargs=None):
+        self.args = args
+        self.factory = factory
+        # Repassados à factory no worker (ex.: max_new_tokens do ISEOrchestrator)
+        self.factory_kwargs = factory_kwargs
+        self.threads = threads
+        self.heartbeat_timeout = heartbeat_timeout
+        self.start_timeout = start_timeout
+        self.max_restarts = max_restarts
+
+        self.process = None
+        self.conn = None
+        self.generation = 0
+        self.restarts = 0
+        self.fatal = None
+        self.ready = threading.Event()
+        self.last_heartbeat = time.monotonic()
+
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._requests = {}
+        self._pongs = {}
+        self._ids = itertools.count(1)
+        self._closed = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        with self._lock:
+            self._spawn()
+        self._monitor = threading.Thread(target=self._watch, name='llm-worker-monitor', daemon=True)
+        self._monitor.start()
+        return self
+
+    def _spawn(self):
+        # spawn em todas as plataformas: fork de um processo com Qt e threads não é seguro
+        ctx = mp.get_context('spawn')
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=serve,
+                                   args=(child_conn, self.factory, self.args, self.threads, self.factory_kwargs),
+                                   name='llm-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.generation += 1
+        self.ready.clear()
+        self.last_heartbeat = time.monotonic()
+        threading.Thread(target=self._read, args=(parent_conn, self.generation),
+                         name='llm-worker-reader', daemon=True).start()
+
+    def _read(self, conn, generation):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = message[0]
+            self.last_heartbeat = time.monotonic()
+            if kind == 'ready':
+                self.restarts = 0
+                self.fatal = None
+                self.ready.set()
+            elif kind == 'pong':
+                event = self._pongs.get(message[1])
+                if event is not None:
+                    event.set()
+            elif kind in ('token', 'done', 'error'):
+                box = self._requests.get(message[1])
+                if box is not None:
+                    box.put(message)
+            elif kind == 'fatal':
+                self.fatal = message[1]
+                print(f"LLM worker failed to start:\n{message[1]}")
+
+        if generation == self.generation and not self._closed.is_set():
+            # Até o monitor subir outro worker, novas perguntas esperam em wait_ready()
+            self.ready.clear()
+            self._fail_pending("LLM worker exited")
+
+    def _watch(self):
+        """Reinicia o worker se o processo morreu ou o heartbeat parou."""
+        while not self._closed.wait(HEARTBEAT_INTERVAL):
+            process = self.process
+            if process is None:
+                continue
+            if not process.is_alive():
+                reason = f"exit code {process.exitcode}"
+            elif time.monotonic() - self.last_heartbeat > self.heartbeat_timeout:
+                reason = f"no heartbeat for {self.heartbeat_timeout:.0f} s"
+            else:
+                continue
+            if self.restarts >= self.max_restarts:
+                self._fail_pending(f"LLM worker down ({reason}); giving up after {self.restarts} restarts")
+                continue
+            delay = RESTART_BACKOFF[min(self.restarts, len(RESTART_BACKOFF) - 1)]
+            print(f"LLM worker lost ({reason}); restarting in {delay:.0f} s")
+            self.restart(reason, delay)
+
+    def restart(self, reason="manual", delay=0.0):
+        with self._lock:
+            self._stop_process()
+            self._fail_pending(f"LLM worker restarted ({reason})")
+            if self._closed.wait(delay):
+                return
+            self.restarts += 1
+            self._spawn()
+
+    def _stop_process(self):
+        process, conn = self.process, self.conn
+        # Gera nova 'generation' antes: o leitor antigo não deve reagir ao fechamento
+        self.generation += 1
+        if conn is not None:
+            conn.close()
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+    def _fail_pending(self, reason):
+        for request_id, box in list(self._requests.items()):
+            box.put(('error', request_id, reason))
+
+    def _send(self, *message):
+        with self._send_lock:
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError) as e:
+                raise WorkerError(f"LLM worker unavailable: {e}") from e
+
+    def wait_ready(self, timeout=None):
+        deadline = time.monotonic() + (self.start_timeout if timeout is None else timeout)
+        while not self.ready.wait(0.1):
+            if self.fatal is not None and self.restarts >= self.max_restarts:
+                raise WorkerError(f"LLM worker failed to start:\n{self.fatal}")
+            if self._closed.is_set() or time.monotonic() > deadline:
+                raise WorkerError("LLM worker is not ready")
+
+    def stream_response(self, question, session_id="default", stop_event=None):
+        """Pedaços da resposta conforme chegam; fechar o gerador ou sinalizar stop_event cancela no worker."""
+        self.wait_ready()
+        request_id = next(self._ids)
+        box = queue.Queue()
+        self._requests[request_id] = box
+        finished = cancelled = False
+        try:
+            self._send('ask', request_id, question, session_id)
+            while True:
+                try:
+                    message = box.get(timeout=0.1)
+                except queue.Empty:
+                    if stop_event is not None and stop_event.is_set() and not cancelled:
+                        self._send('cancel', request_id)
+                        cancelled = True
+                    continue
+                kind = message[0]
+                if kind == 'token':
+                    yield message[2]
+                elif kind == 'done':
+                    finished = True
+                    return
+                else:
+                    finished = True
+                    raise WorkerError(message[2])
+        finally:
+            self._requests.pop(request_id, None)
+            if not finished and not cancelled:
+                try:
+                    self._send('cancel', request_id)
+                except WorkerError:
+                    pass
+
+    def get_response(self, question, session_id="default"):
+        return ''.join(self.stream_response(question, session_id)).strip()
+
+    def reset_session(self, session_id="default"):
+        if self.ready.is_set():
+            self._send('reset', session_id)
+
+    def ping(self, timeout=5.0):
+        """Ida e volta em segundos, ou None se o worker não respondeu."""
+        ping_id = next(self._ids)
+        event = self._pongs[ping_id] = threading.Event()
+        start = time.perf_counter()
+        try:
+            self._send('ping', ping_id)
+            return time.perf_counter() - start if event.wait(timeout) else None
+        except WorkerError:
+            return None
+        finally:
+            self._pongs.pop(ping_id, None)
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive() and self.ready.is_set()
+
+    def close(self, timeout=5.0):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._lock:
+            try:
+                self._send('shutdown')
+            except WorkerError:
+                pass
+            if self.process is not None:
+                self.process.join(timeout)
+            self._stop_process()
+            self._fail_pending("LLM worker closed")
@@ -0,0 +1,102 @@
+import numpy as np
+
+"""
+    Inferência da MLP em NumPy puro
+    O StandardScaler é dobrado nos pesos da primeira camada e o one-hot de
+    'SETOR' vira uma busca de linha na matriz de pesos, então o forward pass
+    recebe o buffer bruto de features, sem ColumnTransformer.
+"""
+
+
+class FoldedMLP:
+    def __init__(self, numeric_features, categories, weights, biases, dtype=np.float64):
+        self.numeric_features = list(numeric_features)
+        self.categories = list(categories)
+        self.category_index = {cat: i for i, cat in enumerate(self.categories)}
+        self.dtype = np.dtype(dtype)
+
+        # weights[0]: (n_num, h1) já escalado; biases[0]: (n_cat + 1, h1),
+        # uma linha por SETOR com o bias dobrado e a última para categoria desconhecida
+        self.weights = [np.ascontiguousarray(w, dtype=self.dtype) for w in weights]
+        self.biases = [np.ascontiguousarray(b, dtype=self.dtype) for b in biases]
+
+    @classmethod
+    def from_sklearn(cls, mlp, preprocessor, dtype=None):
+        if mlp.activation != 'relu':
+            raise ValueError(f"Only relu activations can be folded, got '{mlp.activation}'")
+
+        transformers = {name: (trans, cols) for name, trans, cols in preprocessor.transformers_}
+        scaler, num_features = transformers['num']
+        encoder, _ = transformers['cat']
+
+        num_features = list(num_features)
+        categories = list(encoder.categories_[0])
+        n_num = len(num_features)
+
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_num)
+
+        W1 = mlp.coefs_[0]
+        W1_num = W1[:n_num] / scale[:, None]
+        b1 = mlp.intercepts_[0] - (mean / scale) @ W1[:n_num]
+
+        # handle_unknown='ignore' gera um one-hot zerado, equivalente a somar só o bias
+        cat_rows = W1[n_num:n_num + len(categories)] + b1
+        cat_rows = np.vstack([cat_rows, b1])
+
+        weights = [W1_num] + list(mlp.coefs_[1:])
+        biases = [cat_rows] + list(mlp.intercepts_[1:])
+        return cls(num_features, categories, weights, biases, dtype=dtype or W1.dtype)
+
+    def encode(self, df):
+        X_num = np.ascontiguousarray(df[self.numeric_features].to_numpy(dtype=self.dtype))
+        unknown = len(self.categories)
+        setor_idx = np.fromiter(
+            (self.category_index.get(s, unknown) for s in df['SETOR']),
+            dtype=np.intp,
+            count=len(df)
+        )
+        return X_num, setor_idx
+
+    def forward(self, X_num, setor_idx):
+        h = X_num @ self.weights[0]
+        h += self.biases[0][setor_idx]
+        np.maximum(h, 0, out=h)
+
+        for W, b in zip(self.weights[1:-1], self.biases[1:-1]):
+            h = h @ W
+            h += b
+            np.maximum(h, 0, out=h)
+
+        out = h @ self.weights[-1]
+        out += self.biases[-1]
+        return out.ravel()
+
+    def predict(self, df):
+        X_num, setor_idx = self.encode(df)
+        return self.forward(X_num, setor_idx)
+
+    def save(self, path):
+        arrays = {f'W{i}': w for i, w in enumerate(self.weights)}
+        arrays.update({f'b{i}': b for i, b in enumerate(self.biases)})
+        np.savez(
+            path,
+            numeric_features=np.array(self.numeric_features),
+            categories=np.array(self.categories),
+            n_layers=len(self.weights),
+            **arrays
+        )
+
+    @classmethod
+    def load(cls, path, dtype=None):
+        with np.load(path, allow_pickle=False) as data:
+            n_layers = int(data['n_layers'])
+            weights = [data[f'W{i}'] for i in range(n_layers)]
+            biases = [data[f'b{i}'] for i in range(n_layers)]
+            return cls(
+                data['numeric_features'].tolist(),
+                data['categories'].tolist(),
+                weights,
+                biases,
+                dtype=dtype or weights[0].dtype
+            )
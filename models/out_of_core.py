@@ -0,0 +1,187 @@
+import os
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from data.schema import iter_dataset, FEATURE_COLUMNS, METRIC_COLUMNS, SECTOR_COLUMN, TARGET_COLUMN, FLOAT_DTYPE
+from data.data_treatment import make_mlp_preprocessor
+from models.DEC_TREE import RegressionTree
+from models.MLP import NeuralNetwork
+from models.XGBoost import Xgboost
+
+"""
+    Treino out-of-core para datasets maiores que a RAM
+    O CSV é lido em blocos: o StandardScaler é ajustado com partial_fit (estatísticas
+    em streaming), a MLP treina bloco a bloco com partial_fit e o XGBoost lê os blocos
+    por um DataIter com cache em disco (external memory).
+    A árvore de regressão não tem treino incremental, então usa uma amostra
+    reservoir de tamanho fixo. A validação é uma amostra reservoir dos 20% de
+    linhas separados por posição.
+"""
+
+VALIDATION_EVERY = 5
+
+
+class Reservoir:
+    """Amostragem reservoir (algoritmo R) vetorizada por bloco, com memória fixa."""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.seen = 0
+        self.frame = None
+
+    def add(self, df):
+        filled = 0 if self.frame is None else len(self.frame)
+        if filled < self.size:
+            head = df.iloc[:self.size - filled]
+            self.frame = head.reset_index(drop=True) if self.frame is None else pd.concat([self.frame, head], ignore_index=True)
+            self.seen += len(head)
+            df = df.iloc[len(head):]
+        if len(df) == 0:
+            return
+
+        positions = self.seen + np.arange(len(df))
+        slots = (self.rng.random(len(df)) * (positions + 1)).astype(np.int64)
+        rows = np.flatnonzero(slots < self.size)
+        self.seen += len(df)
+        if len(rows) == 0:
+            return
+
+        # Se dois registros caem no mesmo slot, vale o mais recente, como no algoritmo sequencial
+        slots = slots[rows]
+        _, last = np.unique(slots[::-1], return_index=True)
+        keep = len(slots) - 1 - last
+        slots, rows = slots[keep], rows[keep]
+        for k, col in enumerate(self.frame.columns):
+            self.frame.iloc[slots, k] = df[col].to_numpy()[rows]
+
+
+class ChunkIter(xgb.DataIter):
+    def __init__(self, trainer, cache_prefix):
+        self.trainer = trainer
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = self.trainer.iter_chunks()
+        try:
+            train, _ = next(self._chunks)
+        except StopIteration:
+            return False
+        input_data(data=self.trainer.label_encode(train[FEATURE_COLUMNS]), label=train[TARGET_COLUMN])
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+class OutOfCoreTrainer:
+    def __init__(self, path, chunksize=100_000, sample_size=200_000, validation_size=50_000,
+                 mlp_epochs=10, mlp_patience=2, cache_dir='data/cache/xgb_extmem', seed=42,
+                 tree_params=None, mlp_params=None, xgb_params=None):
+        self.path = path
+        self.chunksize = chunksize
+        self.cache_dir = cache_dir
+        self.mlp_epochs = mlp_epochs
+        self.mlp_patience = mlp_patience
+        self.tree_params = tree_params
+        self.mlp_params = mlp_params
+        self.xgb_params = xgb_params
+
+        self.num_features = sorted(METRIC_COLUMNS)
+        self.scaler = StandardScaler()
+        self.categories = set()
+        self.tree_sample = Reservoir(sample_size, seed)
+        self.validation = Reservoir(validation_size, seed + 1)
+        self.label_encoder = None
+        self.preprocessor = None
+        self.n_rows = 0
+
+    def iter_chunks(self):
+        """Blocos (treino, validação); a cada VALIDATION_EVERY linhas uma vai para a validação."""
+        start = 0
+        for chunk in iter_dataset(self.path, self.chunksize):
+            is_val = (np.arange(start, start + len(chunk)) % VALIDATION_EVERY) == 0
+            start += len(chunk)
+            yield chunk[~is_val], chunk[is_val]
+
+    def label_encode(self, X):
+        setor = self.label_encoder.transform(X[SECTOR_COLUMN]).astype(np.int32)
+        return X.assign(**{SECTOR_COLUMN: setor})
+
+    def scan(self):
+        """Primeira passada: estatísticas do scaler, categorias de 'SETOR' e amostras."""
+        for train, val in self.iter_chunks():
+            self.scaler.partial_fit(train[self.num_features])
+            self.categories.update(train[SECTOR_COLUMN].unique())
+            self.tree_sample.add(train[FEATURE_COLUMNS + [TARGET_COLUMN]])
+            self.validation.add(val[FEATURE_COLUMNS + [TARGET_COLUMN]])
+            self.n_rows += len(train) + len(val)
+            print(f"  scanned {self.n_rows} rows")
+
+        categories = sorted(self.categories)
+        self.label_encoder = LabelEncoder().fit(categories)
+
+        # O ColumnTransformer é ajustado na amostra só para ficar "fitted";
+        # as estatísticas do scaler são trocadas pelas do arquivo inteiro
+        sample_X = self.tree_sample.frame[FEATURE_COLUMNS]
+        self.preprocessor = make_mlp_preprocessor(sample_X, categories=[categories])
+        self.preprocessor.fit(sample_X)
+        fitted_scaler = self.preprocessor.named_transformers_['num']
+        for attr in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+            setattr(fitted_scaler, attr, getattr(self.scaler, attr))
+
+    def train_tree(self):
+        sample = self.tree_sample.frame
+        val = self.validation.frame
+        reg_tree = RegressionTree(params=self.tree_params)
+        reg_tree.train_tree(
+            self.label_encode(sample[FEATURE_COLUMNS]), sample[TARGET_COLUMN], self.label_encoder,
+            self.label_encode(val[FEATURE_COLUMNS]), val[TARGET_COLUMN]
+        )
+        return reg_tree
+
+    def train_mlp(self):
+        val = self.validation.frame
+        X_val = self.preprocessor.transform(val[FEATURE_COLUMNS])
+        mlp_nn = NeuralNetwork(
+            None, None, None, None, self.preprocessor,
+            max_iter=self.mlp_epochs, patience=self.mlp_patience, params=self.mlp_params,
+            X_val=X_val, y_val=val[TARGET_COLUMN].to_numpy(FLOAT_DTYPE)
+        )
+
+        def epoch_batches():
+            for train, _ in self.iter_chunks():
+                yield self.preprocessor.transform(train[FEATURE_COLUMNS]), train[TARGET_COLUMN].to_numpy(FLOAT_DTYPE)
+
+        mlp_nn.train_mlp(epoch_batches=epoch_batches)
+        return mlp_nn
+
+    def train_xgboost(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        it = ChunkIter(self, cache_prefix=os.path.join(self.cache_dir, 'train'))
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            dtrain = xgb.ExtMemQuantileDMatrix(it)
+        else:
+            dtrain = xgb.DMatrix(it)
+
+        val = self.validation.frame
+        xg_boost = Xgboost(
+            None, None, None, None, self.label_encoder, params=self.xgb_params,
+            X_val=self.label_encode(val[FEATURE_COLUMNS]), y_val=val[TARGET_COLUMN]
+        )
+        xg_boost.build_xgboost(dtrain=dtrain)
+        return xg_boost
+
+    def train(self):
+        print("  Out-of-core scan")
+        self.scan()
+        print("  Out-of-core Regression Tree (reservoir sample)")
+        reg_tree = self.train_tree()
+        print("  Out-of-core MLP")
+        mlp_nn = self.train_mlp()
+        print("  Out-of-core XGBoost")
+        xg_boost = self.train_xgboost()
+        return reg_tree, mlp_nn, xg_boost, self.preprocessor
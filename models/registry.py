@@ -0,0 +1,197 @@
+import os
+import sys
+import copy
+import json
+import pickle
+import argparse
+import threading
+from datetime import datetime, timezone
+from data.schema import file_fingerprint
+
+"""
+    Registro versionado de modelos
+    Cada versão é um diretório imutável (vNNNN/) com o bundle serializado
+    (árvore, MLP, XGBoost, encoders e preprocessor) e um manifest.json com métricas,
+    o hash do dataset e o do bundle.pkl. O arquivo CURRENT aponta para a versão ativa e o HISTORY
+    guarda as promoções, então um rollback só reescreve o ponteiro.
+"""
+
+REGISTRY_PATH = 'models/registry'
+
+# Atributos com os dados de treino, que não precisam ir para o bundle
+TRAINING_DATA_ATTRS = ('X_train', 'X_test', 'y_train', 'y_test', 'X_val', 'y_val')
+
+
+def _slim(model):
+    model = copy.copy(model)
+    for attr in TRAINING_DATA_ATTRS:
+        if hasattr(model, attr):
+            setattr(model, attr, None)
+    return model
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelBundle:
+    def __init__(self, reg_tree, mlp_nn, xg_boost, preprocessor, metrics=None, dataset_hash=None,
+                 version=None, created_at=None, bundle_hash=None):
+        self.reg_tree = reg_tree
+        self.mlp_nn = mlp_nn
+        self.xg_boost = xg_boost
+        self.preprocessor = preprocessor
+        # {dataset: {modelo: {'MAE', 'MSE', 'R2', ...}}}, preenchido pelo models.evaluation
+        self.metrics = metrics or {}
+        self.dataset_hash = dataset_hash
+        self.version = version
+        self.created_at = created_at
+        # SHA-256 do bundle.pkl no registro: identifica os modelos, a versão sozinha não
+        self.bundle_hash = bundle_hash
+
+    def manifest(self):
+        return {
+            'version': self.version,
+            'created_at': self.created_at,
+            'dataset_hash': self.dataset_hash,
+            'bundle_hash': self.bundle_hash,
+            'metrics': self.metrics
+        }
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_PATH):
+        self.root = root
+        self._loaded = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _version_dir(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and os.path.exists(os.path.join(self.root, name, 'manifest.json'))
+        )
+
+    def publish(self, bundle, promote=True):
+        # os.mkdir é atômico: dois processos publicando ao mesmo tempo recebem versões diferentes
+        number = len(self.versions()) + 1
+        while True:
+            version = f"v{number:04d}"
+            try:
+                os.mkdir(self._version_dir(version))
+                break
+            except FileExistsError:
+                number += 1
+
+        bundle.version = version
+        bundle.created_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        slim = ModelBundle(
+            _slim(bundle.reg_tree), _slim(bundle.mlp_nn), _slim(bundle.xg_boost), bundle.preprocessor,
+            bundle.metrics, bundle.dataset_hash, bundle.version, bundle.created_at
+        )
+
+        bundle_path = os.path.join(self._version_dir(version), 'bundle.pkl')
+        with open(bundle_path, 'wb') as f:
+            pickle.dump(slim, f, protocol=pickle.HIGHEST_PROTOCOL)
+        bundle.bundle_hash = slim.bundle_hash = file_fingerprint(bundle_path)
+        # O manifest é escrito por último: versão sem manifest é considerada incompleta
+        _write_atomic(os.path.join(self._version_dir(version), 'manifest.json'), json.dumps(slim.manifest(), indent=2))
+
+        with self._lock:
+            self._loaded[version] = bundle
+        if promote:
+            self.promote(version)
+        return version
+
+    def manifest(self, version):
+        with open(os.path.join(self._version_dir(version), 'manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, version):
+        """Bundles carregados ficam em memória, então voltar para uma versão já usada é O(1)."""
+        if version == 'current':
+            version = self.current_version()
+            if version is None:
+                raise ValueError("The model registry has no current version")
+        with self._lock:
+            if version in self._loaded:
+                return self._loaded[version]
+
+        bundle_path = os.path.join(self._version_dir(version), 'bundle.pkl')
+        with open(bundle_path, 'rb') as f:
+            bundle = pickle.load(f)
+        # Versões publicadas antes do bundle_hash no manifest: calcula do arquivo
+        bundle.bundle_hash = self.manifest(version).get('bundle_hash') or file_fingerprint(bundle_path)
+
+        with self._lock:
+            return self._loaded.setdefault(version, bundle)
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, 'CURRENT'), 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def history(self):
+        try:
+            with open(os.path.join(self.root, 'HISTORY'), 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def promote(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'")
+        history = self.history()
+        if not history or history[-1] != version:
+            history.append(version)
+        _write_atomic(os.path.join(self.root, 'HISTORY'), '\n'.join(history) + '\n')
+        _write_atomic(os.path.join(self.root, 'CURRENT'), version)
+
+    def rollback(self):
+        history = self.history()
+        if len(history) < 2:
+            raise ValueError("No previous model version to roll back to")
+        history.pop()
+        _write_atomic(os.path.join(self.root, 'HISTORY'), '\n'.join(history) + '\n')
+        _write_atomic(os.path.join(self.root, 'CURRENT'), history[-1])
+        return history[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model registry")
+    parser.add_argument('--root', default=REGISTRY_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list')
+    promote = sub.add_parser('promote')
+    promote.add_argument('version')
+    sub.add_parser('rollback')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            manifest = registry.manifest(version)
+            marker = '*' if version == current else ' '
+            r2 = {name: round(m['R2'], 4) for name, m in manifest['metrics'].get('split', {}).items()}
+            print(f"{marker} {version}  {manifest['created_at']}  dataset {manifest['dataset_hash'][:12] if manifest['dataset_hash'] else '-'}  R² {r2}")
+    elif args.command == 'promote':
+        registry.promote(args.version)
+        print(f"Current model version: {args.version}")
+    else:
+        print(f"Rolled back to {registry.rollback()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
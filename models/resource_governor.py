@@ -0,0 +1,103 @@
+import os
+import sys
+from contextlib import contextmanager
+
+"""
+    Orçamento de threads por subsistema
+    XGBoost, o BLAS/OpenMP do numpy e do sklearn e o torch usam todos os núcleos por
+    padrão; juntos (treino na partida, avaliação em segundo plano, geração do chat)
+    disputam os mesmos núcleos e a latência do chat e das predições dispara.
+    O ResourceGovernor divide os núcleos disponíveis em orçamentos fixos:
+      - 'llm': o Gemma (torch.set_num_threads e OMP/MKL no ambiente do processo worker)
+      - 'interactive': predições e o que o usuário está esperando; uma linha não ganha nada com mais threads
+      - 'background': treino, avaliação em lote, monitor de drift; fica com o que sobra
+    O nthread do XGBoost e o número de threads do OpenMP valem por thread, então limit()
+    aplica o orçamento só na thread que chama. O pool do OpenBLAS é do processo inteiro
+    e recebe um teto único em install().
+    O módulo não importa numpy/xgboost no topo: o worker do LLM o usa para montar o
+    ambiente antes de qualquer biblioteca com pool de threads ser carregada.
+"""
+
+SUBSYSTEMS = ('llm', 'interactive', 'background')
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+LLM_SHARE = 0.5
+INTERACTIVE_THREADS = 1
+
+
+def available_cpus():
+    """Núcleos que o processo pode usar (respeita taskset/cgroups no Linux)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def thread_env(threads):
+    """Variáveis para um processo filho: precisam estar no ambiente antes do import do torch/numpy."""
+    return {name: str(threads) for name in THREAD_ENV_VARS}
+
+
+def set_torch_threads(threads):
+    """Limita o torch do processo, se ele já foi importado; devolve se aplicou."""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return False
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Só pode ser chamado antes do primeiro trabalho paralelo
+        pass
+    return True
+
+
+class ResourceGovernor:
+    def __init__(self, cpus=None, llm_share=LLM_SHARE, interactive_threads=INTERACTIVE_THREADS, budgets=None):
+        self.cpus = cpus or available_cpus()
+        llm = max(1, int(self.cpus * llm_share))
+        self.budgets = {
+            'llm': llm,
+            'interactive': interactive_threads,
+            'background': max(1, self.cpus - llm - interactive_threads)
+        }
+        self.budgets.update(budgets or {})
+        self._controller = None
+        self._blas_limits = None
+
+    @property
+    def controller(self):
+        # Varrer as bibliotecas carregadas custa ~10 ms; limit() roda a cada tarefa, então a varredura é feita uma vez
+        if self._controller is None:
+            from threadpoolctl import ThreadpoolController
+            self._controller = ThreadpoolController()
+        return self._controller
+
+    def budget(self, name):
+        if name not in self.budgets:
+            raise ValueError(f"Unknown subsystem '{name}'; expected one of {SUBSYSTEMS}")
+        return self.budgets[name]
+
+    def install(self, name='background'):
+        """Teto global do BLAS e orçamento da thread atual (a principal treina os modelos na partida)."""
+        threads = self.budget(name)
+        self._blas_limits = self.controller.limit(limits=threads, user_api='blas')
+        self.enter_thread(name)
+        print(f"Thread budgets on {self.cpus} CPUs: " +
+              ", ".join(f"{key}={value}" for key, value in self.budgets.items()))
+        return self
+
+    def enter_thread(self, name, share=1):
+        """Aplica o orçamento à thread atual sem restaurar (initializer de pools); 'share' divide entre workers."""
+        import xgboost as xgb
+        threads = max(1, self.budget(name) // share)
+        self.controller.limit(limits=threads, user_api='openmp')
+        xgb.set_config(nthread=threads)
+        return threads
+
+    @contextmanager
+    def limit(self, name):
+        """Orçamento de 'name' só durante o bloco e só nesta thread."""
+        import xgboost as xgb
+        threads = self.budget(name)
+        with self.controller.limit(limits=threads, user_api='openmp'), xgb.config_context(nthread=threads):
+            yield threads